@@ -279,3 +279,57 @@ REST_FRAMEWORK = {'DEFAULT_SCHEMA_CLASS':'rest_framework.schemas.coreapi.AutoSch
 # control how long your Django app's pages are cached by client browsers.
 # setting to 0 will not cache pages by client browsers.
 CACHE_MIDDLEWARE_SECONDS = 0
+
+# server-side caches. The genealogy cache holds the rendered /account-genealogy/
+# responses; point GENEALOGY_CACHE_BACKEND at django.core.cache.backends.redis.RedisCache
+# (with GENEALOGY_CACHE_LOCATION='redis://host:6379') or a file based cache to share
+# it across processes. LocMemCache evicts the least recently used entries.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'genealogy': {
+        'BACKEND': config('GENEALOGY_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('GENEALOGY_CACHE_LOCATION', default='genealogy'),
+        'TIMEOUT': config('GENEALOGY_CACHE_TIMEOUT', default=86400, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('GENEALOGY_CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    },
+    # snapshot of the latest status of every cron read by the cron health gate.
+    # Each cron runs in its own process, so set CRON_HEALTH_CACHE_BACKEND to
+    # django.core.cache.backends.filebased.FileBasedCache (with CRON_HEALTH_CACHE_LOCATION
+    # set to a directory) to share the snapshot between the crons.
+    'cron_health': {
+        'BACKEND': config('CRON_HEALTH_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CRON_HEALTH_CACHE_LOCATION', default='cron_health'),
+        'TIMEOUT': config('CRON_HEALTH_CACHE_SECONDS', default=30, cast=int),
+    },
+    # state of the circuit breaker of each external dependency; set
+    # CIRCUIT_BREAKER_CACHE_BACKEND to a file based or shared cache to share the
+    # circuits between the crons.
+    'circuit_breaker': {
+        'BACKEND': config('CIRCUIT_BREAKER_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CIRCUIT_BREAKER_CACHE_LOCATION', default='circuit_breaker'),
+    },
+    # in-process LRU tier of the documents read from the document store
+    'documents': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'documents',
+        'TIMEOUT': config('DOCUMENT_CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('DOCUMENT_CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    },
+    # optional tier of the documents shared between the crons, disabled by default;
+    # set DOCUMENT_SHARED_CACHE_BACKEND to django.core.cache.backends.filebased.FileBasedCache
+    # (with DOCUMENT_SHARED_CACHE_LOCATION set to a directory) to enable it.
+    'documents_shared': {
+        'BACKEND': config('DOCUMENT_SHARED_CACHE_BACKEND', default='django.core.cache.backends.dummy.DummyCache'),
+        'LOCATION': config('DOCUMENT_SHARED_CACHE_LOCATION', default='documents_shared'),
+        'TIMEOUT': config('DOCUMENT_CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('DOCUMENT_SHARED_CACHE_MAX_ENTRIES', default=10000, cast=int),
+        },
+    },
+}
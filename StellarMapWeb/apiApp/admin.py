@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import (ManagementCronHealth, StellarCreatorAccountLineage,
+from .models import (ManagementCronHealth, ManagementCronHealthHistory,
+                     ManagementCronHealthLatest, StellarCreatorAccountLineage,
+                     StellarCreatorAccountLineageIndex,
+                     StellarCreatorAccountLineageQueue,
                      UserInquirySearchHistory)
 
 
@@ -15,7 +18,27 @@ class RequestDemoAdmin(admin.ModelAdmin):
     list_display = [field.name for field in
     StellarCreatorAccountLineage._meta.get_fields()]
 
+@admin.register(StellarCreatorAccountLineageQueue)
+class RequestDemoAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in
+    StellarCreatorAccountLineageQueue._meta.get_fields()]
+
+@admin.register(StellarCreatorAccountLineageIndex)
+class RequestDemoAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in
+    StellarCreatorAccountLineageIndex._meta.get_fields()]
+
 @admin.register(ManagementCronHealth)
 class RequestDemoAdmin(admin.ModelAdmin):
     list_display = [field.name for field in
-    ManagementCronHealth._meta.get_fields()]
\ No newline at end of file
+    ManagementCronHealth._meta.get_fields()]
+
+@admin.register(ManagementCronHealthLatest)
+class RequestDemoAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in
+    ManagementCronHealthLatest._meta.get_fields()]
+
+@admin.register(ManagementCronHealthHistory)
+class RequestDemoAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in
+    ManagementCronHealthHistory._meta.get_fields()]
@@ -1,3 +1,27 @@
+from decouple import config
+
+# requests per second and burst of each rate limited host (and its subdomains);
+# a rate of 0 disables the limit of the host
+RATE_LIMITS = {
+    'horizon.stellar.org': (
+        config('HORIZON_PUBLIC_RATE_LIMIT', default=1.0, cast=float),
+        config('HORIZON_PUBLIC_RATE_BURST', default=17, cast=int)
+    ),
+    'horizon-testnet.stellar.org': (
+        config('HORIZON_TESTNET_RATE_LIMIT', default=1.0, cast=float),
+        config('HORIZON_TESTNET_RATE_BURST', default=17, cast=int)
+    ),
+    'api.stellar.expert': (
+        config('STELLAR_EXPERT_RATE_LIMIT', default=1.0, cast=float),
+        config('STELLAR_EXPERT_RATE_BURST', default=7, cast=int)
+    ),
+    'apps.astra.datastax.com': (
+        config('ASTRA_DOCUMENT_RATE_LIMIT', default=17.0, cast=float),
+        config('ASTRA_DOCUMENT_RATE_BURST', default=71, cast=int)
+    ),
+}
+
+
 
 class StellarNetwork:
     """A class for working with Stellar networks.
@@ -105,3 +129,7 @@ class EnvHelpers:
 
     def get_base_horizon_effects(self):
         return self.base_horizon_effects
+
+    def get_rate_limits(self):
+        """Return the (requests per second, burst) of each rate limited host."""
+        return RATE_LIMITS
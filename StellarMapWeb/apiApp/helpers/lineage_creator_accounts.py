@@ -2,9 +2,8 @@ import logging
 import os
 import time
 
-import requests
-
 from .env import StellarNetwork
+from .sm_conn import StellarMapHTTPSessionHelpers
 from .sm_validator import StellarMapValidatorHelpers
 
 # Set up logging for module
@@ -64,8 +63,8 @@ class LineageHelpers:
         more_urls = True
 
         while more_urls:
-            # Make a GET request to the URL
-            response = requests.get(url)
+            # Make a GET request to the URL over the pooled session of the host
+            response = StellarMapHTTPSessionHelpers.get_session(url).get(url)
 
             # Check if the request was successful
             if response.status_code == 200:
@@ -1,74 +1,121 @@
-import asyncio
-import functools
-from concurrent.futures import ThreadPoolExecutor
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-import requests
 import sentry_sdk
+from apiApp.helpers.sm_conn import StellarMapHTTPSessionHelpers
+from decouple import config
 
-class StellarMapAsyncHelpers:
+# default worker threads of a stage; override per stage with <STAGE_NAME>_WORKERS
+ASYNC_MAX_WORKERS = config('ASYNC_MAX_WORKERS', default=17, cast=int)
 
-    def execute_async(self, *args, **kwargs):
-        """
-        Executes a task asynchronously using a thread pool executor.
+# default seconds a run may start new tasks for, so a cron tick finishes before the
+# next one starts; override per stage with <STAGE_NAME>_TIME_BUDGET_SECONDS, 0 disables
+ASYNC_TIME_BUDGET_SECONDS = config('ASYNC_TIME_BUDGET_SECONDS', default=40, cast=float)
 
-        :param args: Arguments to pass to the task function.
-        :param kwargs: Keyword arguments to pass to the task function.
-        :return: None
+
+class StellarMapAsyncHelpers:
+    """
+    Runs a stage function over a stream of tasks with a bounded thread pool.
+
+    Tasks are pulled from the iterable (e.g. the paged generator of
+    StellarCreatorAccountLineageManager.iter_queued_queryset) only while fewer than
+    `max_in_flight` are pending, so a large backlog is never held in memory at once.
+    No task is started once the time budget is spent; the tasks in flight are
+    awaited and the rest are left queued for the next run.
+
+    Usage:
+    ```
+    async_helpers = StellarMapAsyncHelpers(stage_name='cron_collect_account_lineage_attributes')
+    summary = async_helpers.execute_async(lin_querysets, custom_function)
+    ```
+    """
+
+    def __init__(self, stage_name=None, max_workers=None, max_in_flight=None, time_budget_seconds=None):
         """
+        :param stage_name: name of the stage, used to read <STAGE_NAME>_WORKERS and
+            <STAGE_NAME>_TIME_BUDGET_SECONDS
+        :param max_workers: worker threads running the tasks
+        :param max_in_flight: tasks submitted but not finished; defaults to twice the workers
+        :param time_budget_seconds: seconds after which no task is started; 0 disables it
+        """
+        prefix = stage_name.upper() if stage_name else None
 
-        # Get the event loop
-        loop = asyncio.get_event_loop()
+        if max_workers is None:
+            max_workers = config(f'{prefix}_WORKERS', default=ASYNC_MAX_WORKERS, cast=int) if prefix else ASYNC_MAX_WORKERS
+        if time_budget_seconds is None:
+            time_budget_seconds = config(f'{prefix}_TIME_BUDGET_SECONDS', default=ASYNC_TIME_BUDGET_SECONDS, cast=float) if prefix else ASYNC_TIME_BUDGET_SECONDS
 
-        # Schedule the task function to be executed asynchronously and get the future object
-        future = asyncio.ensure_future(self.add_task_to_threadpool(*args, **kwargs))
-        
-        # Run the event loop until the task is complete
-        loop.run_until_complete(future)
+        self.stage_name = stage_name
+        self.max_workers = max(1, max_workers)
+        self.max_in_flight = max(self.max_workers, max_in_flight or 2 * self.max_workers)
+        self.time_budget_seconds = time_budget_seconds
 
-    async def add_task_to_threadpool(self, task_list, custom_function, *args, **kwargs):
+    def execute_async(self, task_list, custom_function, *args, **kwargs):
         """
-        This function runs a list of tasks asynchronously using a custom function.
+        Executes the custom function on every task of the iterable with the thread pool.
+
+        The custom function is called as custom_function(session, task, *args, **kwargs),
+        with the pooled requests session of the process (StellarMapHTTPSessionHelpers).
 
-        :param self: The object instance of the class method.
-        :param task_list: The list of objects to be used as tasks.
-        :param custom_function: The custom function to execute on each task.
+        :param task_list: iterable of tasks, consumed lazily
+        :param custom_function: the function to execute on each task
         :param args: The non-keyword arguments for the custom function.
         :param kwargs: The keyword arguments for the custom function.
+        :return: summary dict with the counts, the elapsed seconds and the outcome of each task
+        """
+        started_at = time.monotonic()
+        deadline = started_at + self.time_budget_seconds if self.time_budget_seconds else None
 
-        The function initializes an empty list called tasks. It then creates a ThreadPoolExecutor 
-        with a maximum of 17 workers and a requests session.
-
-        Next, it initializes an event loop, and for each row or task in the task_list, it executes
-        the custom_function using the session, obj, args, and kwargs as parameters. This is done
-        using loop.run_in_executor() and functools.partial().
+        session = StellarMapHTTPSessionHelpers.get_session()
+        task_iter = iter(task_list)
+        in_flight = set()
+        outcomes = []
+        exhausted = False
+        over_budget = False
 
-        The tasks list is updated with the resulting tasks from each execution. Finally, the tasks
-        are initiated to run, and their results are awaited. If an error occurs during the execution,
-        it is caught, and an error message is raised with the corresponding exception captured by Sentry SDK.
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    # top up the window of tasks in flight
+                    while not exhausted and not over_budget and len(in_flight) < self.max_in_flight:
+                        if deadline is not None and time.monotonic() >= deadline:
+                            over_budget = True
+                            break
+                        try:
+                            task = next(task_iter)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        in_flight.add(executor.submit(self.run_task, custom_function, session, task, *args, **kwargs))
+
+                    if not in_flight:
+                        break
+
+                    # wait for a slot (backpressure on the task iterable)
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    outcomes.extend(future.result() for future in done)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise ValueError(f'StellarMapAsyncHelpers.execute_async Error: {e}')
+
+        return {
+            'stage_name': self.stage_name,
+            'succeeded': sum(1 for outcome in outcomes if outcome['succeeded']),
+            'failed': sum(1 for outcome in outcomes if not outcome['succeeded']),
+            'over_budget': over_budget,
+            'seconds': time.monotonic() - started_at,
+            'outcomes': outcomes
+        }
+
+    @staticmethod
+    def run_task(custom_function, session, task, *args, **kwargs):
         """
-
+        Runs the custom function on one task and records its outcome and timing.
+        """
+        started_at = time.monotonic()
         try:
-            tasks = []
-
-            # Create thread pool and requests session
-            with ThreadPoolExecutor(max_workers=17) as executor:
-                with requests.Session() as session:
-
-                    # Initialize event loop
-                    loop = asyncio.get_event_loop()
-
-                    # Create tasks for each object in task_list
-                    tasks = [
-                        loop.run_in_executor(
-                            executor,
-                            functools.partial(custom_function, session, obj, *args, **kwargs)
-                        )
-                        for obj in task_list
-                    ]
-
-                    # Run and await tasks
-                    for response in await asyncio.gather(*tasks):
-                        print('Success')
+            result = custom_function(session, task, *args, **kwargs)
+            return {'task': task, 'succeeded': True, 'result': result, 'error': None, 'seconds': time.monotonic() - started_at}
         except Exception as e:
             sentry_sdk.capture_exception(e)
-            raise ValueError(f'StellarMapAsyncHelpers.add_task_to_threadpool Error: {e}')
+            return {'task': task, 'succeeded': False, 'result': None, 'error': f'{e}', 'seconds': time.monotonic() - started_at}
@@ -0,0 +1,203 @@
+import hashlib
+
+import sentry_sdk
+from django.core.cache import caches
+
+GENEALOGY_CACHE_ALIAS = 'genealogy'
+
+
+class StellarMapGenealogyCacheHelpers:
+    """
+    Caches the rendered account genealogy response of a Stellar account.
+
+    The response is stored with a version, the latest updated_at along the genealogy,
+    so a response is only served while none of the lineage records it was built from
+    changed. StellarCreatorAccountLineageManager also invalidates the entry of an
+    account whenever its lineage record is written.
+
+    The backend is the 'genealogy' cache of the Django CACHES setting (local memory
+    LRU by default, or file based / Redis).
+
+    Usage:
+    ```
+    cache_helpers = StellarMapGenealogyCacheHelpers(network_name='public', stellar_account='GA...')
+    response_json = cache_helpers.get_response(version=version)
+    if response_json is None:
+        response_json = build_response()
+        cache_helpers.set_response(version=version, response_json=response_json)
+    ```
+    """
+
+    def __init__(self, network_name, stellar_account):
+        self.network_name = network_name
+        self.stellar_account = stellar_account
+        self.cache = caches[GENEALOGY_CACHE_ALIAS]
+
+    def get_cache_key(self):
+        return f'genealogy:{self.network_name}:{self.stellar_account}'
+
+    @staticmethod
+    def get_version(lin_querysets):
+        """
+        Returns the version of a genealogy: the latest updated_at of its lineage records.
+
+        :param lin_querysets: the lineage records of the genealogy
+        :return: the version as an ISO formatted string, or None for an empty genealogy
+        """
+        updated_ats = [lin_queryset.updated_at or lin_queryset.created_at for lin_queryset in lin_querysets]
+        updated_ats = [updated_at for updated_at in updated_ats if updated_at is not None]
+        if not updated_ats:
+            return None
+        return f'{len(lin_querysets)}:{max(updated_ats).isoformat()}'
+
+    def get_response(self, version):
+        """
+        Returns the cached response if it was built from the given version.
+
+        :param version: the current version of the genealogy
+        :return: the cached response, or None
+        """
+        if version is None:
+            return None
+        try:
+            cached = self.cache.get(self.get_cache_key())
+        except Exception as e:
+            # a cache outage must not fail the request
+            sentry_sdk.capture_exception(e)
+            return None
+
+        if cached and cached.get('version') == version:
+            return cached.get('response')
+        return None
+
+    def set_response(self, version, response_json):
+        if version is None:
+            return
+        try:
+            self.cache.set(self.get_cache_key(), {'version': version, 'response': response_json})
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    def invalidate(self):
+        try:
+            self.cache.delete(self.get_cache_key())
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+
+CRON_HEALTH_CACHE_ALIAS = 'cron_health'
+
+
+class StellarMapCronHealthCacheHelpers:
+    """
+    Caches a snapshot of the latest status of every cron for the cron health gate.
+
+    The backend is the 'cron_health' cache of the Django CACHES setting, which
+    expires the snapshot after CRON_HEALTH_CACHE_SECONDS. The snapshot is dropped
+    by ManagementCronHealthManager whenever a cron status is written.
+    """
+    cache_key = 'cron_health_snapshot'
+
+    def __init__(self):
+        self.cache = caches[CRON_HEALTH_CACHE_ALIAS]
+
+    def get_snapshot(self):
+        """
+        :return: dict of cron_name to {'status': ..., 'created_at': ...}, or None if expired
+        """
+        try:
+            return self.cache.get(self.cache_key)
+        except Exception as e:
+            # a broken shared snapshot must not stop the crons
+            sentry_sdk.capture_exception(e)
+            return None
+
+    def set_snapshot(self, cron_health_snapshot):
+        try:
+            self.cache.set(self.cache_key, cron_health_snapshot)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    def invalidate(self):
+        try:
+            self.cache.delete(self.cache_key)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+
+DOCUMENT_CACHE_ALIAS = 'documents'
+DOCUMENT_SHARED_CACHE_ALIAS = 'documents_shared'
+
+
+class StellarMapDocumentCacheHelpers:
+    """
+    Read-through cache of the documents of the document store, keyed by the
+    document href, so the stages reading the same Horizon accounts document of an
+    account request it from the document store once.
+
+    Two tiers of the Django CACHES setting: the in-process 'documents' cache (local
+    memory LRU capped at DOCUMENT_CACHE_MAX_ENTRIES) and the optional
+    'documents_shared' cache shared between the crons (e.g. file based). Both
+    expire an entry after DOCUMENT_CACHE_TIMEOUT. A document found in the shared
+    tier is copied to the in-process tier; DocumentStore.patch_document writes
+    through to both.
+
+    Usage:
+    ```
+    cache_helpers = StellarMapDocumentCacheHelpers(href=href)
+    document = cache_helpers.get_document()
+    if document is None:
+        document = fetch_document()
+        cache_helpers.set_document(document=document)
+    ```
+    """
+
+    def __init__(self, href):
+        self.href = href
+        self.caches = [caches[DOCUMENT_CACHE_ALIAS], caches[DOCUMENT_SHARED_CACHE_ALIAS]]
+
+    def get_cache_key(self):
+        # hrefs are long urls; hash them into a key valid for every backend
+        return f'document:{hashlib.sha256(self.href.encode()).hexdigest()}'
+
+    def get_document(self):
+        """
+        :return: the cached document, or None
+        """
+        cache_key = self.get_cache_key()
+        for tier, cache in enumerate(self.caches):
+            try:
+                document = cache.get(cache_key)
+            except Exception as e:
+                # a cache outage must not fail the stage
+                sentry_sdk.capture_exception(e)
+                continue
+
+            if document is not None:
+                # promote to the faster tiers
+                for faster_cache in self.caches[:tier]:
+                    self.set_cache(faster_cache, cache_key, document)
+                return document
+        return None
+
+    def set_document(self, document):
+        if document is None:
+            return
+        cache_key = self.get_cache_key()
+        for cache in self.caches:
+            self.set_cache(cache, cache_key, document)
+
+    @staticmethod
+    def set_cache(cache, cache_key, document):
+        try:
+            cache.set(cache_key, document)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    def invalidate(self):
+        cache_key = self.get_cache_key()
+        for cache in self.caches:
+            try:
+                cache.delete(cache_key)
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
@@ -0,0 +1,196 @@
+import time
+from urllib.parse import urlparse
+
+import sentry_sdk
+from decouple import config
+from django.core.cache import caches
+
+CIRCUIT_BREAKER_CACHE_ALIAS = 'circuit_breaker'
+
+# consecutive failed calls that open the circuit of a dependency
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = config('CIRCUIT_BREAKER_FAILURE_THRESHOLD', default=7, cast=int)
+
+# seconds an open circuit rejects calls before letting a probe through
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = config('CIRCUIT_BREAKER_COOLDOWN_SECONDS', default=300, cast=int)
+
+# seconds the half-open probe may take before another probe is let through
+CIRCUIT_BREAKER_PROBE_SECONDS = config('CIRCUIT_BREAKER_PROBE_SECONDS', default=60, cast=int)
+
+# external dependencies by host (and its subdomains)
+DEPENDENCY_HOSTS = {
+    'horizon.stellar.org': 'horizon-public',
+    'horizon-testnet.stellar.org': 'horizon-testnet',
+    'api.stellar.expert': 'stellar-expert',
+    'apps.astra.datastax.com': 'astra-docs',
+}
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitOpenError(Exception):
+    """ Raised instead of calling a dependency whose circuit is open. """
+
+    def __init__(self, dependency):
+        self.dependency = dependency
+        super().__init__(f'circuit of {dependency} is open')
+
+
+class StellarMapCircuitBreakerHelpers:
+    """
+    A circuit breaker per external dependency (horizon-public, horizon-testnet,
+    stellar-expert and astra-docs).
+
+    CLOSED: calls go through; CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive failures
+    (connection errors, 429 and 5xx responses) open the circuit.
+    OPEN: calls raise CircuitOpenError for CIRCUIT_BREAKER_COOLDOWN_SECONDS.
+    HALF_OPEN: after the cooldown a single probe call goes through; its success closes
+    the circuit and its failure opens it for another cooldown.
+
+    The rate limited HTTP clients of sm_ratelimit consult the breaker of the host on
+    every call, and the crons skip the networks and stages whose dependencies are
+    open, so a failing dependency only stops the stages that need it.
+
+    The state is kept in the 'circuit_breaker' cache of the Django CACHES setting. Each
+    cron runs in its own process, so set CIRCUIT_BREAKER_CACHE_BACKEND to a file based
+    or shared cache to share the circuits between the crons.
+
+    Usage:
+    ```
+    breaker = StellarMapCircuitBreakerHelpers(dependency='stellar-expert')
+    if breaker.is_available():
+        ...
+    ```
+    """
+
+    def __init__(self, dependency):
+        self.dependency = dependency
+        self.cache = caches[CIRCUIT_BREAKER_CACHE_ALIAS]
+
+    @staticmethod
+    def get_dependency(url):
+        """
+        Returns the dependency name of the host of the url, or None if the host is not a tracked dependency.
+        """
+        host = urlparse(url).hostname or ''
+        for host_suffix, dependency in DEPENDENCY_HOSTS.items():
+            if host == host_suffix or host.endswith(f'.{host_suffix}'):
+                return dependency
+        return None
+
+    @staticmethod
+    def get_horizon_dependency(network_name):
+        return 'horizon-public' if network_name == 'public' else 'horizon-testnet'
+
+    @classmethod
+    def for_url(cls, url):
+        dependency = cls.get_dependency(url)
+        if dependency is None:
+            return None
+        return cls(dependency=dependency)
+
+    def get_cache_key(self):
+        return f'circuit_breaker:{self.dependency}'
+
+    def get_state(self):
+        try:
+            state = self.cache.get(self.get_cache_key())
+        except Exception as e:
+            # a broken cache must not stop the calls
+            sentry_sdk.capture_exception(e)
+            state = None
+        return state or {'state': CLOSED, 'failures': 0, 'opened_at': 0, 'probe_until': 0}
+
+    def set_state(self, state):
+        try:
+            # never expire the circuit with the cache timeout
+            self.cache.set(self.get_cache_key(), state, timeout=None)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    def is_available(self):
+        """
+        Returns False while the circuit is open and cooling down, without taking the probe.
+        """
+        state = self.get_state()
+        if state['state'] == OPEN:
+            return time.time() - state['opened_at'] >= CIRCUIT_BREAKER_COOLDOWN_SECONDS
+        return True
+
+    def allow_request(self):
+        """
+        Returns True if a call may go through. After the cooldown of an open circuit
+        the first caller takes the probe and moves the circuit to HALF_OPEN.
+        """
+        state = self.get_state()
+        if state['state'] == CLOSED:
+            return True
+
+        now = time.time()
+        if state['state'] == OPEN and now - state['opened_at'] < CIRCUIT_BREAKER_COOLDOWN_SECONDS:
+            return False
+
+        if state['state'] == HALF_OPEN and state['probe_until'] > now:
+            # another caller is probing
+            return False
+
+        state['state'] = HALF_OPEN
+        state['probe_until'] = now + CIRCUIT_BREAKER_PROBE_SECONDS
+        self.set_state(state)
+        return True
+
+    def record_success(self):
+        state = self.get_state()
+        if state['state'] == CLOSED and state['failures'] == 0:
+            return
+        self.set_state({'state': CLOSED, 'failures': 0, 'opened_at': 0, 'probe_until': 0})
+
+    def record_failure(self, reason=''):
+        state = self.get_state()
+        state['failures'] += 1
+        if state['state'] == HALF_OPEN or state['failures'] >= CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            self.trip(reason=reason, failures=state['failures'])
+        else:
+            self.set_state(state)
+
+    def trip(self, reason='', failures=None):
+        """
+        Opens the circuit for CIRCUIT_BREAKER_COOLDOWN_SECONDS.
+
+        :param reason: the failure that opened the circuit, reported to Sentry
+        :param failures: the consecutive failures counted so far
+        """
+        if failures is None:
+            failures = max(self.get_state()['failures'], CIRCUIT_BREAKER_FAILURE_THRESHOLD)
+        self.set_state({'state': OPEN, 'failures': failures, 'opened_at': time.time(), 'probe_until': 0})
+        sentry_sdk.capture_message(f'circuit of {self.dependency} opened: {reason}')
+
+    @staticmethod
+    def is_failure_status(status_code):
+        return status_code == 429 or status_code >= 500
+
+    @classmethod
+    def before_request(cls, url):
+        """
+        Raises CircuitOpenError if the circuit of the dependency of the url rejects the call.
+        """
+        breaker = cls.for_url(url)
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError(dependency=breaker.dependency)
+
+    @classmethod
+    def after_response(cls, url, status_code):
+        breaker = cls.for_url(url)
+        if breaker is None:
+            return
+        if cls.is_failure_status(status_code):
+            breaker.record_failure(reason=f'HTTP {status_code} from {url}')
+        else:
+            breaker.record_success()
+
+    @classmethod
+    def after_exception(cls, url, e):
+        breaker = cls.for_url(url)
+        if breaker is not None:
+            breaker.record_failure(reason=f'{e}')
@@ -1,5 +1,8 @@
 import asyncio
 import json
+import os
+import threading
+from urllib.parse import urlparse
 
 import aiohttp
 import pandas as pd
@@ -11,6 +14,7 @@ from cassandra.query import dict_factory
 from decouple import config
 from django.conf import settings
 from django.http import HttpResponse
+from requests.adapters import HTTPAdapter
 
 APP_PATH = config('APP_PATH')
 CASSANDRA_DB_NAME = config('CASSANDRA_DB_NAME')
@@ -18,6 +22,81 @@ CASSANDRA_HOST = config('CASSANDRA_HOST')
 CLIENT_ID = config('CLIENT_ID')
 CLIENT_SECRET = config('CLIENT_SECRET')
 
+# connections kept alive per host and the default timeouts of the pooled HTTP sessions
+HTTP_POOL_CONNECTIONS = config('HTTP_POOL_CONNECTIONS', default=17, cast=int)
+HTTP_POOL_MAXSIZE = config('HTTP_POOL_MAXSIZE', default=71, cast=int)
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=7, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=31, cast=float)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """ HTTPAdapter applying the default timeouts to requests sent without one. """
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        return super().send(request, **kwargs)
+
+
+class StellarMapHTTPSessionHelpers:
+    """
+    A process-wide registry of pooled requests sessions, one per host, so outbound
+    calls reuse kept-alive connections instead of paying DNS, TCP and TLS setup on
+    every request.
+
+    The sessions are shared by every thread of the process (the connection pools of
+    urllib3 are thread safe) and created again after a fork. Pool sizes and timeouts
+    are set with HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT and
+    HTTP_READ_TIMEOUT.
+
+    Usage:
+    ```
+    session = StellarMapHTTPSessionHelpers.get_session(url)
+    response = session.get(url)
+    ```
+    """
+    sessions = {}
+    sessions_pid = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def create_session():
+        session = requests.Session()
+        adapter = TimeoutHTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @classmethod
+    def get_session(cls, url=None):
+        """
+        Returns the pooled session of the host of the url.
+
+        :param url: the request url; without one, the session shared by the other hosts
+        :return: the requests.Session
+        """
+        host = urlparse(url).netloc.lower() if url else ''
+        with cls.lock:
+            if cls.sessions_pid != os.getpid():
+                # connections must not be shared with the parent process
+                cls.sessions = {}
+                cls.sessions_pid = os.getpid()
+
+            session = cls.sessions.get(host)
+            if session is None:
+                session = cls.create_session()
+                cls.sessions[host] = session
+            return session
+
+    @classmethod
+    def close_sessions(cls):
+        with cls.lock:
+            if cls.sessions_pid == os.getpid():
+                for session in cls.sessions.values():
+                    session.close()
+            cls.sessions = {}
+            cls.sessions_pid = None
+
 
 class SiteChecker:
     """A class for checking the reachability of URLs."""
@@ -33,7 +112,7 @@ class SiteChecker:
             bool: True if the URL is reachable, False otherwise.
         """
         try:
-            response = requests.get(url)
+            response = StellarMapHTTPSessionHelpers.get_session(url).get(url)
             return True
         except requests.RequestException:
             return False
@@ -101,7 +180,7 @@ class StellarMapHTTPHelpers:
         """
         url = f"{self.url}"
         try:
-            response = requests.get(url)
+            response = StellarMapHTTPSessionHelpers.get_session(url).get(url)
             return self.handle_response(response)
         except requests.exceptions.RequestException as e:
             raise ValueError(f'Error: {e}')
@@ -151,21 +230,85 @@ class AsyncStellarMapHTTPHelpers:
             
 
 class CassandraConnectionsHelpers:
-    def __init__(self):
-        self.cloud_config = {
-            'secure_connect_bundle': f"{APP_PATH}/secure-connect-stellarmapdb.zip"
-        }
+    """
+    Runs raw CQL on a process-wide Cassandra session.
 
-        self.auth_provider = PlainTextAuthProvider(CLIENT_ID, CLIENT_SECRET)
-        self.cluster = Cluster(cloud=self.cloud_config, auth_provider=self.auth_provider, protocol_version=4)
-        self.session = self.cluster.connect(CASSANDRA_DB_NAME)
+    The Cluster is connected once per process (and again after a fork) and shared
+    by every instance, so creating a helper no longer opens a connection. CQL set
+    with parameters is prepared once per process and executed with bound values
+    instead of being formatted into the query string.
+
+    Usage:
+    ```
+    conn_helpers = CassandraConnectionsHelpers()
+    conn_helpers.set_cql_query("SELECT * FROM management_cron_health WHERE cron_name = ? ALLOW FILTERING")
+    conn_helpers.set_cql_parameters(['cron_health_check'])
+    rows = conn_helpers.execute_cql()
+    ```
+    """
+    shared_cluster = None
+    shared_session = None
+    shared_session_pid = None
+    prepared_statements = {}
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.session = self.get_session()
         self.cql_query = None
+        self.cql_parameters = None
+
+    @classmethod
+    def get_session(cls):
+        with cls.lock:
+            if cls.shared_session is None or cls.shared_session_pid != os.getpid():
+                cloud_config = {
+                    'secure_connect_bundle': f"{APP_PATH}/secure-connect-stellarmapdb.zip"
+                }
+
+                auth_provider = PlainTextAuthProvider(CLIENT_ID, CLIENT_SECRET)
+                cls.shared_cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider, protocol_version=4)
+                cls.shared_session = cls.shared_cluster.connect(CASSANDRA_DB_NAME)
+                cls.shared_session_pid = os.getpid()
+                cls.prepared_statements = {}
+            return cls.shared_session
+
+    @classmethod
+    def prepare(cls, cql):
+        """
+        Returns the prepared statement of the CQL, preparing it on first use.
+
+        :param cql: the CQL with ? placeholders
+        :return: the prepared statement
+        """
+        statement = cls.prepared_statements.get(cql)
+        if statement is None:
+            statement = cls.get_session().prepare(cql)
+            with cls.lock:
+                cls.prepared_statements[cql] = statement
+        return statement
+
+    @classmethod
+    def shutdown(cls):
+        with cls.lock:
+            if cls.shared_cluster is not None and cls.shared_session_pid == os.getpid():
+                cls.shared_cluster.shutdown()
+            cls.shared_cluster = None
+            cls.shared_session = None
+            cls.shared_session_pid = None
+            cls.prepared_statements = {}
 
     def set_cql_query(self, cql):
         self.cql_query = cql
 
+    def set_cql_parameters(self, parameters):
+        self.cql_parameters = parameters
+
     def execute_cql(self):
         try:
+            if self.cql_parameters is not None:
+                statement = self.prepare(self.cql_query)
+                return self.session.execute(statement, self.cql_parameters)
+
             rows = self.session.execute(self.cql_query)
             return rows
         except Exception as e:
@@ -173,5 +316,6 @@ class CassandraConnectionsHelpers:
             raise e
 
     def close_connection(self):
-        self.session.cluster.shutdown()
-        self.session.shutdown()
\ No newline at end of file
+        # the session is shared by the process; use CassandraConnectionsHelpers.shutdown() to close it
+        self.cql_query = None
+        self.cql_parameters = None
@@ -1,50 +1,312 @@
+import asyncio
+import functools
 import json
+import re
+import uuid
 
 import pandas as pd
 import sentry_sdk
-from apiApp.helpers.sm_horizon import StellarMapHorizonAPIParserHelpers
+from apiApp.helpers.env import EnvHelpers
+from apiApp.helpers.sm_horizon import (HORIZON_CONCURRENCY,
+                                       AsyncStellarMapHorizonAPIHelpers,
+                                       StellarMapHorizonAPIHelpers,
+                                       StellarMapHorizonAPIParserHelpers)
+from apiApp.helpers.sm_seindex import (StellarMapSEBlockedDomainsHelpers,
+                                       StellarMapSEDirectoryHelpers)
 from apiApp.helpers.sm_stellarexpert import (
     StellarMapStellarExpertAPIHelpers, StellarMapStellarExpertAPIParserHelpers)
 from apiApp.managers import StellarCreatorAccountLineageManager
-from apiApp.services import AstraDocument
+from apiApp.services import get_document_store
+from decouple import config
 from django.http import HttpRequest
 
+# Horizon datasets collected for a lineage row, keyed by the status the stage starts from
+HORIZON_API_DATASETS_STAGES = {
+    'PENDING_HORIZON_API_DATASETS': {
+        'in_progress_status': 'IN_PROGRESS_COLLECTING_HORIZON_API_DATASETS_ACCOUNTS',
+        'done_status': 'DONE_COLLECTING_HORIZON_API_DATASETS_ACCOUNTS',
+        'collections_name': 'horizon_accounts',
+        'doc_api_href_field': 'horizon_accounts_doc_api_href',
+        'cursor_field': None,
+        'external_path': 'accounts/{account_id}'
+    },
+    'DONE_COLLECTING_HORIZON_API_DATASETS_ACCOUNTS': {
+        'in_progress_status': 'IN_PROGRESS_COLLECTING_HORIZON_API_DATASETS_OPERATIONS',
+        'done_status': 'DONE_COLLECTING_HORIZON_API_DATASETS_OPERATIONS',
+        'collections_name': 'horizon_operations',
+        'doc_api_href_field': 'horizon_accounts_operations_doc_api_href',
+        'cursor_field': 'horizon_accounts_operations_cursor',
+        'external_path': 'accounts/{account_id}/operations'
+    },
+    'DONE_COLLECTING_HORIZON_API_DATASETS_OPERATIONS': {
+        'in_progress_status': 'IN_PROGRESS_COLLECTING_HORIZON_API_DATASETS_EFFECTS',
+        'done_status': 'DONE_HORIZON_API_DATASETS',
+        'collections_name': 'horizon_effects',
+        'doc_api_href_field': 'horizon_accounts_effects_doc_api_href',
+        'cursor_field': 'horizon_accounts_effects_cursor',
+        'external_path': 'accounts/{account_id}/effects'
+    }
+}
+
+# statuses enriched from the Horizon accounts document; the two last were left by the
+# retired assets and flags crons and are enriched again from the start
+ENRICHMENT_STATUSES = [
+    'DONE_HORIZON_API_DATASETS',
+    'DONE_UPDATING_FROM_RAW_DATA',
+    'DONE_UPDATING_HORIZON_ACCOUNTS_ASSETS_DOC_API_HREF'
+]
+
+# consecutive failed enrichments after which a record leaves the work queue
+# with the ERROR_ENRICHING_FROM_ACCOUNTS_RAW_DATA status
+ENRICHMENT_MAX_FAILURES = config('ENRICHMENT_MAX_FAILURES', default=3, cast=int)
+
 
 class StellarMapCreatorAccountLineageHelpers:
 
-    def async_update_from_accounts_raw_data(self, client_session, lin_queryset, *args, **kwargs):
+    async def collect_horizon_api_datasets_stage(self, lin_queryset, status, cron_name, concurrency=HORIZON_CONCURRENCY):
+        """
+        Collects the Horizon dataset of the stage starting at `status` for a lineage
+        record, stores it in the document store and saves the document href.
+
+        Cassandra and document store calls are blocking, so they run in threads
+        while the Horizon calls share the pooled AsyncStellarMapHorizonAPIHelpers session.
+
+        The record is claimed with a lease (see StellarCreatorAccountLineageManager.claim_lineage)
+        that is renewed after every page and released with the DONE_ status.
+
+        :param lin_queryset: the lineage record
+        :param status: the current status of the lineage record, a key of HORIZON_API_DATASETS_STAGES
+        :param cron_name: the name of the cron for reporting purposes
+        :param concurrency: maximum concurrent requests to Horizon
+        :return: the status the lineage record was moved to, or None if another worker claimed it
+        """
+        stage = HORIZON_API_DATASETS_STAGES[status]
+        lineage_manager = StellarCreatorAccountLineageManager()
+
+        # set environment
+        env_helpers = EnvHelpers()
+        network_name = lin_queryset.network_name
+        if network_name == 'public':
+            env_helpers.set_public_network()
+        else:
+            env_helpers.set_testnet_network()
+
+        horizon_url = env_helpers.get_base_horizon()
+        account_id = lin_queryset.stellar_account
+
+        # claim the record by updating status to IN_PROGRESS
+        lease_token = await asyncio.to_thread(
+            lineage_manager.claim_lineage,
+            lin_queryset=lin_queryset,
+            status=status,
+            in_progress_status=stage['in_progress_status']
+        )
+        if lease_token is None:
+            return None
+
+        sm_horizon_helpers = AsyncStellarMapHorizonAPIHelpers(horizon_url=horizon_url, account_id=account_id, concurrency=concurrency)
+        sm_horizon_helpers.set_cron_name(cron_name=cron_name)
+
+        cursor_field = stage['cursor_field']
+        if cursor_field is None:
+            # call horizon accounts
+            raw_data = await sm_horizon_helpers.get_base_accounts()
+
+            if raw_data is not None and 'data' in raw_data:
+                # Failed to PATCH document. Response: b'{"description":"Array paths contained in 
+                # square brackets, periods, single quotes, and backslash are not allowed in
+                # field names, invalid field config.memo_required","code":400}'
+                # list(raw_data['data'].keys()) creates a copy of the keys in the dictionary,
+                # which you can safely iterate over and modify raw_data['data'] using the original keys.
+                for key in list(raw_data['data'].keys()):
+                    new_key = re.sub(r'[^\w]+', '_', key)
+                    if key != new_key:
+                        # assign value
+                        raw_data['data'][new_key] = raw_data['data'][key]
+                        # remove original key
+                        raw_data['data'].pop(key)
+        else:
+            # store the cursor after every page without the account creation so an
+            # interrupted run resumes from it; the page holding the account creation
+            # is never stored, so a resumed run always reaches it again
+            async def save_cursor(cursor):
+                request = HttpRequest()
+                request.data = {
+                    cursor_field: cursor
+                }
+                lease_held = await asyncio.to_thread(lineage_manager.renew_lease, lin_queryset=lin_queryset, lease_token=lease_token, request=request)
+                if not lease_held:
+                    raise ValueError(f'Lost the lease on {account_id} while collecting {stage["collections_name"]}')
+
+            # call horizon operations or effects page by page until the account creation is found
+            sm_horizon_helpers.set_cursor(cursor=getattr(lin_queryset, cursor_field))
+            if stage['collections_name'] == 'horizon_operations':
+                raw_data = await sm_horizon_helpers.get_account_operations_paginated(on_page=save_cursor)
+            else:
+                raw_data = await sm_horizon_helpers.get_account_effects_paginated(on_page=save_cursor)
+
+        if raw_data is None:
+            raise ValueError(f"Failed to collect {stage['collections_name']} for {account_id} after cursor {sm_horizon_helpers.get_cursor()}")
+
+        # build external horizon url
+        external_url = f"{horizon_url}/{stage['external_path'].format(account_id=account_id)}"
+
+        # Create an instance of the configured document store
+        document_store = get_document_store()
+
+        # set documentid, reusing the document of the record when it is in the same store
+        doc_api_href = getattr(lin_queryset, stage['doc_api_href_field'])
+        doc_id = document_store.get_document_id(doc_api_href) if doc_api_href is not None else None
+        if doc_id is None:
+            doc_id = str(uuid.uuid4())
+
+        # store and patch in the document store
+        document_store.set_document_id(document_id=doc_id)
+        document_store.set_collections_name(collections_name=stage['collections_name'])
+        res_dict = await asyncio.to_thread(
+            document_store.patch_document,
+            stellar_account=account_id,
+            network_name=network_name,
+            external_url=external_url,
+            raw_data=raw_data,
+            cron_name=cron_name
+        )
+
+        # store document href on db
+        request = HttpRequest()
+        request.data = {
+            stage['doc_api_href_field']: res_dict.get("href"),
+            'status': stage['done_status']
+        }
+        if cursor_field is not None:
+            request.data[cursor_field] = None
+
+        # update lineage and release the lease
+        lease_held = await asyncio.to_thread(lineage_manager.release_lineage, lin_queryset=lin_queryset, lease_token=lease_token, request=request)
+        if not lease_held:
+            raise ValueError(f'Lost the lease on {account_id} while collecting {stage["collections_name"]}')
+
+        return stage['done_status']
+
+    async def collect_horizon_api_datasets_batch(self, lin_querysets, cron_name, concurrency=HORIZON_CONCURRENCY, max_stages=None, close_servers=True):
+        """
+        Runs the Horizon dataset stages of several lineage records concurrently.
+
+        The stages of one record run in order (accounts, operations, effects)
+        until DONE_HORIZON_API_DATASETS or `max_stages` is reached, or until
+        another worker claims the record. A failing record is reported to
+        Sentry without stopping the other records.
+
+        :param lin_querysets: the lineage records claimed by the caller
+        :param cron_name: the name of the cron for reporting purposes
+        :param concurrency: maximum concurrent requests to Horizon
+        :param max_stages: maximum stages per record, None for all remaining stages
+        :param close_servers: close the pooled Horizon sessions of the event loop when done
+        :return: list of the final status of each lineage record, None if claimed by another worker
+        """
+        async def collect_lineage(lin_queryset):
+            status = lin_queryset.status
+            stages_done = 0
+            try:
+                while status in HORIZON_API_DATASETS_STAGES and (max_stages is None or stages_done < max_stages):
+                    status = await self.collect_horizon_api_datasets_stage(
+                        lin_queryset=lin_queryset,
+                        status=status,
+                        cron_name=cron_name,
+                        concurrency=concurrency
+                    )
+                    stages_done += 1
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+            return status
 
+        try:
+            return await asyncio.gather(*[collect_lineage(lin_queryset) for lin_queryset in lin_querysets])
+        finally:
+            if close_servers:
+                await AsyncStellarMapHorizonAPIHelpers.close_servers()
+
+    def expire_horizon_api_datasets_leases(self, limit=100):
+        """
+        Returns records left IN_PROGRESS_COLLECTING_* by a crashed worker to the
+        status of their stage once their lease has expired, so they are claimed again.
+
+        :param limit: maximum IN_PROGRESS records to inspect
+        :return: the number of records returned to their stage
+        """
+        in_progress_to_status = {stage['in_progress_status']: status for status, stage in HORIZON_API_DATASETS_STAGES.items()}
+
+        lineage_manager = StellarCreatorAccountLineageManager()
+        lin_querysets = lineage_manager.get_queued_queryset(
+            statuses=list(in_progress_to_status.keys()),
+            limit=limit
+        )
+
+        expired = 0
+        for lin_queryset in lin_querysets:
+            if lineage_manager.expire_lease(lin_queryset=lin_queryset, status=in_progress_to_status[lin_queryset.status]):
+                expired += 1
+
+        return expired
+
+    def async_enrich_from_accounts_raw_data(self, client_session, lin_queryset, *args, **kwargs):
+        """
+        Enriches a lineage record from its Horizon accounts document in a single pass:
+        the document is fetched and parsed once for the XLM balance, home domain, assets
+        and flags, which are saved with one update.
+
+        A record whose enrichment fails is returned to DONE_HORIZON_API_DATASETS, so
+        the next run retries it, until ENRICHMENT_MAX_FAILURES consecutive failures
+        move it to ERROR_ENRICHING_FROM_ACCOUNTS_RAW_DATA, which no stage polls.
+
+        :param client_session: the requests session of the executor
+        :param lin_queryset: a lineage record with one of the statuses of ENRICHMENT_STATUSES
+        """
         try:
 
             # Create an instance of the manager
             lineage_manager = StellarCreatorAccountLineageManager()
 
             # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_FROM_RAW_DATA')
+            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_ENRICHING_FROM_ACCOUNTS_RAW_DATA', lineage=lin_queryset)
 
-            # Create an instance of Astra Document
-            astra_document = AstraDocument()
-            astra_document.set_datastax_url(datastax_url=lin_queryset.horizon_accounts_doc_api_href)
-            response_json = astra_document.get_document()
+            # Create an instance of the document store of the href
+            document_store = get_document_store(href=lin_queryset.horizon_accounts_doc_api_href)
+            response_dict = document_store.get_document()
 
             # Create an instance of StellarMapHorizonAPIParserHelpers
             api_parser = StellarMapHorizonAPIParserHelpers()
-            api_parser.set_datastax_response(datastax_response=response_json)
-            native_balance = api_parser.parse_account_native_balance()
-            home_domain = api_parser.parse_account_home_domain()
+            api_parser.set_datastax_response(datastax_response=response_dict)
 
-            # update lineage record
+            # update lineage record, ready for the Stellar Expert directory cron
             request = HttpRequest()
             request.data = {
-                'home_domain': home_domain,
-                'xlm_balance': native_balance,
-                'status': 'DONE_UPDATING_FROM_RAW_DATA'
+                'home_domain': api_parser.parse_account_home_domain(),
+                'xlm_balance': api_parser.parse_account_native_balance(),
+                'horizon_accounts_assets_doc_api_href': json.dumps(api_parser.parse_account_assets()),
+                'horizon_accounts_flags_doc_api_href': json.dumps(api_parser.parse_account_flags()),
+                'enrichment_failures': 0,
+                'status': 'DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF'
             }
 
-            lineage_manager.update_lineage(id=lin_queryset.id, request=request)
+            lineage_manager.update_lineage(id=lin_queryset.id, request=request, lineage=lin_queryset)
         except Exception as e:
             sentry_sdk.capture_exception(e)
 
+            # return the record to the status polled by the enrichment stage, or take it
+            # out of the work queue once it failed ENRICHMENT_MAX_FAILURES times
+            if lin_queryset.status == 'IN_PROGRESS_ENRICHING_FROM_ACCOUNTS_RAW_DATA':
+                enrichment_failures = (lin_queryset.enrichment_failures or 0) + 1
+                request = HttpRequest()
+                request.data = {
+                    'enrichment_failures': enrichment_failures,
+                    'status': 'ERROR_ENRICHING_FROM_ACCOUNTS_RAW_DATA' if enrichment_failures >= ENRICHMENT_MAX_FAILURES else 'DONE_HORIZON_API_DATASETS'
+                }
+                try:
+                    lineage_manager.update_lineage(id=lin_queryset.id, request=request, lineage=lin_queryset)
+                except Exception as e:
+                    sentry_sdk.capture_exception(e)
+
     def async_update_from_operations_raw_data(self, client_session, lin_queryset, *args, **kwargs):
 
         try:
@@ -53,17 +315,29 @@ class StellarMapCreatorAccountLineageHelpers:
             lineage_manager = StellarCreatorAccountLineageManager()
 
             # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_FROM_OPERATIONS_RAW_DATA')
+            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_FROM_OPERATIONS_RAW_DATA', lineage=lin_queryset)
 
-            # Create an instance of Astra Document
-            astra_document = AstraDocument()
-            astra_document.set_datastax_url(datastax_url=lin_queryset.horizon_accounts_operations_doc_api_href)
-            response_json = astra_document.get_document()
+            # set environment
+            env_helpers = EnvHelpers()
+            if lin_queryset.network_name == 'public':
+                env_helpers.set_public_network()
+            else:
+                env_helpers.set_testnet_network()
 
-            # Create an instance of StellarMapHorizonAPIParserHelpers
-            api_parser = StellarMapHorizonAPIParserHelpers()
-            api_parser.set_datastax_response(datastax_response=response_json)
-            creator_dict = api_parser.parse_operations_creator_account(stellar_account=lin_queryset.stellar_account)
+            # ask Horizon for the oldest operation directly instead of round-tripping the operations document
+            sm_horizon_helpers = StellarMapHorizonAPIHelpers(horizon_url=env_helpers.get_base_horizon(), account_id=lin_queryset.stellar_account)
+            sm_horizon_helpers.set_cron_name(cron_name='cron_collect_account_lineage_creator')
+            creator_dict = sm_horizon_helpers.get_account_creator()
+
+            if creator_dict is None:
+                # Horizon request failed; fall back to the stored operations document
+                document_store = get_document_store(href=lin_queryset.horizon_accounts_operations_doc_api_href)
+                response_json = document_store.get_document()
+
+                # Create an instance of StellarMapHorizonAPIParserHelpers
+                api_parser = StellarMapHorizonAPIParserHelpers()
+                api_parser.set_datastax_response(datastax_response=response_json)
+                creator_dict = api_parser.parse_operations_creator_account(stellar_account=lin_queryset.stellar_account)
 
             # update lineage record
             request = HttpRequest()
@@ -79,7 +353,7 @@ class StellarMapCreatorAccountLineageHelpers:
                     'status': 'DONE_COLLECTING_CREATOR_ACCOUNT'
                 }
 
-            lineage_manager.update_lineage(id=lin_queryset.id, request=request)
+            lineage_manager.update_lineage(id=lin_queryset.id, request=request, lineage=lin_queryset)
         except Exception as e:
             sentry_sdk.capture_exception(e)
 
@@ -91,7 +365,7 @@ class StellarMapCreatorAccountLineageHelpers:
             lineage_manager = StellarCreatorAccountLineageManager()
 
             # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_MAKE_GRANDPARENT_LINEAGE')
+            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_MAKE_GRANDPARENT_LINEAGE', lineage=lin_queryset)
 
             # creator account queryset
             new_lin_manager = StellarCreatorAccountLineageManager()
@@ -104,7 +378,7 @@ class StellarMapCreatorAccountLineageHelpers:
             if new_lin_queryset:
                 # update grandparent lineage record
                 # TODO: update datetime only if 3 hours passed
-                new_lin_manager.update_status(id=new_lin_queryset.id, status=PENDING)
+                new_lin_queryset = new_lin_manager.update_status(id=new_lin_queryset.id, status=PENDING, lineage=new_lin_queryset)
             else:
                 # create grandparent lineage record
                 request = HttpRequest()
@@ -114,77 +388,15 @@ class StellarMapCreatorAccountLineageHelpers:
                     'status': PENDING
                 }
 
-                new_lin_manager.create_lineage(request)
-            
-            lineage_manager.update_status(id=lin_queryset.id, status='DONE_MAKE_GRANDPARENT_LINEAGE')
-        except Exception as e:
-            sentry_sdk.capture_exception(e)
-
-    def async_horizon_accounts_assets_doc_api_href_from_accounts_raw_data(self, client_session, lin_queryset, *args, **kwargs):
-
-        try:
-
-            # Create an instance of the manager
-            lineage_manager = StellarCreatorAccountLineageManager()
-
-            # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_HORIZON_ACCOUNTS_ASSETS_DOC_API_HREF')
-
-            # Create an instance of Astra Document
-            astra_document = AstraDocument()
-            astra_document.set_datastax_url(datastax_url=lin_queryset.horizon_accounts_doc_api_href)
-            response_dict = astra_document.get_document()
-
-            # Create an instance of StellarMapHorizonAPIParserHelpers
-            api_parser = StellarMapHorizonAPIParserHelpers()
-            api_parser.set_datastax_response(datastax_response=response_dict)
-            account_assets_dict = api_parser.parse_account_assets()
-
-            # Converting dictionary to JSON string
-            json_string = json.dumps(account_assets_dict)
-
-            # update lineage record
-            request = HttpRequest()
-            request.data = {
-                'horizon_accounts_assets_doc_api_href': json_string,
-                'status': 'DONE_UPDATING_HORIZON_ACCOUNTS_ASSETS_DOC_API_HREF'
-            }
-
-            lineage_manager.update_lineage(id=lin_queryset.id, request=request)
-        except Exception as e:
-            sentry_sdk.capture_exception(e)
-
-    def async_horizon_accounts_flags_doc_api_href_from_accounts_raw_data(self, client_session, lin_queryset, *args, **kwargs):
-
-        try:
-
-            # Create an instance of the manager
-            lineage_manager = StellarCreatorAccountLineageManager()
-
-            # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF')
-
-            # Create an instance of Astra Document
-            astra_document = AstraDocument()
-            astra_document.set_datastax_url(datastax_url=lin_queryset.horizon_accounts_doc_api_href)
-            response_dict = astra_document.get_document()
+                new_lin_queryset = new_lin_manager.create_lineage(request)
 
-            # Create an instance of StellarMapHorizonAPIParserHelpers
-            api_parser = StellarMapHorizonAPIParserHelpers()
-            api_parser.set_datastax_response(datastax_response=response_dict)
-            account_flags_dict = api_parser.parse_account_flags()
-
-            # Converting dictionary to JSON string
-            json_string = json.dumps(account_flags_dict)
-
-            # update lineage record
-            request = HttpRequest()
-            request.data = {
-                'horizon_accounts_flags_doc_api_href': json_string,
-                'status': 'DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF'
-            }
+            # extend the materialized ancestor path from the creator's stored path
+            lineage_manager.refresh_ancestor_path(lineage=lin_queryset)
+            
+            lineage_manager.update_status(id=lin_queryset.id, status='DONE_MAKE_GRANDPARENT_LINEAGE', lineage=lin_queryset)
 
-            lineage_manager.update_lineage(id=lin_queryset.id, request=request)
+            # the creator's lineage record, so the pipeline can start it right away
+            return new_lin_queryset
         except Exception as e:
             sentry_sdk.capture_exception(e)
 
@@ -196,36 +408,53 @@ class StellarMapCreatorAccountLineageHelpers:
             lineage_manager = StellarCreatorAccountLineageManager()
 
             # update status to IN_PROGRESS
-            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_HORIZON_ACCOUNTS_SE_DIRECTORY')
+            lineage_manager.update_status(id=lin_queryset.id, status='IN_PROGRESS_UPDATING_HORIZON_ACCOUNTS_SE_DIRECTORY', lineage=lin_queryset)
 
-            # Request SE to GET directory for account
-            se_helpers = StellarMapStellarExpertAPIHelpers(lin_queryset=lin_queryset)
+            # Request SE to GET directory for account over the pooled session of the worker
+            se_helpers = StellarMapStellarExpertAPIHelpers(lin_queryset=lin_queryset, session=client_session)
 
             # Collecting stellar_account code, issuer and type
             se_parser = StellarMapStellarExpertAPIParserHelpers(lin_queryset=lin_queryset)
             asset_dict = se_parser.parse_asset_code_issuer_type()
 
             # Collect all SE API responses
-            comprehensive_se_responses = {}
+            comprehensive_se_responses = {
+                'se_asset_list': None,
+                'se_asset_rating': None,
+                'se_blocked_domain': None,
+                'se_account_directory': None
+            }
+
+            # the SE calls that need the network, issued concurrently
+            se_calls = {}
 
             # Get SE asset list
-            comprehensive_se_responses['se_asset_list'] = se_helpers.get_se_asset_list()
+            se_calls['se_asset_list'] = se_helpers.get_se_asset_list
 
-            # Get SE asset rating
-            try:
-                comprehensive_se_responses['se_asset_rating'] = se_helpers.get_se_asset_rating(asset_code=asset_dict['asset_code'], asset_type=asset_dict['asset_type'])
-            except KeyError:
-                # Handle the KeyError when asset_dict is empty
-                comprehensive_se_responses['se_asset_rating'] = None
+            # Get SE asset rating when the account issues an asset
+            if 'asset_code' in asset_dict and 'asset_type' in asset_dict:
+                se_calls['se_asset_rating'] = functools.partial(se_helpers.get_se_asset_rating, asset_code=asset_dict['asset_code'], asset_type=asset_dict['asset_type'])
 
             # Get SE blocked domain
-            if lin_queryset.home_domain == "no_element_home_domain":
-                comprehensive_se_responses['se_blocked_domain'] = None 
-            else: 
-                comprehensive_se_responses['se_blocked_domain'] = se_helpers.get_se_blocked_domain(asset_domain=lin_queryset.home_domain)
+            if lin_queryset.home_domain != "no_element_home_domain":
+                blocked_domains_helpers = StellarMapSEBlockedDomainsHelpers()
+                if blocked_domains_helpers.is_loaded():
+                    # look up the local index of blocked domains
+                    comprehensive_se_responses['se_blocked_domain'] = blocked_domains_helpers.get_blocked_domain(domain=lin_queryset.home_domain)
+                else:
+                    # the index has never been synced
+                    se_calls['se_blocked_domain'] = functools.partial(se_helpers.get_se_blocked_domain, asset_domain=lin_queryset.home_domain)
 
             # Get SE account directory
-            comprehensive_se_responses['se_account_directory'] = se_helpers.get_se_account_directory()
+            directory_helpers = StellarMapSEDirectoryHelpers(network_name=lin_queryset.network_name)
+            if directory_helpers.is_loaded():
+                # look up the local index of the directory
+                comprehensive_se_responses['se_account_directory'] = directory_helpers.get_account_directory(stellar_account=lin_queryset.stellar_account)
+            else:
+                # the index has never been synced
+                se_calls['se_account_directory'] = se_helpers.get_se_account_directory
+
+            comprehensive_se_responses.update(se_helpers.gather_se_responses(se_calls))
 
             # Converting dictionary to JSON string
             json_string = json.dumps(comprehensive_se_responses)
@@ -237,66 +466,52 @@ class StellarMapCreatorAccountLineageHelpers:
                 'status': 'DONE_UPDATING_HORIZON_ACCOUNTS_SE_DIRECTORY'
             }
 
-            lineage_manager.update_lineage(id=lin_queryset.id, request=request)
+            lineage_manager.update_lineage(id=lin_queryset.id, request=request, lineage=lin_queryset)
         except Exception as e:
             sentry_sdk.capture_exception(e)
 
-    def get_account_genealogy(self, stellar_account, network_name):
-        try:
-            # loop until no records returned or stellar_creator_account is "no_element_funder"
-            # init variables
-            has_creator_account = True
-            creator_account_in_loop = stellar_account
-            network_in_loop = network_name
-            
-            # empty list
-            queryset_list = []
-            row_dict = {}
+    def get_account_genealogy_querysets(self, stellar_account, network_name):
+        # resolve the creator chain up to the root with batched reads
+        lin_manager = StellarCreatorAccountLineageManager()
+        genealogies = lin_manager.get_genealogies(
+            stellar_accounts=[stellar_account],
+            network_name=network_name
+        )
+        return genealogies.get(stellar_account, [])
 
-            while (has_creator_account == True):
-                # query account queryset
-                lin_manager = StellarCreatorAccountLineageManager()
-                lin_queryset = lin_manager.get_queryset(
-                    stellar_account=creator_account_in_loop,
-                    network_name=network_in_loop
+    def get_account_genealogy(self, stellar_account, network_name, lin_querysets=None):
+        try:
+            if lin_querysets is None:
+                lin_querysets = self.get_account_genealogy_querysets(
+                    stellar_account=stellar_account,
+                    network_name=network_name
                 )
 
-                # if query returns a record
-                if (lin_queryset is not None):
-
-                    # set creator_account and network variable from query
-                    creator_account_in_loop = lin_queryset.stellar_creator_account
-                    network_in_loop = lin_queryset.network_name
-
-                    # queryset to dict
-                    '''
-                    {
-                        'id': UUID('51db8d0b-76a6-4961-9b3d-243f4f5479bb'), 
-                        'account_active': None, 
-                        'stellar_creator_account': 'GCGNWKCJ3KHRLPM3TM6N7D3W5YKDJFL6A2YCXFXNMRTZ4Q66MEMZ6FI2', 
-                        'stellar_account': 'GCF7F72LNF3ODSJIIWPJWEVWX33VT2SVZSUQ5NMDKDLK3N2NFCUAUHPT',
-                        'stellar_account_created_at': datetime.datetime(2019, 4, 16, 19, 51, 54),
-                        'network_name': 'public',
-                        'home_domain': 'no_element_home_domain',
-                        'xlm_balance': 0.0,
-                        'horizon_accounts_doc_api_href': '...horizon_accounts/a7a3affd-95d6-4de9-88d4-254acc9e3d8f',
-                        'horizon_accounts_operations_doc_api_href': '...horizon_operations/1419f099-ef61-4112-861b-1f94552fab53',
-                        'horizon_accounts_effects_doc_api_href': '...horizon_effects/3b993958-8d3b-4d59-9146-e41cda66054f',
-                        'stellar_expert_explorer_account_doc_api_href': None,
-                        'status': 'DONE_MAKE_GRANDPARENT_LINEAGE',
-                        'created_at': datetime.datetime(2023, 3, 14, 0, 31, 36),
-                        'updated_at': datetime.datetime(2023, 3, 14, 0, 36, 37),
-                        'stellar_expert_explorer_directory_doc_api_href': None
-                    }
-                    '''
-                    row_dict = {field_name: getattr(lin_queryset, field_name) for field_name in lin_queryset._values.keys()}
-                
-                    # append row to list
-                    queryset_list.append(row_dict)
-                
-                else:
-                    # exits loop
-                    has_creator_account = False
+            # querysets to dicts
+            '''
+            {
+                'id': UUID('51db8d0b-76a6-4961-9b3d-243f4f5479bb'), 
+                'account_active': None, 
+                'stellar_creator_account': 'GCGNWKCJ3KHRLPM3TM6N7D3W5YKDJFL6A2YCXFXNMRTZ4Q66MEMZ6FI2', 
+                'stellar_account': 'GCF7F72LNF3ODSJIIWPJWEVWX33VT2SVZSUQ5NMDKDLK3N2NFCUAUHPT',
+                'stellar_account_created_at': datetime.datetime(2019, 4, 16, 19, 51, 54),
+                'network_name': 'public',
+                'home_domain': 'no_element_home_domain',
+                'xlm_balance': 0.0,
+                'horizon_accounts_doc_api_href': '...horizon_accounts/a7a3affd-95d6-4de9-88d4-254acc9e3d8f',
+                'horizon_accounts_operations_doc_api_href': '...horizon_operations/1419f099-ef61-4112-861b-1f94552fab53',
+                'horizon_accounts_effects_doc_api_href': '...horizon_effects/3b993958-8d3b-4d59-9146-e41cda66054f',
+                'stellar_expert_explorer_account_doc_api_href': None,
+                'status': 'DONE_MAKE_GRANDPARENT_LINEAGE',
+                'created_at': datetime.datetime(2023, 3, 14, 0, 31, 36),
+                'updated_at': datetime.datetime(2023, 3, 14, 0, 36, 37),
+                'stellar_expert_explorer_directory_doc_api_href': None
+            }
+            '''
+            queryset_list = [
+                {field_name: getattr(lin_queryset, field_name) for field_name in lin_queryset._values.keys()}
+                for lin_queryset in lin_querysets
+            ]
 
             if queryset_list:
                 # list is not empty
@@ -388,10 +603,9 @@ class StellarMapCreatorAccountLineageHelpers:
                     network_name=row['network_name']
                 )
 
-                # Create an instance of Astra Document
-                astra_document = AstraDocument()
-                astra_document.set_datastax_url(datastax_url=lin_queryset.horizon_accounts_doc_api_href)
-                response_json = astra_document.get_document()
+                # Create an instance of the document store of the href
+                document_store = get_document_store(href=lin_queryset.horizon_accounts_doc_api_href)
+                response_json = document_store.get_document()
 
                 # Create an instance of StellarMapHorizonAPIParserHelpers
                 api_parser = StellarMapHorizonAPIParserHelpers()
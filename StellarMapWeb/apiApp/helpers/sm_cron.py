@@ -1,4 +1,6 @@
 import sentry_sdk
+from apiApp.helpers.sm_cache import StellarMapCronHealthCacheHelpers
+from apiApp.helpers.sm_circuitbreaker import StellarMapCircuitBreakerHelpers
 from apiApp.managers import ManagementCronHealthManager
 from django.http import HttpRequest
 
@@ -17,10 +19,13 @@ class StellarMapCronHelpers:
     def check_cron_health(self):
         """
         This method is called ONLY from a cron to check the health of the cron.
-        It retrieves the most recent record of the cron based on name.
+        It looks up the most recent record of the cron in the cron health snapshot.
         If the record exists and the status is 'HEALTHY', returns True.
         If the record exists and the status is not 'HEALTHY', returns False.
         If the record does not exist, creates an initial record with the given cron_name and status, and returns True.
+
+        The snapshot holds the latest status of every cron, read in one query and
+        cached for CRON_HEALTH_CACHE_SECONDS, so most ticks do not query the database.
         
         Returns:
             bool: returns True if the cron is healthy or initial record is created, False otherwise
@@ -29,18 +34,25 @@ class StellarMapCronHelpers:
         try:
 
             # check most recent record of the cron based on name
-            cron_health = ManagementCronHealthManager()
-            cron_health_df = cron_health.get_latest_record(cron_name=self.cron_name)
+            cron_health_snapshot = self.get_health_snapshot()
 
-            # check if the df is empty
-            if not cron_health_df.empty:
+            if self.cron_name in cron_health_snapshot:
                 # if cron health exists and HEALTHY
-                if cron_health_df['status'] == 'HEALTHY':
+                if cron_health_snapshot[self.cron_name]['status'] == 'HEALTHY':
                     return True
                 else:
                     # stop cron from executing
                     return False
 
+            # not in the snapshot; read the cron itself
+            cron_health = ManagementCronHealthManager()
+            cron_health_df = cron_health.get_latest_record(cron_name=self.cron_name)
+
+            # check if the df is empty
+            if not cron_health_df.empty:
+                StellarMapCronHealthCacheHelpers().invalidate()
+                return cron_health_df['status'] == 'HEALTHY'
+
             else:
                 # df is empty; create initial cron record
                 request = HttpRequest()
@@ -54,6 +66,51 @@ class StellarMapCronHelpers:
             sentry_sdk.capture_exception(e)
             return False
 
+    def get_health_snapshot(self):
+        """
+        Returns the latest status of every cron, from the 'cron_health' cache when
+        the snapshot has not expired, or else from one read of
+        management_cron_health_latest.
+
+        Returns:
+            dict: cron_name to {'status': ..., 'created_at': ...}
+        """
+        cache_helpers = StellarMapCronHealthCacheHelpers()
+        cron_health_snapshot = cache_helpers.get_snapshot()
+
+        if cron_health_snapshot is None:
+            cron_health_snapshot = {
+                cron_name: {'status': latest_record_df['status'], 'created_at': latest_record_df['created_at']}
+                for cron_name, latest_record_df in ManagementCronHealthManager().get_latest_records().items()
+            }
+            cache_helpers.set_snapshot(cron_health_snapshot)
+
+        return cron_health_snapshot
+
+    def get_available_network_names(self, dependencies, network_names=('testnet', 'public')):
+        """
+        Returns the networks the cron can work on: those where none of the external
+        dependencies of the cron has an open circuit, so a failing dependency only
+        stops the crons and networks that need it.
+
+        Args:
+            dependencies (list): dependencies of the cron ('horizon' for the Horizon
+                server of each network, 'stellar-expert' or 'astra-docs')
+            network_names (tuple): the networks to check
+
+        Returns:
+            list: the available network names
+        """
+        available_network_names = []
+        for network_name in network_names:
+            network_dependencies = [
+                StellarMapCircuitBreakerHelpers.get_horizon_dependency(network_name) if dependency == 'horizon' else dependency
+                for dependency in dependencies
+            ]
+            if all(StellarMapCircuitBreakerHelpers(dependency=dependency).is_available() for dependency in network_dependencies):
+                available_network_names.append(network_name)
+        return available_network_names
+
     def set_crons_unhealthy(self):
         try:
             # query all latest distinct cron names
@@ -92,24 +149,13 @@ class StellarMapCronHelpers:
 
     def check_all_crons_health(self):
         try:
-            cron_names_list = ManagementCronHealthManager().get_distinct_cron_names()
+            # the latest record of every cron in one read of management_cron_health_latest
+            latest_records = ManagementCronHealthManager().get_latest_records()
             cron_health = {}
 
-            if cron_names_list:
-                for elmnt in cron_names_list:
-                    cron_name = elmnt
-                    latest_record_df = ManagementCronHealthManager().get_latest_record(cron_name=cron_name)
-
-                    # check if the df is empty
-                    if not latest_record_df.empty:
-                        # df is not empty; 
-                        cron_health[latest_record_df['cron_name']] = {'status': latest_record_df['status'], 'created_at': latest_record_df['created_at']}
+            for cron_name, latest_record_df in latest_records.items():
+                cron_health[cron_name] = {'status': latest_record_df['status'], 'created_at': latest_record_df['created_at']}
 
             return cron_health
         except Exception as e:
             sentry_sdk.capture_exception(e)
-
-
-
-
-
@@ -1,11 +1,22 @@
+import asyncio
 import json
 
 import sentry_sdk
 from apiApp.helpers.sm_datetime import StellarMapDateTimeHelpers
+from apiApp.helpers.sm_circuitbreaker import (CircuitOpenError,
+                                             StellarMapCircuitBreakerHelpers)
+from apiApp.helpers.sm_ratelimit import (RateLimitedAiohttpClient,
+                                         RateLimitedRequestsClient)
 from apiApp.helpers.sm_utils import StellarMapUtilityHelpers
 from apiApp.services import AstraDocument
-from stellar_sdk import Server
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from decouple import config
+from stellar_sdk import Server, ServerAsync
+from tenacity import (retry, retry_if_not_exception_type, stop_after_attempt,
+                      wait_random_exponential)
+
+HORIZON_POOL_SIZE = config('HORIZON_POOL_SIZE', default=71, cast=int)
+HORIZON_CONCURRENCY = config('HORIZON_CONCURRENCY', default=17, cast=int)
+HORIZON_REQUEST_TIMEOUT = config('HORIZON_REQUEST_TIMEOUT', default=11, cast=float)
 
 
 class StellarMapHorizonAPIHelpers:
@@ -24,9 +35,11 @@ class StellarMapHorizonAPIHelpers:
             `retry_error_callback=on_retry_failure` specifies a callback function that will be 
             called every time a retry fails. In this case, it is the function on_retry_failure, 
             which is expected to handle the error, such as logging the exception to Sentry, and 
-            performing any necessary cleanup, reporting and then sets the cron jobs as 'UNHEALTHY_'
+            performing any necessary cleanup, reporting and then opens the circuit of the
+            dependency, which stops only the crons that need it.
 
-            `cron_health_check` will set the crons to 'HEALTHY_' after 1.7 hours of buffer.
+            `retry=retry_if_not_exception_type(CircuitOpenError)` fails fast instead of retrying
+            while the circuit of the dependency is open.
     """
 
     def __init__(self, horizon_url, account_id):
@@ -38,8 +51,10 @@ class StellarMapHorizonAPIHelpers:
         :param account_id: Account ID
         :type account_id: str
         """
-        self.server = Server(horizon_url=horizon_url) # Create a server instance with the given horizon API URL
+        self.server = Server(horizon_url=horizon_url, client=RateLimitedRequestsClient(horizon_url=horizon_url)) # Create a server instance with the given horizon API URL
         self.account_id = account_id
+        self.cursor = None # paging_token of the last record collected by a paginated call
+        self.dependency = StellarMapCircuitBreakerHelpers.get_dependency(horizon_url) # circuit breaker of the horizon network
 
     def set_cron_name(self, cron_name):
         """
@@ -58,12 +73,25 @@ class StellarMapHorizonAPIHelpers:
     def get_cron_name(self):
         return self.cron_name
 
+    def set_cursor(self, cursor):
+        """
+        Set the Horizon paging_token to resume a paginated call from.
+
+        Args:
+            cursor (str): The paging_token of the last record already collected.
+        """
+        self.cursor = cursor
+
+    def get_cursor(self):
+        return self.cursor
+
     def on_retry_failure(self, retry_state):
         sm_util = StellarMapUtilityHelpers()
-        sm_util.on_retry_failure(retry_state, self.cron_name)
+        sm_util.on_retry_failure(retry_state, self.cron_name, dependency=self.dependency)
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
        stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
        retry_error_callback=on_retry_failure)
     def get_base_accounts(self):
         """
@@ -81,6 +109,7 @@ class StellarMapHorizonAPIHelpers:
     
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
        stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
        retry_error_callback=on_retry_failure)
     def get_account_operations(self):
         """
@@ -98,6 +127,36 @@ class StellarMapHorizonAPIHelpers:
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
        stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    def get_account_creator(self):
+        """
+        Gets the creator of the account specified.
+
+        The create_account operation is always the first operation of an
+        account, so only the oldest operation is requested from Horizon.
+
+        :return: Dictionary with the funder and created_at, an empty dictionary
+            if the first operation is not a create_account (e.g. the root account),
+            or None if the request failed
+        :rtype: dict
+        """
+        try:
+            # Fetch the oldest operation for the specified account
+            ops = self.server.operations().for_account(account_id=self.account_id).order(desc=False).limit(1).call()
+
+            # parse the horizon page as if it was stored in the document API
+            api_parser = StellarMapHorizonAPIParserHelpers()
+            api_parser.set_datastax_response(datastax_response={'data': {'raw_data': ops}})
+            creator_dict = api_parser.parse_operations_creator_account(stellar_account=self.account_id)
+
+            return creator_dict or {}
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
        retry_error_callback=on_retry_failure)
     def get_account_effects(self):
         """
@@ -112,9 +171,141 @@ class StellarMapHorizonAPIHelpers:
             return efxs
         except Exception as e:
             sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    def get_records_page(self, call_builder):
+        """
+        Gets a single page of records from a Horizon call builder.
+
+        The exception is re-raised after being reported so that tenacity
+        retries this page only, instead of restarting the whole collection.
+
+        :param call_builder: Call builder with limit, order and cursor already set
+        :type call_builder: stellar_sdk.call_builder.BaseCallBuilder
+        :return: Horizon page
+        :rtype: json
+        """
+        try:
+            return call_builder.call()
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def paginate_records(self, make_call_builder, limit=200, stop_on_record=None, on_page=None):
+        """
+        Streams the pages of a Horizon collection in ascending order, starting
+        after `self.cursor`, until the last page or until `stop_on_record` matches.
+
+        :param make_call_builder: Callable returning a new call builder for the account
+        :type make_call_builder: callable
+        :param limit: Records per page (Horizon maximum is 200)
+        :type limit: int
+        :param stop_on_record: Predicate on a record; paging ends after the page holding a match
+        :type stop_on_record: callable
+        :param on_page: Callback receiving the cursor after each page without a
+            `stop_on_record` match, used to persist progress
+        :type on_page: callable
+        :return: Horizon-shaped page holding the records of every page collected,
+            or None when a page could not be retrieved (`self.cursor` is kept for resuming).
+            A run resumed from a cursor that ends without a `stop_on_record` match
+            collects again from the first page.
+        :rtype: json
+        """
+        records = []
+        links = {}
+        resumed = bool(self.cursor)
+        found = False
+
+        while True:
+            call_builder = make_call_builder().limit(limit).order(desc=False)
+            if self.cursor:
+                call_builder = call_builder.cursor(self.cursor)
+
+            page = self.get_records_page(call_builder)
+            if page is None:
+                return None
+
+            page_records = page['_embedded']['records']
+            links = page.get('_links', {})
+            records.extend(page_records)
+
+            found = stop_on_record is not None and any(stop_on_record(record) for record in page_records)
+            if page_records:
+                self.cursor = page_records[-1]['paging_token']
+                # only the pages without the stop record are reported, so an
+                # interrupted run never resumes after the stop record
+                if on_page is not None and not found:
+                    on_page(self.cursor)
+
+            # a short page is the last page of the collection
+            if len(page_records) < limit or found:
+                break
+
+        if resumed and stop_on_record is not None and not found:
+            # the cursor was past the stop record; collect again from the first page
+            self.cursor = None
+            return self.paginate_records(make_call_builder, limit=limit, stop_on_record=stop_on_record, on_page=on_page)
+
+        return {'_links': links, '_embedded': {'records': records}}
+
+    def get_account_operations_paginated(self, limit=200, stop_at_create_account=True, on_page=None):
+        """
+        Gets the operations for the account specified across all pages.
+
+        Paging stops once the `create_account` operation of the account is
+        collected, since that is the only record the lineage needs.
+
+        :param limit: Records per page
+        :type limit: int
+        :param stop_at_create_account: Stop paging once the create_account operation is found
+        :type stop_at_create_account: bool
+        :param on_page: Callback receiving the cursor after each page
+        :type on_page: callable
+        :return: Operations of every page collected
+        :rtype: json
+        """
+        def is_create_account(record):
+            return record.get('type') == 'create_account' and record.get('account') == self.account_id
+
+        return self.paginate_records(
+            make_call_builder=lambda: self.server.operations().for_account(account_id=self.account_id),
+            limit=limit,
+            stop_on_record=is_create_account if stop_at_create_account else None,
+            on_page=on_page
+        )
+
+    def get_account_effects_paginated(self, limit=200, stop_at_account_created=True, on_page=None):
+        """
+        Gets the effects for the account specified across all pages.
+
+        Paging stops once the `account_created` effect of the account is
+        collected, mirroring get_account_operations_paginated().
+
+        :param limit: Records per page
+        :type limit: int
+        :param stop_at_account_created: Stop paging once the account_created effect is found
+        :type stop_at_account_created: bool
+        :param on_page: Callback receiving the cursor after each page
+        :type on_page: callable
+        :return: Effects of every page collected
+        :rtype: json
+        """
+        def is_account_created(record):
+            return record.get('type') == 'account_created' and record.get('account') == self.account_id
+
+        return self.paginate_records(
+            make_call_builder=lambda: self.server.effects().for_account(account_id=self.account_id),
+            limit=limit,
+            stop_on_record=is_account_created if stop_at_account_created else None,
+            on_page=on_page
+        )
     
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
        stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
        retry_error_callback=on_retry_failure)
     def get_account_transactions(self):
         """
@@ -131,6 +322,337 @@ class StellarMapHorizonAPIHelpers:
             sentry_sdk.capture_exception(e)
 
 
+class AsyncStellarMapHorizonAPIHelpers:
+    """
+    This class provides the StellarMapHorizonAPIHelpers calls using asyncio.
+
+    Every instance for the same Horizon URL shares one process-wide
+    `ServerAsync`, so all accounts processed in the event loop reuse the
+    pooled aiohttp connections (and their TLS sessions) of that network.
+    Concurrent requests per network are capped by a shared semaphore.
+
+    Note:
+        Configured with `HORIZON_POOL_SIZE`, `HORIZON_CONCURRENCY` and
+        `HORIZON_REQUEST_TIMEOUT` in the environment. The retries are the
+        same as StellarMapHorizonAPIHelpers.
+
+    Usage:
+    ```
+    async def collect(account_ids):
+        try:
+            helpers = [AsyncStellarMapHorizonAPIHelpers(horizon_url, account_id) for account_id in account_ids]
+            return await asyncio.gather(*[h.get_base_accounts() for h in helpers])
+        finally:
+            await AsyncStellarMapHorizonAPIHelpers.close_servers()
+    ```
+    """
+
+    # (horizon_url, event loop the server was created in) -> ServerAsync
+    servers = {}
+
+    # (horizon_url, concurrency, event loop the semaphore was created in) -> asyncio.Semaphore
+    semaphores = {}
+
+    # tasks closing the servers left by closed event loops
+    closing_tasks = set()
+
+    def __init__(self, horizon_url, account_id, concurrency=HORIZON_CONCURRENCY):
+        """
+        Initializes the class with the Horizon API URL and the account ID.
+
+        :param horizon_url: Horizon API URL
+        :type horizon_url: str
+        :param account_id: Account ID
+        :type account_id: str
+        :param concurrency: Maximum concurrent requests to this Horizon URL,
+            shared by the helpers created with the same value
+        :type concurrency: int
+        """
+        self.horizon_url = horizon_url
+        self.account_id = account_id
+        self.concurrency = concurrency
+        self.cursor = None
+        self.cron_name = None
+        self.dependency = StellarMapCircuitBreakerHelpers.get_dependency(horizon_url)
+
+    @classmethod
+    def get_server(cls, horizon_url):
+        """
+        Returns the pooled ServerAsync of the Horizon URL for the running event loop.
+
+        aiohttp sessions belong to the event loop they were created in, so each
+        loop gets its own server; the servers left by closed loops are closed
+        when a new one is created.
+        """
+        loop = asyncio.get_running_loop()
+        server = cls.servers.get((horizon_url, loop))
+
+        if server is None:
+            cls.discard_closed_loops()
+            client = RateLimitedAiohttpClient(pool_size=HORIZON_POOL_SIZE, request_timeout=HORIZON_REQUEST_TIMEOUT)
+            server = ServerAsync(horizon_url=horizon_url, client=client)
+            cls.servers[(horizon_url, loop)] = server
+
+        return server
+
+    @classmethod
+    def get_semaphore(cls, horizon_url, concurrency=HORIZON_CONCURRENCY):
+        """
+        Returns the semaphore limiting concurrent requests to the Horizon URL
+        to the given concurrency.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = cls.semaphores.get((horizon_url, concurrency, loop))
+
+        if semaphore is None:
+            cls.discard_closed_loops()
+            semaphore = asyncio.Semaphore(concurrency)
+            cls.semaphores[(horizon_url, concurrency, loop)] = semaphore
+
+        return semaphore
+
+    @classmethod
+    def discard_closed_loops(cls):
+        """
+        Drops the servers and semaphores of the event loops closed without
+        close_servers(), closing the servers in the running event loop.
+        """
+        for key in [key for key in cls.servers if key[-1].is_closed()]:
+            task = asyncio.get_running_loop().create_task(cls.close_server(cls.servers.pop(key)))
+            cls.closing_tasks.add(task)
+            task.add_done_callback(cls.closing_tasks.discard)
+
+        for key in [key for key in cls.semaphores if key[-1].is_closed()]:
+            del cls.semaphores[key]
+
+    @staticmethod
+    async def close_server(server):
+        try:
+            await server.close()
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @classmethod
+    async def close_servers(cls):
+        """
+        Closes the pooled sessions created in the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        for key in [key for key in cls.servers if key[-1] is loop]:
+            await cls.servers.pop(key).close()
+
+    def set_cron_name(self, cron_name):
+        """
+        Set the name of the cron job for reporting purposes.
+
+        Args:
+            cron_name (str): The name of the cron job.
+        """
+        self.cron_name = cron_name
+
+    def get_cron_name(self):
+        return self.cron_name
+
+    def set_cursor(self, cursor):
+        self.cursor = cursor
+
+    def get_cursor(self):
+        return self.cursor
+
+    def on_retry_failure(self, retry_state):
+        sm_util = StellarMapUtilityHelpers()
+        sm_util.on_retry_failure(retry_state, self.cron_name, dependency=self.dependency)
+
+    async def call(self, call_builder):
+        """
+        Awaits a call builder while holding the network semaphore.
+
+        :param call_builder: Call builder of the pooled ServerAsync
+        :return: Horizon response
+        :rtype: json
+        """
+        async with self.get_semaphore(self.horizon_url, self.concurrency):
+            return await call_builder.call()
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_base_accounts(self):
+        """
+        Gets base account info.
+
+        :return: Base account
+        :rtype: json
+        """
+        try:
+            server = self.get_server(self.horizon_url)
+            return await self.call(server.accounts().account_id(account_id=self.account_id))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_account_operations(self):
+        """
+        Gets the first page of operations for the account specified.
+
+        :return: Operations
+        :rtype: json
+        """
+        try:
+            server = self.get_server(self.horizon_url)
+            return await self.call(server.operations().for_account(account_id=self.account_id))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_account_creator(self):
+        """
+        Gets the creator of the account specified from its oldest operation.
+
+        :return: Same as StellarMapHorizonAPIHelpers.get_account_creator()
+        :rtype: dict
+        """
+        try:
+            server = self.get_server(self.horizon_url)
+            ops = await self.call(server.operations().for_account(account_id=self.account_id).order(desc=False).limit(1))
+
+            api_parser = StellarMapHorizonAPIParserHelpers()
+            api_parser.set_datastax_response(datastax_response={'data': {'raw_data': ops}})
+            creator_dict = api_parser.parse_operations_creator_account(stellar_account=self.account_id)
+
+            return creator_dict or {}
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_account_effects(self):
+        """
+        Gets the first page of effects for the account specified.
+
+        :return: Effects
+        :rtype: json
+        """
+        try:
+            server = self.get_server(self.horizon_url)
+            return await self.call(server.effects().for_account(account_id=self.account_id))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_account_transactions(self):
+        """
+        Gets the first page of transactions for the account specified.
+
+        :return: Transactions
+        :rtype: json
+        """
+        try:
+            server = self.get_server(self.horizon_url)
+            return await self.call(server.transactions().for_account(account_id=self.account_id))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=71),
+       stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
+       retry_error_callback=on_retry_failure)
+    async def get_records_page(self, call_builder):
+        """
+        Gets a single page of records, re-raising so that only this page is retried.
+        """
+        try:
+            return await self.call(call_builder)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    async def paginate_records(self, make_call_builder, limit=200, stop_on_record=None, on_page=None):
+        """
+        Async counterpart of StellarMapHorizonAPIHelpers.paginate_records().
+
+        `make_call_builder` receives the pooled server and `on_page` may be a
+        plain function or a coroutine function.
+        """
+        records = []
+        links = {}
+        resumed = bool(self.cursor)
+        found = False
+
+        while True:
+            call_builder = make_call_builder(self.get_server(self.horizon_url)).limit(limit).order(desc=False)
+            if self.cursor:
+                call_builder = call_builder.cursor(self.cursor)
+
+            page = await self.get_records_page(call_builder)
+            if page is None:
+                return None
+
+            page_records = page['_embedded']['records']
+            links = page.get('_links', {})
+            records.extend(page_records)
+
+            found = stop_on_record is not None and any(stop_on_record(record) for record in page_records)
+            if page_records:
+                self.cursor = page_records[-1]['paging_token']
+                # only the pages without the stop record are reported, so an
+                # interrupted run never resumes after the stop record
+                if on_page is not None and not found:
+                    result = on_page(self.cursor)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+            # a short page is the last page of the collection
+            if len(page_records) < limit or found:
+                break
+
+        if resumed and stop_on_record is not None and not found:
+            # the cursor was past the stop record; collect again from the first page
+            self.cursor = None
+            return await self.paginate_records(make_call_builder, limit=limit, stop_on_record=stop_on_record, on_page=on_page)
+
+        return {'_links': links, '_embedded': {'records': records}}
+
+    async def get_account_operations_paginated(self, limit=200, stop_at_create_account=True, on_page=None):
+        """
+        Async counterpart of StellarMapHorizonAPIHelpers.get_account_operations_paginated().
+        """
+        def is_create_account(record):
+            return record.get('type') == 'create_account' and record.get('account') == self.account_id
+
+        return await self.paginate_records(
+            make_call_builder=lambda server: server.operations().for_account(account_id=self.account_id),
+            limit=limit,
+            stop_on_record=is_create_account if stop_at_create_account else None,
+            on_page=on_page
+        )
+
+    async def get_account_effects_paginated(self, limit=200, stop_at_account_created=True, on_page=None):
+        """
+        Async counterpart of StellarMapHorizonAPIHelpers.get_account_effects_paginated().
+        """
+        def is_account_created(record):
+            return record.get('type') == 'account_created' and record.get('account') == self.account_id
+
+        return await self.paginate_records(
+            make_call_builder=lambda server: server.effects().for_account(account_id=self.account_id),
+            limit=limit,
+            stop_on_record=is_account_created if stop_at_account_created else None,
+            on_page=on_page
+        )
+
 class StellarMapHorizonAPIParserHelpers:
     """ 
     Note: This class parses the Horizon JSON dataset that is embedded into a custom
@@ -0,0 +1,388 @@
+import asyncio
+import queue
+import time
+
+import sentry_sdk
+from apiApp.helpers.sm_async import StellarMapAsyncHelpers
+from apiApp.helpers.sm_creatoraccountlineage import (
+    ENRICHMENT_STATUSES, HORIZON_API_DATASETS_STAGES,
+    StellarMapCreatorAccountLineageHelpers)
+from apiApp.helpers.sm_cron import StellarMapCronHelpers
+from apiApp.helpers.sm_horizon import (HORIZON_CONCURRENCY,
+                                       AsyncStellarMapHorizonAPIHelpers)
+from apiApp.helpers.sm_seindex import (StellarMapSEBlockedDomainsHelpers,
+                                       StellarMapSEDirectoryHelpers)
+from apiApp.managers import StellarCreatorAccountLineageManager
+from apiApp.models import StellarCreatorAccountLineage
+from decouple import config
+
+HORIZON_STAGE_NAME = 'cron_collect_account_horizon_data'
+
+HORIZON_PENDING_STATUSES = [
+    'PENDING_HORIZON_API_DATASETS',
+    'DONE_COLLECTING_HORIZON_API_DATASETS_ACCOUNTS',
+    'DONE_COLLECTING_HORIZON_API_DATASETS_OPERATIONS',
+    'DONE_COLLECTING_HORIZON_API_DATASETS_EFFECTS'
+]
+
+# lineage records claimed per run of the Horizon stage by the pipeline daemon
+HORIZON_BATCH_SIZE = config('CRON_COLLECT_ACCOUNT_HORIZON_DATA_BATCH_SIZE', default=17, cast=int)
+
+# seconds a worker of the pipeline daemon sleeps after a pass that found no work
+PIPELINE_IDLE_SECONDS = config('PIPELINE_IDLE_SECONDS', default=7, cast=float)
+
+# seconds between two recovery sweeps of the work queue by a stage fed by its
+# predecessor, picking up the records written by other processes or missed by a restart
+PIPELINE_SWEEP_SECONDS = config('PIPELINE_SWEEP_SECONDS', default=300, cast=float)
+
+# records taken from the in-process queue of a stage per pass
+PIPELINE_EVENT_BATCH_SIZE = config('PIPELINE_EVENT_BATCH_SIZE', default=71, cast=int)
+
+# the Horizon stage, the entry of the pipeline: new records are written with its
+# pending status by the web app, so the daemon polls it every pass
+HORIZON_STAGE = {
+    'statuses': HORIZON_PENDING_STATUSES,
+    'done_statuses': ['DONE_HORIZON_API_DATASETS'],
+    'dependencies': ['horizon', 'astra-docs'],
+    'entry': True
+}
+
+# the stages run over the lineage work queue, keyed by their cron name: the statuses
+# they poll, the statuses they leave a record in, the external dependencies they
+# need and the StellarMapCreatorAccountLineageHelpers function run on each record.
+# A done status polled by another stage is an edge of the stage graph.
+LINEAGE_STAGES = {
+    'cron_collect_account_lineage_attributes': {
+        'statuses': ENRICHMENT_STATUSES,
+        'done_statuses': ['DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF'],
+        'dependencies': ['astra-docs'],
+        'function': 'async_enrich_from_accounts_raw_data'
+    },
+    'cron_collect_account_lineage_se_directory': {
+        'statuses': ['DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF'],
+        'done_statuses': ['DONE_UPDATING_HORIZON_ACCOUNTS_SE_DIRECTORY'],
+        'dependencies': ['stellar-expert', 'astra-docs'],
+        'function': 'async_stellar_expert_explorer_directory_doc_api_href_from_accounts_raw_data'
+    },
+    'cron_collect_account_lineage_creator': {
+        'statuses': ['DONE_UPDATING_HORIZON_ACCOUNTS_SE_DIRECTORY'],
+        'done_statuses': ['DONE_UPDATING_FROM_OPERATIONS_RAW_DATA', 'DONE_COLLECTING_CREATOR_ACCOUNT'],
+        'dependencies': ['horizon', 'astra-docs'],
+        'function': 'async_update_from_operations_raw_data'
+    },
+    'cron_make_grandparent_account_lineage': {
+        # also returns the creator's record, pending for the Horizon stage
+        'statuses': ['DONE_UPDATING_FROM_OPERATIONS_RAW_DATA'],
+        'done_statuses': ['DONE_MAKE_GRANDPARENT_LINEAGE'],
+        'dependencies': [],
+        'function': 'async_make_grandparent_account'
+    },
+}
+
+
+class StellarMapLineagePipelineHelpers:
+    """
+    Runs the stages of the lineage pipeline, either once from their cron command or
+    repeatedly from the workers of the run_lineage_pipeline daemon.
+
+    Each run checks the health of the stage's cron, skips the networks whose
+    dependencies have an open circuit and streams the queued records through the
+    bounded executor of StellarMapAsyncHelpers.
+
+    In the daemon the stages are chained by events: once a stage moves a record to
+    one of its done statuses, the record is put on the in-process queue of the
+    stage polling that status, so it advances without waiting for the next poll.
+    The work queue in Cassandra stays the source of truth; it is swept every
+    PIPELINE_SWEEP_SECONDS to recover the records written by other processes, lost
+    with a restart or left by a failed pass.
+
+    Usage:
+    ```
+    pipeline_helpers = StellarMapLineagePipelineHelpers()
+    summary = pipeline_helpers.run_stage('cron_collect_account_lineage_attributes')
+    ```
+    """
+
+    def __init__(self):
+        # stage name -> in-process queue of the records routed to the stage
+        self.stage_queues = {}
+
+    @staticmethod
+    def get_stage_names():
+        return [HORIZON_STAGE_NAME] + list(LINEAGE_STAGES.keys())
+
+    @staticmethod
+    def get_stage(stage_name):
+        return HORIZON_STAGE if stage_name == HORIZON_STAGE_NAME else LINEAGE_STAGES[stage_name]
+
+    def get_successor_stage_name(self, status, stage_name=None):
+        """
+        Returns the stage polling the status, None if no other stage polls it.
+
+        :param status: the status a record was left in
+        :param stage_name: the stage that left it, never its own successor
+        """
+        for successor_name in self.get_stage_names():
+            if successor_name != stage_name and status in self.get_stage(successor_name)['statuses']:
+                return successor_name
+        return None
+
+    def enable_events(self, stage_names):
+        """
+        Creates the in-process queues of the stages hosted by this process, so the
+        records finished by one stage are routed to its successor.
+        """
+        for stage_name in stage_names:
+            self.stage_queues.setdefault(stage_name, queue.Queue())
+
+    def route_lineage(self, lin_queryset, stage_name=None):
+        """
+        Puts the record on the in-process queue of the stage polling its status.
+
+        :param lin_queryset: the lineage record, with its status after the stage
+        :param stage_name: the stage that finished the record
+        :return: the name of the stage it was routed to, None if not hosted here
+        """
+        successor_name = self.get_successor_stage_name(lin_queryset.status, stage_name=stage_name)
+        stage_queue = self.stage_queues.get(successor_name)
+        if stage_queue is None:
+            return None
+        stage_queue.put(lin_queryset)
+        return successor_name
+
+    def route_summary(self, stage_name, summary):
+        """
+        Routes the records of a pass of a stage function, and any lineage record
+        the function returned (the creator's record of the grandparent stage).
+        """
+        if not self.stage_queues or summary is None:
+            return
+        for outcome in summary['outcomes']:
+            if not outcome['succeeded']:
+                continue
+            self.route_lineage(outcome['task'], stage_name=stage_name)
+            if isinstance(outcome['result'], StellarCreatorAccountLineage):
+                self.route_lineage(outcome['result'], stage_name=stage_name)
+
+    def get_stage_events(self, stage_name, timeout, limit=PIPELINE_EVENT_BATCH_SIZE):
+        """
+        Takes the records routed to a stage, waiting up to `timeout` seconds for the first.
+
+        :return: the records still in one of the statuses of the stage
+        """
+        stage_queue = self.stage_queues[stage_name]
+        try:
+            lin_querysets = [stage_queue.get(timeout=max(timeout, 0))]
+        except queue.Empty:
+            return []
+        while len(lin_querysets) < limit:
+            try:
+                lin_querysets.append(stage_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        statuses = self.get_stage(stage_name)['statuses']
+        return [lin_queryset for lin_queryset in lin_querysets if lin_queryset.status in statuses]
+
+    def run_worker(self, stage_name, stop_event, idle_seconds=PIPELINE_IDLE_SECONDS, once=False, sweep_seconds=PIPELINE_SWEEP_SECONDS):
+        """
+        Runs passes of a stage until the stop event is set. The Horizon stage keeps
+        one event loop for the life of the worker, so its pooled Horizon sessions
+        stay open between passes and are closed when the worker stops.
+
+        A stage with events enabled (see enable_events) works on the records routed
+        to it as they arrive and sweeps the work queue every `sweep_seconds`, or
+        again right away while a sweep keeps finding records; the entry stage and
+        the stages without events sweep every pass and sleep `idle_seconds` after a
+        pass that found no work or whose cron is not healthy.
+
+        :param stage_name: the cron name of the stage
+        :param stop_event: threading.Event set to stop the worker
+        :param idle_seconds: seconds to wait when there is no work
+        :param once: run a single sweep
+        :param sweep_seconds: seconds between two sweeps of a stage fed by events
+        """
+        loop = asyncio.new_event_loop() if stage_name == HORIZON_STAGE_NAME else None
+        evented = stage_name in self.stage_queues
+        if self.get_stage(stage_name).get('entry'):
+            # the records of the web app only arrive with the sweep
+            sweep_seconds = idle_seconds
+        next_sweep_at = 0
+        try:
+            while not stop_event.is_set():
+                if time.monotonic() >= next_sweep_at or not evented:
+                    processed = self.run_stage_pass(stage_name, loop=loop)
+                    if once:
+                        break
+                    if processed:
+                        continue
+                    next_sweep_at = time.monotonic() + sweep_seconds
+
+                if not evented:
+                    stop_event.wait(idle_seconds)
+                    continue
+
+                # wait for routed records, at most until the next sweep, and at most
+                # idle_seconds so the stop event is noticed
+                timeout = min(idle_seconds, next_sweep_at - time.monotonic())
+                lin_querysets = self.get_stage_events(stage_name, timeout=timeout)
+                if lin_querysets:
+                    self.run_stage_pass(stage_name, loop=loop, lin_querysets=lin_querysets)
+        finally:
+            if loop is not None:
+                loop.run_until_complete(AsyncStellarMapHorizonAPIHelpers.close_servers())
+                loop.close()
+
+    def run_stage_pass(self, stage_name, loop=None, lin_querysets=None):
+        """
+        Runs one pass of a stage for a worker of the daemon.
+
+        :return: the number of records worked on, None if the pass failed or the
+            cron is not healthy
+        """
+        try:
+            if stage_name == HORIZON_STAGE_NAME:
+                return self.run_horizon_stage(batch_size=HORIZON_BATCH_SIZE, loop=loop, lin_querysets=lin_querysets)
+
+            summary = self.run_stage(stage_name, lin_querysets=lin_querysets)
+            return None if summary is None else summary['succeeded'] + summary['failed']
+        except Exception as e:
+            # a failed pass must not stop the worker
+            sentry_sdk.capture_exception(e)
+            return None
+
+    def run_stage(self, stage_name, time_budget_seconds=None, lin_querysets=None):
+        """
+        Runs one pass of a lineage stage over its queued records, or over the records
+        routed to it, and routes the finished records to their next stage.
+
+        :param stage_name: the cron name of the stage
+        :param time_budget_seconds: seconds after which no record is started; defaults
+            to the stage's setting
+        :param lin_querysets: the records routed to the stage; defaults to sweeping
+            the work queue
+        :return: the summary of StellarMapAsyncHelpers.execute_async, None if the
+            cron is not healthy
+        """
+        stage = LINEAGE_STAGES[stage_name]
+
+        # create an instance of cron helpers to check for cron health
+        cron_helpers = StellarMapCronHelpers(cron_name=stage_name)
+        if cron_helpers.check_cron_health() is not True:
+            return None
+
+        # skip the networks whose dependencies have an open circuit
+        network_names = cron_helpers.get_available_network_names(dependencies=stage['dependencies'])
+
+        if lin_querysets is not None:
+            # the records of the skipped networks are left to the sweep
+            lin_querysets = [lin_queryset for lin_queryset in lin_querysets if lin_queryset.network_name in network_names]
+        else:
+            if stage_name == 'cron_collect_account_lineage_se_directory':
+                # load the local indexes of the blocked domains and the directories
+                # and continue their sweeps when stale
+                if network_names:
+                    StellarMapSEBlockedDomainsHelpers().sync_if_stale()
+                for network_name in network_names:
+                    StellarMapSEDirectoryHelpers(network_name=network_name).sync_if_stale()
+
+            # Stream the records queued with the statuses in the StellarCreatorAccountLineage work queue
+            lin_querysets = StellarCreatorAccountLineageManager().iter_queued_queryset(
+                statuses=stage['statuses'],
+                network_names=network_names
+            )
+
+        # Run the stage function on every record
+        lineage_helpers = StellarMapCreatorAccountLineageHelpers()
+        async_helpers = StellarMapAsyncHelpers(stage_name=stage_name, time_budget_seconds=time_budget_seconds)
+        summary = async_helpers.execute_async(lin_querysets, getattr(lineage_helpers, stage['function']))
+
+        self.route_summary(stage_name, summary)
+        return summary
+
+    def run_horizon_stage(self, batch_size=1, concurrency=HORIZON_CONCURRENCY, loop=None, lin_querysets=None):
+        """
+        Runs one pass of the Horizon stage.
+
+        With a batch_size of 1, the next Horizon dataset of one record is collected;
+        with more, up to batch_size records are claimed and run all their remaining
+        Horizon stages concurrently.
+
+        :param batch_size: lineage records to claim
+        :param concurrency: maximum concurrent requests to Horizon
+        :param loop: a persistent event loop keeping the pooled Horizon sessions open
+            between passes; without one, the pass runs in a new loop and closes them
+        :param lin_querysets: the records routed to the stage; defaults to reading
+            the work queue
+        :return: the number of records worked on, None if the cron is not healthy
+        """
+        # create an instance of cron helpers to check for cron health
+        cron_helpers = StellarMapCronHelpers(cron_name=HORIZON_STAGE_NAME)
+        if cron_helpers.check_cron_health() is not True:
+            return None
+
+        lineage_manager = StellarCreatorAccountLineageManager()
+        lineage_helpers = StellarMapCreatorAccountLineageHelpers()
+
+        # skip the networks whose Horizon server or the document API have an open circuit
+        network_names = cron_helpers.get_available_network_names(dependencies=HORIZON_STAGE['dependencies'])
+
+        if lin_querysets is not None:
+            # the records of the skipped networks are left to the sweep
+            lin_querysets = [lin_queryset for lin_queryset in lin_querysets if lin_queryset.network_name in network_names]
+        else:
+            # Records are claimed with a per-record lease, so records IN_PROGRESS
+            # in other workers do not block this run; records left IN_PROGRESS
+            # by a crashed run are returned to pending once their lease expires
+            lineage_helpers.expire_horizon_api_datasets_leases()
+
+            lin_querysets = lineage_manager.get_queued_queryset(
+                statuses=HORIZON_PENDING_STATUSES,
+                limit=max(1, batch_size),
+                network_names=network_names
+            )
+        if not lin_querysets:
+            return 0
+
+        if batch_size > 1:
+            collect = lineage_helpers.collect_horizon_api_datasets_batch(
+                lin_querysets=lin_querysets,
+                cron_name=HORIZON_STAGE_NAME,
+                concurrency=concurrency,
+                close_servers=loop is None
+            )
+        else:
+            lin_queryset = lin_querysets[0]
+            if lin_queryset.status not in HORIZON_API_DATASETS_STAGES:
+                return 0
+
+            # Due to rate limiting from the API server, each run only works on 1 pull at a time
+            collect = self.collect_horizon_stage(lineage_helpers, lin_queryset, concurrency, close_servers=loop is None)
+
+        if loop is None:
+            asyncio.run(collect)
+        else:
+            loop.run_until_complete(collect)
+
+        # the claimed records hold the status they were left in
+        if self.stage_queues:
+            for lin_queryset in lin_querysets:
+                self.route_lineage(lin_queryset, stage_name=HORIZON_STAGE_NAME)
+
+        return len(lin_querysets)
+
+    async def collect_horizon_stage(self, lineage_helpers, lin_queryset, concurrency, close_servers=True):
+        # collect the next Horizon dataset of the record and close the pooled sessions
+        try:
+            return await lineage_helpers.collect_horizon_api_datasets_stage(
+                lin_queryset=lin_queryset,
+                status=lin_queryset.status,
+                cron_name=HORIZON_STAGE_NAME,
+                concurrency=concurrency
+            )
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise ValueError(f'Error: {e}. Attempting to retrieve Horizon datasets, store in document DB and save href in StellarCreatorAccountLineage')
+        finally:
+            if close_servers:
+                await AsyncStellarMapHorizonAPIHelpers.close_servers()
@@ -0,0 +1,286 @@
+import asyncio
+import email.utils
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from apiApp.helpers.env import EnvHelpers
+from apiApp.helpers.sm_circuitbreaker import StellarMapCircuitBreakerHelpers
+from apiApp.helpers.sm_conn import StellarMapHTTPSessionHelpers
+from decouple import config
+from stellar_sdk.client.aiohttp_client import AiohttpClient
+from stellar_sdk.client.requests_client import RequestsClient
+
+# directory of the bucket state files shared by every process on the host;
+# empty keeps each bucket in the memory of its process
+RATE_LIMIT_STATE_DIR = config('RATE_LIMIT_STATE_DIR', default='')
+
+# longest single sleep while waiting for a token, so a long Retry-After is re-checked
+MAX_WAIT_SECONDS = 7
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at `rate` tokens per second up to `capacity` tokens.
+
+    The state is held in memory and shared by the threads of the process, or, with
+    `state_path`, kept in a file locked with flock so every process on the host
+    draws from the same bucket.
+    """
+
+    def __init__(self, host, rate, capacity, state_path=None):
+        self.host = host
+        self.rate = rate
+        self.capacity = capacity
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.state = {'tokens': capacity, 'updated': time.time(), 'paused_until': 0}
+
+    @contextmanager
+    def locked_state(self):
+        with self.lock:
+            if not self.state_path:
+                yield self.state
+                return
+
+            with open(self.state_path, 'a+') as state_file:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+                try:
+                    state_file.seek(0)
+                    content = state_file.read()
+                    state = json.loads(content) if content else dict(self.state)
+                    yield state
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(json.dumps(state))
+                    state_file.flush()
+                finally:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def refill(self, state, now):
+        state['tokens'] = min(self.capacity, state['tokens'] + (now - state['updated']) * self.rate)
+        state['updated'] = now
+
+    def try_acquire(self):
+        """
+        Takes a token if one is available.
+
+        :return: 0 if a token was taken, else the seconds to wait before trying again
+        """
+        with self.locked_state() as state:
+            now = time.time()
+            self.refill(state, now)
+
+            if state['paused_until'] > now:
+                return state['paused_until'] - now
+
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0
+
+            return (1 - state['tokens']) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(min(wait, MAX_WAIT_SECONDS))
+
+    async def async_acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, MAX_WAIT_SECONDS))
+
+    def pause(self, seconds):
+        """ Stops handing out tokens for `seconds`, e.g. from a Retry-After header. """
+        with self.locked_state() as state:
+            now = time.time()
+            self.refill(state, now)
+            state['tokens'] = 0
+            state['paused_until'] = max(state['paused_until'], now + seconds)
+
+    def limit_remaining(self, remaining, reset_seconds):
+        """ Caps the tokens to the quota the server reports as remaining. """
+        with self.locked_state() as state:
+            now = time.time()
+            self.refill(state, now)
+            state['tokens'] = min(state['tokens'], remaining)
+            if remaining <= 0 and reset_seconds:
+                state['paused_until'] = max(state['paused_until'], now + reset_seconds)
+
+
+class StellarMapRateLimiterHelpers:
+    """
+    Proactive per-host rate limiting of the external APIs (Horizon, Stellar Expert
+    and the Astra document API).
+
+    Each host draws from its own token bucket, configured by EnvHelpers.get_rate_limits()
+    and shared by every thread of the process (the StellarMapAsyncHelpers workers
+    included), or by every process on the host when RATE_LIMIT_STATE_DIR is set.
+    Retry-After and X-RateLimit-Remaining/X-RateLimit-Reset response headers pause or
+    drain the bucket, so the crons stay under quota instead of tripping the tenacity
+    retries. Every call also goes through the circuit breaker of its dependency
+    (StellarMapCircuitBreakerHelpers) and raises CircuitOpenError while it is open.
+
+    Usage:
+    ```
+    response = StellarMapRateLimiterHelpers.request('GET', url, headers=headers)
+    ```
+    """
+    buckets = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get_bucket(cls, url):
+        """
+        Returns the token bucket of the host of the url, or None if the host is not rate limited.
+        """
+        host = urlparse(url).hostname or ''
+        with cls.lock:
+            if host in cls.buckets:
+                return cls.buckets[host]
+
+            bucket = None
+            for host_suffix, (rate, burst) in EnvHelpers().get_rate_limits().items():
+                if rate > 0 and (host == host_suffix or host.endswith(f'.{host_suffix}')):
+                    state_path = None
+                    if RATE_LIMIT_STATE_DIR:
+                        os.makedirs(RATE_LIMIT_STATE_DIR, exist_ok=True)
+                        state_path = os.path.join(RATE_LIMIT_STATE_DIR, f'{host}.json')
+                    bucket = TokenBucket(host=host, rate=rate, capacity=burst, state_path=state_path)
+                    break
+
+            cls.buckets[host] = bucket
+            return bucket
+
+    @classmethod
+    def acquire(cls, url):
+        bucket = cls.get_bucket(url)
+        if bucket is not None:
+            bucket.acquire()
+
+    @classmethod
+    async def async_acquire(cls, url):
+        bucket = cls.get_bucket(url)
+        if bucket is not None:
+            await bucket.async_acquire()
+
+    @staticmethod
+    def parse_seconds(value):
+        """
+        Parses a Retry-After / X-RateLimit-Reset value: seconds, an epoch timestamp
+        or an HTTP date.
+
+        :return: seconds from now, or None
+        """
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+            # an epoch timestamp rather than a delay
+            if seconds > 10 ** 9:
+                seconds -= time.time()
+            return max(seconds, 0)
+        except ValueError:
+            try:
+                return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                return None
+
+    @classmethod
+    def observe_response(cls, url, status_code, headers):
+        """
+        Adjusts the bucket of the host from the rate limit headers of a response.
+
+        :param url: the url of the request
+        :param status_code: the HTTP status code of the response
+        :param headers: the response headers
+        """
+        bucket = cls.get_bucket(url)
+        if bucket is None or not headers:
+            return
+
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        retry_after = cls.parse_seconds(headers.get('retry-after'))
+        if status_code in (429, 503) or retry_after:
+            bucket.pause(retry_after if retry_after is not None else 1 / bucket.rate)
+            return
+
+        remaining = headers.get('x-ratelimit-remaining')
+        if remaining is not None:
+            try:
+                bucket.limit_remaining(float(remaining), cls.parse_seconds(headers.get('x-ratelimit-reset')))
+            except ValueError:
+                pass
+
+    @classmethod
+    def request(cls, method, url, session=None, **kwargs):
+        """
+        Sends a rate limited HTTP request with requests.
+
+        :param method: the HTTP method
+        :param url: the request url
+        :param session: optional requests session to send the request with; defaults to
+            the pooled session of the host
+        :param kwargs: keyword arguments of requests.request
+        :return: the requests.Response
+        :raises CircuitOpenError: if the circuit of the dependency is open
+        """
+        StellarMapCircuitBreakerHelpers.before_request(url)
+        cls.acquire(url)
+        try:
+            response = (session or StellarMapHTTPSessionHelpers.get_session(url)).request(method, url, **kwargs)
+        except Exception as e:
+            StellarMapCircuitBreakerHelpers.after_exception(url, e)
+            raise
+        cls.observe_response(url, response.status_code, response.headers)
+        StellarMapCircuitBreakerHelpers.after_response(url, response.status_code)
+        return response
+
+
+class RateLimitedRequestsClient(RequestsClient):
+    """
+    stellar_sdk RequestsClient drawing from the host's token bucket and guarded by its
+    circuit breaker. With a horizon_url, requests go over the pooled session of the host.
+    """
+
+    def __init__(self, horizon_url=None, **kwargs):
+        if horizon_url and 'session' not in kwargs:
+            kwargs['session'] = StellarMapHTTPSessionHelpers.get_session(horizon_url)
+        super().__init__(**kwargs)
+
+    def get(self, url, params=None):
+        StellarMapCircuitBreakerHelpers.before_request(url)
+        StellarMapRateLimiterHelpers.acquire(url)
+        try:
+            response = super().get(url, params=params)
+        except Exception as e:
+            StellarMapCircuitBreakerHelpers.after_exception(url, e)
+            raise
+        StellarMapRateLimiterHelpers.observe_response(url, response.status_code, response.headers)
+        StellarMapCircuitBreakerHelpers.after_response(url, response.status_code)
+        return response
+
+
+class RateLimitedAiohttpClient(AiohttpClient):
+    """ stellar_sdk AiohttpClient drawing from the host's token bucket and guarded by its circuit breaker. """
+
+    async def get(self, url, params=None):
+        StellarMapCircuitBreakerHelpers.before_request(url)
+        await StellarMapRateLimiterHelpers.async_acquire(url)
+        try:
+            response = await super().get(url, params=params)
+        except Exception as e:
+            StellarMapCircuitBreakerHelpers.after_exception(url, e)
+            raise
+        StellarMapRateLimiterHelpers.observe_response(url, response.status_code, response.headers)
+        StellarMapCircuitBreakerHelpers.after_response(url, response.status_code)
+        return response
@@ -0,0 +1,342 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import sentry_sdk
+from apiApp.helpers.env import EnvHelpers
+from apiApp.helpers.sm_ratelimit import StellarMapRateLimiterHelpers
+from decouple import config
+
+# directory of the on-disk snapshots of the indexes, shared by the crons and the web app
+SE_INDEX_SNAPSHOT_DIR = config('SE_INDEX_SNAPSHOT_DIR', default=tempfile.gettempdir())
+
+# seconds between two full sweeps of the blocked domains list
+SE_BLOCKED_DOMAINS_SYNC_SECONDS = config('SE_BLOCKED_DOMAINS_SYNC_SECONDS', default=3600, cast=int)
+
+# seconds between two full sweeps of the directory of a network
+SE_DIRECTORY_SYNC_SECONDS = config('SE_DIRECTORY_SYNC_SECONDS', default=21600, cast=int)
+
+
+class StellarMapSEIndexHelpers(ABC):
+    """
+    A local index of a paginated Stellar Expert list, so a lookup is a dictionary
+    access instead of one request per account.
+
+    The lists are paginated with cursors ordered by key, not by time, so a sweep pages
+    through the whole list from the cursor saved in the snapshot: an interrupted sweep
+    resumes where it stopped, and the index is replaced only once the sweep is complete,
+    which also drops the removed entries. The index is held in the memory of the
+    process and saved to a JSON snapshot after every page; processes that do not sweep
+    (e.g. the web app) reload the snapshot when it changes.
+
+    Subclasses set `snapshot_name`, `page_limit` and `sync_seconds` and implement
+    `get_page_url` and `get_record_key`.
+    """
+    snapshot_name = None
+    page_limit = 200
+    sync_seconds = 3600
+
+    # snapshot_path -> (snapshot mtime, {key: entry})
+    indexes = {}
+    lock = threading.Lock()
+    sync_locks = {}
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path or os.path.join(SE_INDEX_SNAPSHOT_DIR, f'{self.snapshot_name}.json')
+        self.headers = {
+            "Content-Type": "application/json"
+        }
+
+    @abstractmethod
+    def get_page_url(self, cursor=None):
+        """
+        Returns the url of the page of the list that starts after the cursor.
+        """
+
+    @abstractmethod
+    def get_record_key(self, record):
+        """
+        Returns the index key of a record of the list.
+        """
+
+    def get_record_entry(self, record):
+        return record
+
+    def read_snapshot(self):
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                return json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            return None
+
+    def write_snapshot(self, snapshot):
+        # write to a temporary file first so a reader never sees a partial snapshot
+        try:
+            tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    def load(self):
+        """
+        Loads the index from the snapshot into memory unless the snapshot is unchanged.
+
+        :return: the in-memory index, or None if no sweep has completed yet
+        """
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+        except OSError:
+            return self.get_entries()
+
+        loaded = self.indexes.get(self.snapshot_path)
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+
+        snapshot = self.read_snapshot()
+        if snapshot is None or 'entries' not in snapshot:
+            return self.get_entries()
+
+        with self.lock:
+            self.indexes[self.snapshot_path] = (mtime, snapshot['entries'])
+        return snapshot['entries']
+
+    def get_entries(self):
+        loaded = self.indexes.get(self.snapshot_path)
+        return loaded[1] if loaded is not None else None
+
+    def is_loaded(self):
+        return self.get_entries() is not None
+
+    def is_stale(self, snapshot):
+        if not snapshot or not snapshot.get('synced_at'):
+            return True
+        return time.time() - snapshot['synced_at'] >= self.sync_seconds
+
+    def get_page(self, cursor=None):
+        """
+        Gets one page of the list after the cursor.
+
+        :param cursor: paging_token of the last record already collected
+        :return: the records of the page
+        """
+        url = self.get_page_url(cursor=cursor)
+        response = StellarMapRateLimiterHelpers.request('GET', url, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"Failed to GET {url}. Response: {response.content}")
+
+        return response.json().get('_embedded', {}).get('records', [])
+
+    def sync(self, max_pages=None):
+        """
+        Continues the sweep of the list from the cursor of the snapshot.
+
+        :param max_pages: maximum pages to request in this call; the sweep resumes from
+            the saved cursor on the next call
+        :return: True if the sweep completed and replaced the index
+        """
+        snapshot = self.read_snapshot() or {}
+        if 'entries' not in snapshot:
+            snapshot = {'entries': None, 'synced_at': None}
+        pending_entries = snapshot.get('pending_entries', {})
+        cursor = snapshot.get('cursor')
+
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            records = self.get_page(cursor=cursor)
+            pages += 1
+
+            for record in records:
+                key = self.get_record_key(record)
+                if key:
+                    pending_entries[key] = self.get_record_entry(record)
+            if records:
+                cursor = records[-1].get('paging_token') or self.get_record_key(records[-1])
+
+            if len(records) < self.page_limit:
+                # end of the list: the sweep replaces the index
+                self.write_snapshot({'entries': pending_entries, 'synced_at': time.time()})
+                self.load()
+                return True
+
+            # save the progress of the sweep
+            snapshot['pending_entries'] = pending_entries
+            snapshot['cursor'] = cursor
+            self.write_snapshot(snapshot)
+
+        return False
+
+    def sync_if_stale(self, max_pages=None):
+        """
+        Loads the snapshot and continues the sweep if the index is older than
+        `sync_seconds`. Only one thread of the process sweeps an index; the others keep
+        using the current one.
+
+        :return: True if the index is loaded
+        """
+        try:
+            self.load()
+            with self.lock:
+                sync_lock = self.sync_locks.setdefault(self.snapshot_path, threading.Lock())
+
+            if self.is_stale(self.read_snapshot()) and sync_lock.acquire(blocking=False):
+                try:
+                    self.sync(max_pages=max_pages)
+                finally:
+                    sync_lock.release()
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+        return self.is_loaded()
+
+
+class StellarMapSEBlockedDomainsHelpers(StellarMapSEIndexHelpers):
+    """
+    The local index of the Stellar Expert blocked domains, replacing the request per
+    account to /explorer/directory/blocked-domains/{domain} (see
+    StellarMapStellarExpertAPIHelpers.get_se_blocked_domain).
+
+    A domain is blocked when it, or any domain it is a subdomain of, is in the index.
+
+    Usage:
+    ```
+    blocked_domains_helpers = StellarMapSEBlockedDomainsHelpers()
+    blocked_domains_helpers.sync_if_stale()
+    blocked_domains_helpers.is_blocked('airdrop.stellar.org.am')
+    ```
+    """
+    snapshot_name = 'se_blocked_domains'
+    page_limit = 1000
+    sync_seconds = SE_BLOCKED_DOMAINS_SYNC_SECONDS
+
+    def get_page_url(self, cursor=None):
+        url = f"{EnvHelpers().get_base_se_blocked_domains()}?order=asc&limit={self.page_limit}"
+        if cursor:
+            url = f"{url}&cursor={cursor}"
+        return url
+
+    def get_record_key(self, record):
+        return self.normalize_domain(record.get('domain'))
+
+    def get_record_entry(self, record):
+        return True
+
+    @staticmethod
+    def normalize_domain(domain):
+        """
+        Normalizes a home domain: lower case, without scheme, path, port and trailing dot.
+        """
+        if not domain:
+            return ''
+        domain = domain.strip().lower()
+        if '://' in domain:
+            domain = domain.split('://', 1)[1]
+        domain = domain.split('/', 1)[0].split(':', 1)[0]
+        return domain.strip('.')
+
+    @staticmethod
+    def get_domain_suffixes(domain):
+        """
+        Returns the domain and every domain it is a subdomain of, e.g.
+        a.b.example.com -> [a.b.example.com, b.example.com, example.com, com]
+        """
+        labels = domain.split('.')
+        return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+    def is_blocked(self, domain):
+        """
+        Returns True if the domain or one of its parent domains is blocked by Stellar Expert.
+        """
+        domain = self.normalize_domain(domain)
+        domains = self.get_entries()
+        if not domain or not domains:
+            return False
+        return any(suffix in domains for suffix in self.get_domain_suffixes(domain))
+
+    def get_blocked_domain(self, domain):
+        """
+        Returns the blocked domain response in the format of the
+        /explorer/directory/blocked-domains/{domain} endpoint.
+        """
+        return {
+            "domain": domain,
+            "blocked": self.is_blocked(domain)
+        }
+
+
+class StellarMapSEDirectoryHelpers(StellarMapSEIndexHelpers):
+    """
+    The local index of the labeled Stellar Expert directory of a network (address,
+    name, domain and tags), replacing the request per account to
+    /explorer/{network}/directory/{account} (see
+    StellarMapStellarExpertAPIHelpers.get_se_account_directory).
+
+    Usage:
+    ```
+    directory_helpers = StellarMapSEDirectoryHelpers(network_name='public')
+    directory_helpers.sync_if_stale()
+    directory_helpers.get_account_directory('GDUKMGUGDZQK6YHYA5Z6AY2G4XDSZPSZ3SW5UN3ARVMO6QSRDWP5YLEX')
+    ```
+    """
+    page_limit = 200
+    sync_seconds = SE_DIRECTORY_SYNC_SECONDS
+
+    def __init__(self, network_name, snapshot_path=None):
+        self.network_name = network_name
+        self.snapshot_name = f'se_directory_{network_name}'
+
+        # set environment
+        self.env_helpers = EnvHelpers()
+        if network_name == 'public':
+            self.env_helpers.set_public_network()
+        else:
+            self.env_helpers.set_testnet_network()
+
+        super().__init__(snapshot_path=snapshot_path)
+
+    def get_page_url(self, cursor=None):
+        url = f"{self.env_helpers.get_base_se_network_dir()}?order=asc&limit={self.page_limit}"
+        if cursor:
+            url = f"{url}&cursor={cursor}"
+        return url
+
+    def get_record_key(self, record):
+        return record.get('address')
+
+    def get_record_entry(self, record):
+        return {
+            "address": record.get('address'),
+            "name": record.get('name'),
+            "domain": record.get('domain'),
+            "tags": record.get('tags', [])
+        }
+
+    def get_account_directory(self, stellar_account):
+        """
+        Returns the directory entry of the account in the format of the
+        /explorer/{network}/directory/{account} endpoint, or None if it is not labeled.
+        """
+        directory = self.get_entries() or {}
+        return directory.get(stellar_account)
+
+    def fetch_account_directory(self, stellar_account):
+        """
+        Requests the directory entry of one account from Stellar Expert, for when the
+        index has never been synced.
+
+        :return: the directory entry, or None if it is not labeled
+        """
+        response = StellarMapRateLimiterHelpers.request(
+            'GET', f"{self.env_helpers.get_base_se_network_dir()}{stellar_account}", headers=self.headers
+        )
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise Exception(f"Failed to GET SE account directory. Response: {response.content}")
+        return response.json()
@@ -1,11 +1,18 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 import sentry_sdk
 from apiApp.helpers.env import EnvHelpers
+from apiApp.helpers.sm_circuitbreaker import CircuitOpenError
 from apiApp.helpers.sm_horizon import StellarMapHorizonAPIHelpers
+from apiApp.helpers.sm_ratelimit import StellarMapRateLimiterHelpers
 from apiApp.helpers.sm_utils import StellarMapUtilityHelpers
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from decouple import config
+from tenacity import (retry, retry_if_not_exception_type, stop_after_attempt,
+                      wait_random_exponential)
+
+# maximum concurrent Stellar Expert calls per account
+SE_CONCURRENCY = config('SE_CONCURRENCY', default=4, cast=int)
 
 
 class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
@@ -24,16 +31,20 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
             `retry_error_callback=on_retry_failure` specifies a callback function that will be 
             called every time a retry fails. In this case, it is the function on_retry_failure, 
             which is expected to handle the error, such as logging the exception to Sentry, and 
-            performing any necessary cleanup, reporting and then sets the cron jobs as 'UNHEALTHY_'
+            performing any necessary cleanup, reporting and then opens the circuit of the
+            dependency, which stops only the crons that need it.
 
-            `cron_health_check` will set the crons to 'HEALTHY_' after 1.7 hours of buffer.
+            `retry=retry_if_not_exception_type(CircuitOpenError)` fails fast instead of retrying
+            while the circuit of the dependency is open.
     """
 
-    def __init__(self, lin_queryset):
+    def __init__(self, lin_queryset, session=None):
         self.headers = {
             "Content-Type": "application/json"
         }
         self.lin_queryset = lin_queryset # creator account lineage record
+        self.session = session # pooled requests session shared by the calls, e.g. the client_session of StellarMapAsyncHelpers
+        self.dependency = 'stellar-expert' # circuit breaker of the Stellar Expert API
 
         # set environment
         self.env_helpers = EnvHelpers()
@@ -45,10 +56,39 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
 
     def on_retry_failure(self, retry_state):
         sm_util = StellarMapUtilityHelpers()
-        sm_util.on_retry_failure(retry_state, self.cron_name)
+        sm_util.on_retry_failure(retry_state, self.cron_name, dependency=self.dependency)
+
+    def gather_se_responses(self, se_calls, concurrency=SE_CONCURRENCY):
+        """
+        Issues independent Stellar Expert calls concurrently over the shared session, so
+        the latency of an account is that of its slowest call instead of their sum.
+
+        Each call keeps its own retries; a call that fails does not fail the others.
+
+        :param se_calls: dict of response name to a callable returning the response
+        :param concurrency: maximum calls in flight; 1 issues them one after another
+        :return: dict of response name to the response, None for a failed call
+        """
+        se_responses = {}
+        if not se_calls:
+            return se_responses
+
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(se_calls)))) as executor:
+            futures = {name: executor.submit(se_call) for name, se_call in se_calls.items()}
+
+            # gather partial results
+            for name, future in futures.items():
+                try:
+                    se_responses[name] = future.result()
+                except Exception as e:
+                    sentry_sdk.capture_exception(e)
+                    se_responses[name] = None
+
+        return se_responses
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
        stop=stop_after_attempt(7),
+       retry=retry_if_not_exception_type(CircuitOpenError),
        retry_error_callback=on_retry_failure)
     def get_se_asset_list(self):
         """
@@ -114,7 +154,7 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
             base_se_network = self.env_helpers.get_base_se_network()
 
             # Make a GET request to the API to retrieve the asset list
-            response = requests.get(f"{base_se_network}/asset?search={self.lin_queryset.stellar_account}", headers=self.headers)
+            response = StellarMapRateLimiterHelpers.request('GET', f"{base_se_network}/asset?search={self.lin_queryset.stellar_account}", session=self.session, headers=self.headers)
             
             if response.status_code == 200:
                 # If the response is successful (status code 200), return the response data in JSON format
@@ -128,6 +168,7 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
            stop=stop_after_attempt(7),
+           retry=retry_if_not_exception_type(CircuitOpenError),
            retry_error_callback=on_retry_failure)
     def get_se_asset_rating(self, asset_code, asset_type):
         """
@@ -153,7 +194,7 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
         try:
             base_se_network = self.env_helpers.get_base_se_network()
             # Make a GET request to the API to retrieve the asset rating
-            response = requests.get(f"{base_se_network}/asset/{asset_code}-{self.lin_queryset.stellar_account}-{asset_type}/rating", headers=self.headers)
+            response = StellarMapRateLimiterHelpers.request('GET', f"{base_se_network}/asset/{asset_code}-{self.lin_queryset.stellar_account}-{asset_type}/rating", session=self.session, headers=self.headers)
             
             if response.status_code == 200:
                 # If the response is successful (status code 200), return the response data in JSON format
@@ -167,9 +208,14 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
            stop=stop_after_attempt(7),
+           retry=retry_if_not_exception_type(CircuitOpenError),
            retry_error_callback=on_retry_failure)
     def get_se_blocked_domain(self, asset_domain):
         """
+        The lineage crons look domains up in the local index of
+        StellarMapSEBlockedDomainsHelpers (sm_seindex), synced from the paginated list
+        below, and only call this endpoint until the index has been synced once.
+
         Example URI:
         >>> https://api.stellar.expert/explorer/directory/blocked-domains/{domain}
 
@@ -233,10 +279,10 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
             # Make a GET request to the API to retrieve blocked domains
             if asset_domain is None:
                 # Get list of all blocked domains
-                response = requests.get(f"{base_se_blocked_domains}", headers=self.headers)
+                response = StellarMapRateLimiterHelpers.request('GET', f"{base_se_blocked_domains}", session=self.session, headers=self.headers)
             else:
                 # Get domain specific blocked domain
-                response = requests.get(f"{base_se_blocked_domains}{asset_domain}", headers=self.headers)
+                response = StellarMapRateLimiterHelpers.request('GET', f"{base_se_blocked_domains}{asset_domain}", session=self.session, headers=self.headers)
             
             if response.status_code == 200:
                 # If the response is successful (status code 200), return the response data in JSON format
@@ -250,9 +296,14 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
 
     @retry(wait=wait_random_exponential(multiplier=1, max=71),
            stop=stop_after_attempt(7),
+           retry=retry_if_not_exception_type(CircuitOpenError),
            retry_error_callback=on_retry_failure)
     def get_se_account_directory(self):
         """
+        The lineage crons look accounts up in the local index of
+        StellarMapSEDirectoryHelpers and only call this endpoint until the index has
+        been synced once.
+
         Example URI:
         >>> https://api.stellar.expert/explorer/public/directory/{asset_issuer}
 
@@ -271,7 +322,7 @@ class StellarMapStellarExpertAPIHelpers(StellarMapHorizonAPIHelpers):
         try:
             base_se_network_dir = self.env_helpers.get_base_se_network_dir()
             # Make a GET request to the API to retrieve the SE account directory
-            response = requests.get(f"{base_se_network_dir}{self.lin_queryset.stellar_account}", headers=self.headers)
+            response = StellarMapRateLimiterHelpers.request('GET', f"{base_se_network_dir}{self.lin_queryset.stellar_account}", session=self.session, headers=self.headers)
             
             if response.status_code == 200:
                 # If the response is successful (status code 200), return the response data in JSON format
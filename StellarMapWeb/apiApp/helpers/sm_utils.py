@@ -1,6 +1,7 @@
 import re
 import sentry_sdk
 
+from apiApp.helpers.sm_circuitbreaker import StellarMapCircuitBreakerHelpers
 from apiApp.helpers.sm_cron import StellarMapCronHelpers
 
 class StellarMapParsingUtilityHelpers:
@@ -28,10 +29,14 @@ class StellarMapUtilityHelpers:
     A helpers class for utilities
     """
 
-    def on_retry_failure(self, retry_state, cron_name):
+    def on_retry_failure(self, retry_state, cron_name, dependency=None):
         # This function will be called every time a retry fails
         # Log the exception using Sentry SDK
         sentry_sdk.capture_exception(retry_state.outcome.exception())
-        # Call set_crons_unhealthy method of StellarMapCronHelpers class
-        cron_helpers = StellarMapCronHelpers(cron_name=cron_name)
-        cron_helpers.set_crons_unhealthy()
\ No newline at end of file
+        if dependency:
+            # open the circuit of the failing dependency; only the crons that need it stop
+            StellarMapCircuitBreakerHelpers(dependency=dependency).trip(reason=f'{retry_state.outcome.exception()}')
+        else:
+            # Call set_crons_unhealthy method of StellarMapCronHelpers class
+            cron_helpers = StellarMapCronHelpers(cron_name=cron_name)
+            cron_helpers.set_crons_unhealthy()
\ No newline at end of file
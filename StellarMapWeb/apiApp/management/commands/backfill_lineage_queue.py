@@ -0,0 +1,43 @@
+import sentry_sdk
+from apiApp.managers import StellarCreatorAccountLineageManager
+from apiApp.models import StellarCreatorAccountLineage
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('This management command is a one-time task that adds the StellarCreatorAccountLineage '
+        'records written before the work queue existed to StellarCreatorAccountLineageQueue '
+        'and StellarCreatorAccountLineageIndex.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Requeue every record, including records that already have a queue entry.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            # Create an instance of StellarCreatorAccountLineageManager
+            lineage_manager = StellarCreatorAccountLineageManager()
+
+            queued = 0
+            for lineage in StellarCreatorAccountLineage.objects.all():
+                lineage_manager.index_lineage(
+                    lineage_id=lineage.id,
+                    stellar_account=lineage.stellar_account,
+                    network_name=lineage.network_name,
+                    lineage_created_at=lineage.created_at,
+                    stellar_creator_account=lineage.stellar_creator_account
+                )
+
+                if lineage.status_queue_id and not options.get('all'):
+                    continue
+                if lineage_manager.requeue_lineage(lineage):
+                    queued += 1
+
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise ValueError(f'backfill_lineage_queue Error: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully queued {queued} lineage records'))
@@ -1,42 +1,20 @@
 import sentry_sdk
-from apiApp.helpers.sm_async import StellarMapAsyncHelpers
-from apiApp.helpers.sm_creatoraccountlineage import \
-    StellarMapCreatorAccountLineageHelpers
-from apiApp.helpers.sm_cron import StellarMapCronHelpers
-from apiApp.managers import StellarCreatorAccountLineageManager
+from apiApp.helpers.sm_pipeline import StellarMapLineagePipelineHelpers
 from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
     help = ('This management command is a scheduled task that populates the '
-        'home_domain and XLM balance Horizon API and persistently stores it in the database.')
+        'home_domain, XLM balance, assets and flags from the Horizon API accounts '
+        'document and persistently stores them in the database.')
 
     def handle(self, *args, **options):
         try:
-            # create an instance of cron helpers to check for cron health
-            cron_helpers = StellarMapCronHelpers(cron_name='cron_collect_account_lineage_attributes')
-            if cron_helpers.check_cron_health() is True:
-
-                # Create an instance of async
-                async_helpers = StellarMapAsyncHelpers()
-                
-                # Create an instance of StellarCreatorAccountLineageManager
-                lineage_manager = StellarCreatorAccountLineageManager()
-
-                # Query all records matching status from StellarCreatorAccountLineage
-                lin_queryset = lineage_manager.get_all_queryset(
-                    status__in=['DONE_HORIZON_API_DATASETS']
-                )
-                
-                # Create an instance of StellarMapCreatorAccountLineageHelpers
-                lineage_helpers = StellarMapCreatorAccountLineageHelpers()
-
-                # Run the async tasks with the custom function
-                async_helpers.execute_async(lin_queryset, lineage_helpers.async_update_from_accounts_raw_data)
+            # run one pass of the stage; run_lineage_pipeline hosts the same stage as a persistent worker
+            summary = StellarMapLineagePipelineHelpers().run_stage('cron_collect_account_lineage_attributes')
+            if summary is not None:
+                self.stdout.write(f"{summary['succeeded']} succeeded, {summary['failed']} failed in {summary['seconds']:.1f}s")
 
         except Exception as e:
             sentry_sdk.capture_exception(e)
             raise ValueError(f'cron_collect_account_lineage_attributes Error: {e}')
-
-
-
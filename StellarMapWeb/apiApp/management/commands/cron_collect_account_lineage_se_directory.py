@@ -1,9 +1,5 @@
 import sentry_sdk
-from apiApp.helpers.sm_async import StellarMapAsyncHelpers
-from apiApp.helpers.sm_creatoraccountlineage import \
-    StellarMapCreatorAccountLineageHelpers
-from apiApp.helpers.sm_cron import StellarMapCronHelpers
-from apiApp.managers import StellarCreatorAccountLineageManager
+from apiApp.helpers.sm_pipeline import StellarMapLineagePipelineHelpers
 from django.core.management.base import BaseCommand
 
 
@@ -13,26 +9,10 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            # create an instance of cron helpers to check for cron health
-            cron_helpers = StellarMapCronHelpers(cron_name='cron_collect_account_lineage_se_directory')
-            if cron_helpers.check_cron_health() is True:
-
-                # Create an instance of async
-                async_helpers = StellarMapAsyncHelpers()
-                
-                # Create an instance of StellarCreatorAccountLineageManager
-                lineage_manager = StellarCreatorAccountLineageManager()
-
-                # Query all records matching status from StellarCreatorAccountLineage
-                lin_queryset = lineage_manager.get_all_queryset(
-                    status__in=['DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF']
-                )
-                
-                # Create an instance of StellarMapCreatorAccountLineageHelpers
-                lineage_helpers = StellarMapCreatorAccountLineageHelpers()
-
-                # Run the async tasks with the custom function
-                async_helpers.execute_async(lin_queryset, lineage_helpers.async_stellar_expert_explorer_directory_doc_api_href_from_accounts_raw_data)
+            # run one pass of the stage; run_lineage_pipeline hosts the same stage as a persistent worker
+            summary = StellarMapLineagePipelineHelpers().run_stage('cron_collect_account_lineage_se_directory')
+            if summary is not None:
+                self.stdout.write(f"{summary['succeeded']} succeeded, {summary['failed']} failed in {summary['seconds']:.1f}s")
 
         except Exception as e:
             sentry_sdk.capture_exception(e)
@@ -0,0 +1,92 @@
+import signal
+import threading
+
+import sentry_sdk
+from apiApp.helpers.sm_conn import (CassandraConnectionsHelpers,
+                                    StellarMapHTTPSessionHelpers)
+from apiApp.helpers.sm_pipeline import (PIPELINE_IDLE_SECONDS,
+                                        StellarMapLineagePipelineHelpers)
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('This management command is a long-running process that hosts every stage '
+        'of the lineage pipeline, one worker thread per stage, sharing the Cassandra '
+        'session and the pooled HTTP sessions of the process. A record finished by one '
+        'stage is handed to the next stage right away. It replaces the stage crons, '
+        'which remain available for a single pass.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stages',
+            nargs='+',
+            default=None,
+            help='Cron names of the stages to host; defaults to every stage.'
+        )
+        parser.add_argument(
+            '--idle-seconds',
+            type=float,
+            default=PIPELINE_IDLE_SECONDS,
+            help='Seconds a worker sleeps after a pass that found no work.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single pass of every stage and exit.'
+        )
+
+    def handle(self, *args, **options):
+        # Create an instance of StellarMapLineagePipelineHelpers
+        pipeline_helpers = StellarMapLineagePipelineHelpers()
+
+        stage_names = options.get('stages') or pipeline_helpers.get_stage_names()
+        unknown_stages = set(stage_names) - set(pipeline_helpers.get_stage_names())
+        if unknown_stages:
+            raise CommandError(f'Unknown stages: {", ".join(sorted(unknown_stages))}')
+
+        # chain the hosted stages with in-process queues
+        pipeline_helpers.enable_events(stage_names)
+
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write(f'Received signal {signum}, stopping after the passes in progress')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        workers = [
+            threading.Thread(
+                target=pipeline_helpers.run_worker,
+                name=stage_name,
+                kwargs={
+                    'stage_name': stage_name,
+                    'stop_event': stop_event,
+                    'idle_seconds': options.get('idle_seconds'),
+                    'once': options.get('once')
+                }
+            )
+            for stage_name in stage_names
+        ]
+
+        try:
+            for worker in workers:
+                worker.start()
+
+            # join with a timeout so the main thread keeps handling the signals
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(timeout=1)
+
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            stop_event.set()
+            raise ValueError(f'run_lineage_pipeline Error: {e}')
+
+        finally:
+            # close the connections shared by the workers
+            StellarMapHTTPSessionHelpers.close_sessions()
+            CassandraConnectionsHelpers.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully stopped {len(workers)} lineage stages'))
@@ -1,12 +1,39 @@
-from datetime import datetime
+import datetime
+import uuid
 
 import pandas as pd
 import pytz
 import sentry_sdk
+from apiApp.helpers.sm_cache import (StellarMapCronHealthCacheHelpers,
+                                     StellarMapGenealogyCacheHelpers)
 from apiApp.helpers.sm_conn import CassandraConnectionsHelpers
 from apiApp.helpers.sm_datetime import StellarMapDateTimeHelpers
-from apiApp.models import (ManagementCronHealth, StellarCreatorAccountLineage,
+from apiApp.models import (ManagementCronHealth, ManagementCronHealthHistory,
+                           ManagementCronHealthLatest,
+                           StellarCreatorAccountLineage,
+                           StellarCreatorAccountLineageIndex,
+                           StellarCreatorAccountLineageQueue,
                            UserInquirySearchHistory)
+from cassandra.cqlengine.query import BatchQuery, LWTException
+from decouple import config
+
+LINEAGE_LEASE_SECONDS = config('LINEAGE_LEASE_SECONDS', default=600, cast=int)
+
+# values of stellar_creator_account of the root of a genealogy (None means not collected yet)
+ROOT_CREATOR_ACCOUNTS = ['', 'no_element_funder']
+
+# maximum keys per IN query
+CQL_IN_CHUNK_SIZE = 100
+
+# queue entries read per page when streaming the lineage work queue
+LINEAGE_QUEUE_FETCH_SIZE = config('LINEAGE_QUEUE_FETCH_SIZE', default=100, cast=int)
+
+# statuses no cron picks up, so records reaching them leave the work queue
+UNQUEUED_LINEAGE_STATUSES = [
+    'DONE_MAKE_GRANDPARENT_LINEAGE',
+    'DONE_COLLECTING_CREATOR_ACCOUNT',
+    'ERROR_ENRICHING_FROM_ACCOUNTS_RAW_DATA'
+]
 
 
 class UserInquirySearchHistoryManager():
@@ -153,17 +180,46 @@ class StellarCreatorAccountLineageManager():
             # add the created_at field to the request
             request.data['created_at'] = date_obj
 
-            return StellarCreatorAccountLineage.objects.create(**request.data)
+            data = dict(request.data)
+            data.setdefault('id', uuid.uuid4())
+
+            # create the record and its work-queue entry in one logged batch
+            with BatchQuery() as batch:
+                status = data.get('status')
+                if status and status not in UNQUEUED_LINEAGE_STATUSES:
+                    data['status_queue_id'] = self.enqueue_lineage(
+                        lineage_id=data['id'],
+                        stellar_account=data['stellar_account'],
+                        network_name=data['network_name'],
+                        lineage_created_at=data['created_at'],
+                        status=status,
+                        batch=batch
+                    )
+                self.index_lineage(
+                    lineage_id=data['id'],
+                    stellar_account=data['stellar_account'],
+                    network_name=data['network_name'],
+                    lineage_created_at=data['created_at'],
+                    stellar_creator_account=data.get('stellar_creator_account'),
+                    batch=batch
+                )
+                lineage = StellarCreatorAccountLineage.batch(batch).create(**data)
+
+            return lineage
         except Exception as e:
             sentry_sdk.capture_exception(e)
             raise e
 
-    def update_lineage(self, id, request, *args, **kwargs):
+    def update_lineage(self, id, request, lineage=None, *args, **kwargs):
         """
         Updates an lineage with the given id.
 
+        Passing the lineage instance the caller already holds (the crons' lin_queryset)
+        writes it blind by its full primary key, without reading the record first.
+
         :param id: the id of the lineage to update
         :param request: the request object
+        :param lineage: optional lineage instance with the id, to skip reading the record
         :param args: additional positional arguments
         :param kwargs: additional key-value arguments
         :return: the updated lineage
@@ -175,24 +231,32 @@ class StellarCreatorAccountLineageManager():
             date_obj = dt_helpers.get_datetime_obj()
 
             # get the lineage instance
-            lineage = self.get_queryset(id=id)
+            if lineage is None:
+                lineage = self.get_queryset(id=id)
 
             # add the updated_at field to the request
             request.data['updated_at'] = date_obj
 
-            return lineage.update(**request.data)
+            return self.write_lineage(lineage, dict(request.data))
             
         except Exception as e:
             sentry_sdk.capture_exception(e)
             raise e
 
-    def update_status(self, id, status):
+    def update_status(self, id, status, lineage=None, expected_status=None):
         """
         Updates an lineage's status with the given id.
 
+        Passing the lineage instance the caller already holds (the crons' lin_queryset)
+        writes it blind by its full primary key, without reading the record first.
+        Passing expected_status makes the transition conditional (IF status = ...),
+        so only one of several workers moves the record on.
+
         :param id: the id of the lineage to update
         :param status: the status of the lineage to update
-        :return: the updated lineage
+        :param lineage: optional lineage instance with the id, to skip reading the record
+        :param expected_status: optional status the record must still have
+        :return: the updated lineage, or None if the record no longer had expected_status
         """
         try:
             # get datetime object
@@ -201,17 +265,565 @@ class StellarCreatorAccountLineageManager():
             date_obj = dt_helpers.get_datetime_obj()
 
             # get the lineage instance
-            lineage = self.get_queryset(id=id)
-            
-            return lineage.update(
+            if lineage is None:
+                lineage = self.get_queryset(id=id)
+
+            data = dict(
                 status = status,
                 updated_at = date_obj
             )
+
+            if expected_status is not None:
+                try:
+                    return self.conditional_write_lineage(lineage, dict(status=expected_status), data)
+                except LWTException:
+                    return None
+
+            return self.write_lineage(lineage, data)
             
         except Exception as e:
             sentry_sdk.capture_exception(e)
             raise e
 
+    def enqueue_lineage(self, lineage_id, stellar_account, network_name, lineage_created_at, status, batch=None):
+        """
+        Adds a work-queue entry for a lineage record in the partition of its status.
+
+        :param lineage_id: the id of the lineage record
+        :param stellar_account: the Stellar account of the lineage record
+        :param network_name: the network name of the lineage record
+        :param lineage_created_at: the created_at of the lineage record
+        :param status: the status the record is queued with
+        :param batch: optional BatchQuery to add the write to
+        :return: the queue_id of the entry
+        """
+        queue_id = uuid.uuid1()
+        StellarCreatorAccountLineageQueue.batch(batch).create(
+            network_name = network_name,
+            status = status,
+            queue_id = queue_id,
+            lineage_id = lineage_id,
+            stellar_account = stellar_account,
+            lineage_created_at = lineage_created_at
+        )
+        return queue_id
+
+    def dequeue_lineage(self, network_name, status, queue_id, batch=None):
+        """
+        Deletes a work-queue entry.
+
+        :param network_name: the network name of the entry
+        :param status: the status partition of the entry
+        :param queue_id: the queue_id of the entry
+        :param batch: optional BatchQuery to add the delete to
+        """
+        StellarCreatorAccountLineageQueue.objects.filter(
+            network_name = network_name,
+            status = status,
+            queue_id = queue_id
+        ).batch(batch).delete()
+
+    def index_lineage(self, lineage_id, stellar_account, network_name, lineage_created_at, stellar_creator_account, batch=None):
+        """
+        Writes the StellarCreatorAccountLineageIndex entry of a lineage record, with the
+        ancestor path extended from the stored path of its creator.
+
+        :param lineage_id: the id of the lineage record
+        :param stellar_account: the Stellar account of the lineage record
+        :param network_name: the network name of the lineage record
+        :param lineage_created_at: the created_at of the lineage record
+        :param stellar_creator_account: the creator of the Stellar account, if known
+        :param batch: optional BatchQuery to add the write to
+        :return: the index entry
+        """
+        ancestor_path, ancestor_path_complete = self.make_ancestor_path(
+            stellar_account=stellar_account,
+            stellar_creator_account=stellar_creator_account,
+            network_name=network_name
+        )
+
+        return StellarCreatorAccountLineageIndex.batch(batch).create(
+            network_name = network_name,
+            stellar_account = stellar_account,
+            lineage_id = lineage_id,
+            lineage_created_at = lineage_created_at,
+            stellar_creator_account = stellar_creator_account,
+            ancestor_path = ancestor_path,
+            ancestor_path_complete = ancestor_path_complete
+        )
+
+    def make_ancestor_path(self, stellar_account, stellar_creator_account, network_name):
+        """
+        Returns the ancestor path of an account: its creator followed by the stored
+        path of the creator. A creator without a complete path (its own creator is not
+        collected yet) gives an incomplete path, which get_genealogies() extends when
+        read. A cycle is cut before the account repeats itself and reported to Sentry.
+
+        :param stellar_account: the Stellar account
+        :param stellar_creator_account: the creator of the Stellar account, if known
+        :param network_name: the network name of the account
+        :return: tuple of the ancestor path and whether it reaches the root
+        """
+        if stellar_creator_account is None:
+            # creator not collected yet
+            return [], False
+
+        if stellar_creator_account in ROOT_CREATOR_ACCOUNTS:
+            return [], True
+
+        creator_entry = self.get_lineage_index(
+            stellar_accounts=[stellar_creator_account],
+            network_name=network_name
+        ).get(stellar_creator_account)
+
+        ancestor_path = [stellar_creator_account]
+        ancestor_path_complete = False
+        if creator_entry is not None:
+            ancestor_path += list(creator_entry.ancestor_path or [])
+            ancestor_path_complete = bool(creator_entry.ancestor_path_complete)
+
+        if stellar_account in ancestor_path:
+            sentry_sdk.capture_message(f'Cycle in the genealogy of {stellar_account} on {network_name}: {ancestor_path}')
+            return ancestor_path[:ancestor_path.index(stellar_account)], True
+
+        return ancestor_path, ancestor_path_complete
+
+    def get_lineage_index(self, stellar_accounts, network_name):
+        """
+        Returns the index entries of the given accounts, IN-batched on the partition key.
+
+        :param stellar_accounts: list of Stellar accounts
+        :param network_name: the network name of the accounts
+        :return: dict of Stellar account to index entry
+        """
+        entries = {}
+        stellar_accounts = list(stellar_accounts)
+        for i in range(0, len(stellar_accounts), CQL_IN_CHUNK_SIZE):
+            for entry in StellarCreatorAccountLineageIndex.objects.filter(
+                network_name = network_name,
+                stellar_account__in = stellar_accounts[i:i + CQL_IN_CHUNK_SIZE]
+            ):
+                entries[entry.stellar_account] = entry
+        return entries
+
+    def get_lineages_by_id(self, ids):
+        """
+        Returns the lineage records with the given ids, IN-batched on the partition key.
+
+        :param ids: list of lineage ids
+        :return: dict of id to lineage record
+        """
+        lineages = {}
+        ids = list(ids)
+        for i in range(0, len(ids), CQL_IN_CHUNK_SIZE):
+            for lineage in StellarCreatorAccountLineage.objects.filter(id__in=ids[i:i + CQL_IN_CHUNK_SIZE]):
+                lineages[lineage.id] = lineage
+        return lineages
+
+    def get_genealogies(self, stellar_accounts, network_name):
+        """
+        Resolves the creator chains of the given accounts from their materialized
+        ancestor paths: the index entries of every account on the stored paths are read
+        together in one IN-batched read, followed by IN-batched id reads of the lineage
+        records. An incomplete path is extended from the stored path of its last account,
+        and the completed path is written back to the entry of the requested account,
+        so the next lookup of that account takes a single round of reads.
+
+        Accounts missing from the index (records written before it existed) fall back to
+        a filtered read of StellarCreatorAccountLineage and are indexed on the way.
+
+        :param stellar_accounts: list of Stellar accounts
+        :param network_name: the network name of the accounts
+        :return: dict of Stellar account to the list of lineage records from the account up to its root
+        """
+        try:
+            entries = {}
+            frontier = set(stellar_accounts)
+            requested = set(frontier)
+            while frontier:
+                found = self.get_lineage_index(stellar_accounts=frontier, network_name=network_name)
+
+                for stellar_account in frontier - set(found):
+                    lineage = self.get_queryset(stellar_account=stellar_account, network_name=network_name)
+                    if lineage is not None:
+                        found[stellar_account] = self.index_lineage(
+                            lineage_id=lineage.id,
+                            stellar_account=lineage.stellar_account,
+                            network_name=lineage.network_name,
+                            lineage_created_at=lineage.created_at,
+                            stellar_creator_account=lineage.stellar_creator_account
+                        )
+
+                entries.update(found)
+                frontier = {
+                    stellar_account
+                    for entry in found.values()
+                    for stellar_account in [entry.stellar_creator_account] + list(entry.ancestor_path or [])
+                    if stellar_account is not None
+                    and stellar_account not in ROOT_CREATOR_ACCOUNTS
+                    and stellar_account not in requested
+                }
+                requested |= frontier
+
+            lineages = self.get_lineages_by_id(ids={entry.lineage_id for entry in entries.values()})
+
+            genealogies = {}
+            for stellar_account in stellar_accounts:
+                chain = []
+                account_in_loop = stellar_account
+                # stop at the root, at a missing record or at a cycle
+                while account_in_loop in entries and len(chain) < len(entries):
+                    lineage = lineages.get(entries[account_in_loop].lineage_id)
+                    if lineage is None:
+                        break
+                    chain.append(lineage)
+                    account_in_loop = entries[account_in_loop].stellar_creator_account
+                genealogies[stellar_account] = chain
+
+                # write back the path once the chain reached its root
+                entry = entries.get(stellar_account)
+                if (entry is not None and not entry.ancestor_path_complete and chain
+                        and entries[chain[-1].stellar_account].stellar_creator_account in ROOT_CREATOR_ACCOUNTS):
+                    entry.update(
+                        ancestor_path=[lineage.stellar_account for lineage in chain[1:]],
+                        ancestor_path_complete=True
+                    )
+
+            return genealogies
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def refresh_ancestor_path(self, lineage):
+        """
+        Rewrites the index entry of a lineage record, extending its ancestor path from
+        the currently stored path of its creator.
+
+        :param lineage: the lineage record
+        :return: the index entry
+        """
+        try:
+            return self.index_lineage(
+                lineage_id=lineage.id,
+                stellar_account=lineage.stellar_account,
+                network_name=lineage.network_name,
+                lineage_created_at=lineage.created_at,
+                stellar_creator_account=lineage.stellar_creator_account
+            )
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def invalidate_genealogy_cache(self, lineage):
+        """
+        Drops the cached genealogy response of the account of a lineage record.
+        Responses of its descendants are not served either, since their version
+        (the latest updated_at along the genealogy) no longer matches.
+
+        :param lineage: the lineage record that was written
+        """
+        cache_helpers = StellarMapGenealogyCacheHelpers(
+            network_name=lineage.network_name,
+            stellar_account=lineage.stellar_account
+        )
+        cache_helpers.invalidate()
+
+    def write_lineage(self, lineage, data):
+        """
+        Updates a lineage record with `data`. When the status changes, the work-queue
+        entry moves to the partition of the new status in the same logged batch.
+
+        :param lineage: the lineage record
+        :param data: the fields to update
+        :return: the updated lineage
+        """
+        with BatchQuery() as batch:
+            if 'status' in data and data['status'] != lineage.status:
+                if lineage.status_queue_id:
+                    self.dequeue_lineage(lineage.network_name, lineage.status, lineage.status_queue_id, batch=batch)
+                data['status_queue_id'] = None
+                if data['status'] not in UNQUEUED_LINEAGE_STATUSES:
+                    data['status_queue_id'] = self.enqueue_lineage(
+                        lineage_id=lineage.id,
+                        stellar_account=lineage.stellar_account,
+                        network_name=lineage.network_name,
+                        lineage_created_at=lineage.created_at,
+                        status=data['status'],
+                        batch=batch
+                    )
+            if 'stellar_creator_account' in data:
+                self.index_lineage(
+                    lineage_id=lineage.id,
+                    stellar_account=lineage.stellar_account,
+                    network_name=lineage.network_name,
+                    lineage_created_at=lineage.created_at,
+                    stellar_creator_account=data['stellar_creator_account'],
+                    batch=batch
+                )
+            lineage.batch(batch).update(**data)
+
+        # detach the instance from the finished batch
+        lineage.batch(None)
+
+        self.invalidate_genealogy_cache(lineage)
+        return lineage
+
+    def conditional_write_lineage(self, lineage, conditions, data):
+        """
+        Updates a lineage record with `data` under a lightweight transaction on
+        `conditions`. A lightweight transaction can not share a batch with the queue
+        partitions, so the entry of the new status is written first and the old entry
+        deleted only once the transaction applied; a crash in between leaves at worst
+        a stale entry, which get_queued_queryset() discards.
+
+        :param lineage: the lineage record
+        :param conditions: the IF conditions of the update
+        :param data: the fields to update
+        :raises LWTException: if the conditions did not hold
+        :return: the updated lineage
+        """
+        old_status, old_queue_id = lineage.status, lineage.status_queue_id
+        moves = 'status' in data and data['status'] != old_status
+
+        if moves:
+            data['status_queue_id'] = None
+            if data['status'] not in UNQUEUED_LINEAGE_STATUSES:
+                data['status_queue_id'] = self.enqueue_lineage(
+                    lineage_id=lineage.id,
+                    stellar_account=lineage.stellar_account,
+                    network_name=lineage.network_name,
+                    lineage_created_at=lineage.created_at,
+                    status=data['status']
+                )
+
+        try:
+            lineage.iff(**conditions).update(**data)
+        except LWTException:
+            if moves and data['status_queue_id']:
+                self.dequeue_lineage(lineage.network_name, data['status'], data['status_queue_id'])
+            raise
+        finally:
+            # clear the conditions so later updates of the instance are not conditional
+            lineage.iff()
+
+        if moves and old_queue_id:
+            self.dequeue_lineage(lineage.network_name, old_status, old_queue_id)
+
+        self.invalidate_genealogy_cache(lineage)
+        return lineage
+
+    def requeue_lineage(self, lineage):
+        """
+        Adds a work-queue entry for a lineage record written before the queue existed
+        (or whose entry was lost), replacing any entry it already has.
+
+        :param lineage: the lineage record
+        :return: True if the record was queued, False if its status is not queued
+        """
+        if lineage.status in UNQUEUED_LINEAGE_STATUSES:
+            return False
+
+        with BatchQuery() as batch:
+            if lineage.status_queue_id:
+                self.dequeue_lineage(lineage.network_name, lineage.status, lineage.status_queue_id, batch=batch)
+            queue_id = self.enqueue_lineage(
+                lineage_id=lineage.id,
+                stellar_account=lineage.stellar_account,
+                network_name=lineage.network_name,
+                lineage_created_at=lineage.created_at,
+                status=lineage.status,
+                batch=batch
+            )
+            lineage.batch(batch).update(status_queue_id=queue_id)
+
+        lineage.batch(None)
+        return True
+
+    def get_queued_queryset(self, statuses, limit=None, network_names=('testnet', 'public')):
+        """
+        Returns the lineage records queued with one of the given statuses, oldest
+        first, reading the work-queue partitions instead of scanning the lineage table.
+        Entries whose record has since moved on are deleted.
+
+        :param statuses: list of statuses to poll
+        :param limit: maximum number of records to return
+        :param network_names: the networks to poll
+        :return: a list of lineage records
+        """
+        try:
+            lineages = []
+            for lineage in self.iter_queued_queryset(statuses=statuses, network_names=network_names, fetch_size=limit):
+                lineages.append(lineage)
+                if limit and len(lineages) >= limit:
+                    break
+            return lineages
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def iter_queued_queryset(self, statuses, network_names=('testnet', 'public'), fetch_size=None):
+        """
+        Yields the lineage records queued with one of the given statuses, oldest first,
+        paging through the work-queue partitions with the driver's fetch size so a large
+        backlog is never read at once. Entries whose record has since moved on are deleted.
+
+        :param statuses: list of statuses to poll
+        :param network_names: the networks to poll
+        :param fetch_size: queue entries read per page; defaults to LINEAGE_QUEUE_FETCH_SIZE
+        :return: a generator of lineage records
+        """
+        fetch_size = min(fetch_size or LINEAGE_QUEUE_FETCH_SIZE, LINEAGE_QUEUE_FETCH_SIZE)
+        for network_name in network_names:
+            for status in statuses:
+                entries = StellarCreatorAccountLineageQueue.objects.filter(
+                    network_name = network_name,
+                    status = status
+                ).fetch_size(fetch_size)
+
+                for entry in entries:
+                    lineage = StellarCreatorAccountLineage.objects.filter(
+                        id = entry.lineage_id,
+                        stellar_account = entry.stellar_account,
+                        network_name = entry.network_name,
+                        created_at = entry.lineage_created_at
+                    ).first()
+
+                    if lineage is None or lineage.status != status or lineage.status_queue_id != entry.queue_id:
+                        # stale entry
+                        self.dequeue_lineage(network_name, status, entry.queue_id)
+                        continue
+
+                    yield lineage
+
+    def claim_lineage(self, lin_queryset, status, in_progress_status, lease_seconds=LINEAGE_LEASE_SECONDS):
+        """
+        Claims a lineage record for one worker by moving it from `status` to
+        `in_progress_status` with a lightweight transaction (IF status = ...),
+        so concurrent workers or hosts never claim the same record.
+
+        :param lin_queryset: the lineage record
+        :param status: the status the record is expected to have
+        :param in_progress_status: the status to claim the record with
+        :param lease_seconds: seconds before the lease expires and the record can be reclaimed
+        :return: the lease token, or None if another worker changed the record first
+        """
+        try:
+            # get datetime object
+            dt_helpers = StellarMapDateTimeHelpers()
+            dt_helpers.set_datetime_obj()
+            date_obj = dt_helpers.get_datetime_obj()
+
+            lease_token = uuid.uuid4()
+
+            self.conditional_write_lineage(lin_queryset, dict(status=status), dict(
+                status = in_progress_status,
+                lease_token = lease_token,
+                lease_expires_at = date_obj + datetime.timedelta(seconds=lease_seconds),
+                updated_at = date_obj
+            ))
+
+            return lease_token
+        except LWTException:
+            return None
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def renew_lease(self, lin_queryset, lease_token, request=None, lease_seconds=LINEAGE_LEASE_SECONDS):
+        """
+        Extends the lease held with `lease_token`, optionally updating other fields.
+
+        :param lin_queryset: the lineage record
+        :param lease_token: the token returned by claim_lineage()
+        :param request: optional request object with the fields to update
+        :param lease_seconds: seconds from now before the lease expires
+        :return: True if the lease is still held, False if it was lost to another worker
+        """
+        try:
+            # get datetime object
+            dt_helpers = StellarMapDateTimeHelpers()
+            dt_helpers.set_datetime_obj()
+            date_obj = dt_helpers.get_datetime_obj()
+
+            data = dict(request.data) if request is not None else {}
+            data['lease_expires_at'] = date_obj + datetime.timedelta(seconds=lease_seconds)
+            data['updated_at'] = date_obj
+
+            self.conditional_write_lineage(lin_queryset, dict(lease_token=lease_token), data)
+            return True
+        except LWTException:
+            return False
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def release_lineage(self, lin_queryset, lease_token, request):
+        """
+        Updates a claimed lineage record with the request data (usually the DONE_
+        status) and releases its lease, only if the lease is still held.
+
+        :param lin_queryset: the lineage record
+        :param lease_token: the token returned by claim_lineage()
+        :param request: the request object with the fields to update
+        :return: True if the record was updated, False if the lease was lost to another worker
+        """
+        try:
+            # get datetime object
+            dt_helpers = StellarMapDateTimeHelpers()
+            dt_helpers.set_datetime_obj()
+            date_obj = dt_helpers.get_datetime_obj()
+
+            data = dict(request.data)
+            data['lease_token'] = None
+            data['lease_expires_at'] = None
+            data['updated_at'] = date_obj
+
+            self.conditional_write_lineage(lin_queryset, dict(lease_token=lease_token), data)
+            return True
+        except LWTException:
+            return False
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def expire_lease(self, lin_queryset, status):
+        """
+        Returns an IN_PROGRESS lineage record whose lease has expired (or that was
+        claimed before leases existed) to `status`, so it can be claimed again.
+        The lightweight transaction on the lease token makes sure a worker that
+        just renewed its lease keeps it.
+
+        :param lin_queryset: the lineage record
+        :param status: the status to return the record to
+        :return: True if the record was returned to `status`
+        """
+        try:
+            # get datetime object
+            dt_helpers = StellarMapDateTimeHelpers()
+            dt_helpers.set_datetime_obj()
+            date_obj = dt_helpers.get_datetime_obj()
+
+            if lin_queryset.lease_expires_at is not None and lin_queryset.lease_expires_at > date_obj:
+                # lease still held
+                return False
+
+            self.conditional_write_lineage(
+                lin_queryset,
+                dict(status=lin_queryset.status, lease_token=lin_queryset.lease_token),
+                dict(
+                    status = status,
+                    lease_token = None,
+                    lease_expires_at = None,
+                    updated_at = date_obj
+                )
+            )
+            return True
+        except LWTException:
+            return False
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
 
 class ManagementCronHealthManager():
 
@@ -232,7 +844,9 @@ class ManagementCronHealthManager():
 
     def create_cron_health(self, request, *args, **kwargs):
         """
-        Creates a cron_health with the given information
+        Creates a cron_health with the given information. The record is appended to
+        management_cron_health and management_cron_health_history and upserted into
+        management_cron_health_latest in one logged batch.
         
         :param request: the request object
         :param args: additional positional arguments
@@ -249,11 +863,57 @@ class ManagementCronHealthManager():
             # add the created_at field to the request
             request.data['created_at'] = date_obj
 
-            return ManagementCronHealth.objects.create(**request.data)
+            data = dict(request.data)
+            data.setdefault('id', uuid.uuid4())
+
+            with BatchQuery() as batch:
+                cron_health = ManagementCronHealth.batch(batch).create(**data)
+                self.upsert_latest(
+                    cron_name=data['cron_name'],
+                    id=data['id'],
+                    status=data.get('status'),
+                    reason=data.get('reason'),
+                    created_at=date_obj,
+                    batch=batch
+                )
+                ManagementCronHealthHistory.batch(batch).create(
+                    cron_name = data['cron_name'],
+                    day = dt_helpers.get_date_str(),
+                    created_at = date_obj,
+                    id = data['id'],
+                    status = data.get('status'),
+                    reason = data.get('reason')
+                )
+
+            # drop the cron health gate snapshot so the new status is seen
+            StellarMapCronHealthCacheHelpers().invalidate()
+
+            return cron_health
         except Exception as e:
             sentry_sdk.capture_exception(e)
             raise e
 
+    def upsert_latest(self, cron_name, id, status, reason, created_at, updated_at=None, batch=None):
+        """
+        Writes the management_cron_health_latest row of a cron.
+
+        :param cron_name: the name of the cron job
+        :param id: the id of the matching ManagementCronHealth record
+        :param status: the status of the cron job
+        :param reason: the reason of the status
+        :param created_at: the creation time of the status
+        :param updated_at: the last update time of the status
+        :param batch: optional BatchQuery to add the write to
+        """
+        # an UPDATE upserts the row and clears the columns set to None
+        ManagementCronHealthLatest.objects.filter(cron_name=cron_name).batch(batch).update(
+            id = id,
+            status = status,
+            reason = reason,
+            created_at = created_at,
+            updated_at = updated_at
+        )
+
     def update_cron_health(self, id, status):
         """
         Updates an cron_health with the given id.
@@ -270,6 +930,15 @@ class ManagementCronHealthManager():
 
             # get the cron_health instance
             cron_health = self.get_queryset(id=id)
+
+            # keep the latest status in step when this is the latest record of the cron
+            latest = ManagementCronHealthLatest.objects.filter(cron_name=cron_health.cron_name).first()
+            if latest is not None and latest.id == id:
+                latest.update(
+                    status = status,
+                    updated_at = date_obj
+                )
+                StellarMapCronHealthCacheHelpers().invalidate()
             
             return cron_health.update(
                 status = status,
@@ -282,7 +951,73 @@ class ManagementCronHealthManager():
 
     def get_latest_record(self, cron_name):
         """
-        Returns the most recent record today for the given cron_name.
+        Returns the most recent record today for the given cron_name, read by key
+        from management_cron_health_latest.
+
+        :param cron_name: the name of the cron job
+        :return: the most recent record for the cron_name as a pandas Series, or an empty dataframe
+        """
+        try:
+            latest = ManagementCronHealthLatest.objects.filter(cron_name=cron_name).first()
+
+            if latest is None:
+                # cron without a status since management_cron_health_latest was added
+                legacy_record = self.get_latest_legacy_record(cron_name=cron_name)
+                if not legacy_record.empty:
+                    self.upsert_latest(
+                        cron_name=legacy_record['cron_name'],
+                        id=legacy_record['id'],
+                        status=legacy_record['status'],
+                        reason=legacy_record.get('reason'),
+                        created_at=legacy_record['created_at'],
+                        updated_at=legacy_record.get('updated_at')
+                    )
+                return legacy_record
+
+            return self.latest_to_record(latest)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def get_latest_records(self):
+        """
+        Returns the most recent record today of every cron in one read of
+        management_cron_health_latest.
+
+        :return: dict of cron_name to the most recent record as a pandas Series
+        """
+        try:
+            latest_records = {}
+            for latest in ManagementCronHealthLatest.objects.all():
+                record = self.latest_to_record(latest)
+                if not record.empty:
+                    latest_records[latest.cron_name] = record
+            return latest_records
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def latest_to_record(self, latest):
+        """
+        Returns a management_cron_health_latest row as a pandas Series, or an empty
+        dataframe when its status was not set today (matching get_latest_legacy_record).
+
+        :param latest: the ManagementCronHealthLatest row
+        :return: pandas Series or empty dataframe
+        """
+        date_helpers = StellarMapDateTimeHelpers()
+        date_helpers.set_datetime_obj()
+        the_current_date_str = date_helpers.get_date_str()
+
+        if latest.created_at is None or latest.created_at.strftime('%Y-%m-%d') != the_current_date_str:
+            return pd.DataFrame()
+
+        return pd.Series({field_name: getattr(latest, field_name) for field_name in latest._values.keys()})
+
+    def get_latest_legacy_record(self, cron_name):
+        """
+        Returns the most recent record today for the given cron_name from the
+        management_cron_health table, for crons without a management_cron_health_latest row.
 
         :param cron_name: the name of the cron job
         :return: the most recent record for the cron_name
@@ -300,9 +1035,14 @@ class ManagementCronHealthManager():
             the_current_date_str = date_helpers.get_date_str()
 
             conn_helpers = CassandraConnectionsHelpers()
-            cql_query = f"SELECT * FROM management_cron_health WHERE cron_name='{cron_name}' AND created_at >= '{the_current_date_str} 00:00:00' AND created_at <= '{the_current_date_str} 23:59:59' LIMIT 17 ALLOW FILTERING;"
+            cql_query = "SELECT * FROM management_cron_health WHERE cron_name = ? AND created_at >= ? AND created_at <= ? LIMIT 17 ALLOW FILTERING;"
 
             conn_helpers.set_cql_query(cql_query)
+            conn_helpers.set_cql_parameters([
+                cron_name,
+                datetime.datetime.strptime(f'{the_current_date_str} 00:00:00', '%Y-%m-%d %H:%M:%S'),
+                datetime.datetime.strptime(f'{the_current_date_str} 23:59:59', '%Y-%m-%d %H:%M:%S')
+            ])
             rows = conn_helpers.execute_cql()
 
             data_df = pd.DataFrame(rows)
@@ -325,6 +1065,11 @@ class ManagementCronHealthManager():
 
     def get_distinct_cron_names(self):
         try:
+            # one row per cron in management_cron_health_latest
+            cron_names = [latest.cron_name for latest in ManagementCronHealthLatest.objects.all()]
+            if cron_names:
+                return cron_names
+
             # query all latest distinct cron names
             conn_helpers = CassandraConnectionsHelpers()
             cql_query = "SELECT cron_name FROM management_cron_health limit 171;"
@@ -86,6 +86,12 @@ class StellarCreatorAccountLineage(DjangoCassandraModel):
         stellar_expert_explorer_account_doc_api_href (str): a field that stores the Stellar expert explorer account doc api href
         status (str): a field that stores the status of the request with a default value of 'pending'. The valid choices for the status field are 'pending', 'in_progress', and 'completed'.
         stellar_expert_explorer_directory_doc_api_href (str): a field that stored the Stellar expert explorer directory tags doc api href
+        horizon_accounts_operations_cursor (str): a field that stores the Horizon paging_token to resume collecting operations from
+        horizon_accounts_effects_cursor (str): a field that stores the Horizon paging_token to resume collecting effects from
+        lease_token (uuid.UUID): a field that stores the token of the worker currently holding the record IN_PROGRESS
+        lease_expires_at (datetime): a field that stores when the lease expires and the record can be reclaimed by another worker
+        status_queue_id (uuid.UUID): a field that stores the queue_id of the record's entry in StellarCreatorAccountLineageQueue
+        enrichment_failures (int): a field that stores the consecutive failed enrichments of the record
     """
 
     __keyspace__ = CASSANDRA_DB_NAME
@@ -107,6 +113,12 @@ class StellarCreatorAccountLineage(DjangoCassandraModel):
     horizon_accounts_assets_doc_api_href = cassandra_columns.Text() # parse_account_assets()
     stellar_expert_explorer_directory_doc_api_href = cassandra_columns.Text() # https://api.stellar.expert/explorer/directory/{stellar_account}
     horizon_accounts_flags_doc_api_href = cassandra_columns.Text() # parse_account_flags()
+    horizon_accounts_operations_cursor = cassandra_columns.Text() # paging_token of the last collected operations page
+    horizon_accounts_effects_cursor = cassandra_columns.Text() # paging_token of the last collected effects page
+    lease_token = cassandra_columns.UUID() # claim_lineage()
+    lease_expires_at = cassandra_columns.DateTime() # claim_lineage()
+    status_queue_id = cassandra_columns.TimeUUID() # StellarCreatorAccountLineageQueue.queue_id
+    enrichment_failures = cassandra_columns.Integer() # async_enrich_from_accounts_raw_data()
 
 
     def __str__(self):
@@ -119,6 +131,104 @@ class StellarCreatorAccountLineage(DjangoCassandraModel):
         get_pk_field = "id"
 
 
+class StellarCreatorAccountLineageQueue(DjangoCassandraModel):
+    """
+    A work queue of StellarCreatorAccountLineage records partitioned by network and status,
+    so the crons poll the partition of the status they process instead of filtering the
+    whole lineage table on its non-key status column.
+
+    Note:
+        The entries are maintained by StellarCreatorAccountLineageManager whenever the
+        status of a lineage record changes. Terminal statuses are not queued.
+
+        CQL to order the entries by time of queueing
+        >>> CREATE TABLE stellar_creator_account_lineage_queue (
+        >>>     network_name text,
+        >>>     status text,
+        >>>     queue_id timeuuid,
+        >>>     lineage_id UUID,
+        >>>     stellar_account text,
+        >>>     lineage_created_at timestamp,
+        >>>     PRIMARY KEY ((network_name, status), queue_id)
+        >>> ) WITH CLUSTERING ORDER BY (queue_id ASC)
+
+    Attributes:
+        network_name (str): the network name of the lineage record
+        status (str): the status of the lineage record
+        queue_id (uuid.UUID): a time based uuid ordering the entries from the oldest
+        lineage_id (uuid.UUID): the id of the lineage record
+        stellar_account (str): the Stellar account of the lineage record
+        lineage_created_at (datetime): the created_at of the lineage record
+    """
+
+    __keyspace__ = CASSANDRA_DB_NAME
+    network_name = cassandra_columns.Text(partition_key=True, max_length=9)
+    status = cassandra_columns.Text(partition_key=True, max_length=63)
+    queue_id = cassandra_columns.TimeUUID(primary_key=True, clustering_order="ASC")
+    lineage_id = cassandra_columns.UUID()
+    stellar_account = cassandra_columns.Text(max_length=56)
+    lineage_created_at = cassandra_columns.DateTime()
+
+    def __str__(self):
+        """ Method to display Stellar account, network and status in the admin django interface.
+        """
+        return 'Stellar Account: ' + self.stellar_account + ' | network: ' + self.network_name + ' | status: ' + self.status
+
+    class Meta:
+        db_table = 'stellar_creator_account_lineage_queue'
+        get_pk_field = "queue_id"
+
+
+class StellarCreatorAccountLineageIndex(DjangoCassandraModel):
+    """
+    A lookup of the lineage record and creator of each Stellar account, partitioned by
+    network and account, so the genealogy of an account is resolved with partition key
+    reads instead of filtering StellarCreatorAccountLineage on its clustering columns.
+
+    Note:
+        The entries are maintained by StellarCreatorAccountLineageManager when a lineage
+        record is created and when its stellar_creator_account is set.
+
+        >>> CREATE TABLE stellar_creator_account_lineage_index (
+        >>>     network_name text,
+        >>>     stellar_account text,
+        >>>     lineage_id UUID,
+        >>>     lineage_created_at timestamp,
+        >>>     stellar_creator_account text,
+        >>>     ancestor_path list<text>,
+        >>>     ancestor_path_complete boolean,
+        >>>     PRIMARY KEY ((network_name, stellar_account))
+        >>> )
+
+    Attributes:
+        network_name (str): the network name of the lineage record
+        stellar_account (str): the Stellar account of the lineage record
+        lineage_id (uuid.UUID): the id of the lineage record
+        lineage_created_at (datetime): the created_at of the lineage record
+        stellar_creator_account (str): the account that created stellar_account
+        ancestor_path (list): the accounts from stellar_creator_account up to the furthest known ancestor
+        ancestor_path_complete (bool): whether the last account of ancestor_path is the root of the genealogy
+    """
+
+    __keyspace__ = CASSANDRA_DB_NAME
+    network_name = cassandra_columns.Text(partition_key=True, max_length=9)
+    stellar_account = cassandra_columns.Text(partition_key=True, max_length=56)
+    lineage_id = cassandra_columns.UUID()
+    lineage_created_at = cassandra_columns.DateTime()
+    stellar_creator_account = cassandra_columns.Text(max_length=56)
+    ancestor_path = cassandra_columns.List(cassandra_columns.Text)
+    ancestor_path_complete = cassandra_columns.Boolean(default=False)
+
+    def __str__(self):
+        """ Method to display Stellar account and network in the admin django interface.
+        """
+        return 'Stellar Account: ' + self.stellar_account + ' | network: ' + self.network_name
+
+    class Meta:
+        db_table = 'stellar_creator_account_lineage_index'
+        get_pk_field = "stellar_account"
+
+
 class ManagementCronHealth(DjangoCassandraModel):
     """
     A model that holds information on the status of each cron job in the system.
@@ -165,4 +275,89 @@ class ManagementCronHealth(DjangoCassandraModel):
     def __str__(self):
         """ Method to display cron name and status in the admin django interface.
         """
-        return 'Cron Name: ' + self.cron_name + ' | Status: ' + self.status
\ No newline at end of file
+        return 'Cron Name: ' + self.cron_name + ' | Status: ' + self.status
+
+class ManagementCronHealthLatest(DjangoCassandraModel):
+    """
+    The latest health status of each cron job, one row per cron upserted on every
+    status change, so the status of a cron is a single partition key read.
+
+    Note:
+        Written together with ManagementCronHealth and ManagementCronHealthHistory
+        by ManagementCronHealthManager.create_cron_health().
+
+        >>> CREATE TABLE management_cron_health_latest (
+        >>>     cron_name text PRIMARY KEY,
+        >>>     id UUID,
+        >>>     status text,
+        >>>     reason text,
+        >>>     created_at timestamp,
+        >>>     updated_at timestamp
+        >>> )
+
+    Attributes:
+        cron_name (str): The name of the cron job. The max length is 71.
+        id (uuid.UUID): The id of the matching ManagementCronHealth record.
+        status (str): The latest health status of the cron job.
+        reason (str): The reason of the latest status.
+        created_at (datetime.datetime): The creation time of the latest status.
+        updated_at (datetime.datetime): The last update time of the latest status.
+    """
+    __keyspace__ = CASSANDRA_DB_NAME
+    cron_name = cassandra_columns.Text(primary_key=True, max_length=71)
+    id = cassandra_columns.UUID()
+    status = cassandra_columns.Text(max_length=63)
+    reason = cassandra_columns.Text()
+    created_at = cassandra_columns.DateTime()
+    updated_at = cassandra_columns.DateTime()
+
+    class Meta:
+        db_table = 'management_cron_health_latest'
+        get_pk_field = "cron_name"
+
+    def __str__(self):
+        """ Method to display cron name and status in the admin django interface.
+        """
+        return 'Cron Name: ' + self.cron_name + ' | Status: ' + self.status
+
+
+class ManagementCronHealthHistory(DjangoCassandraModel):
+    """
+    The append-only history of the health status of each cron job, partitioned by
+    cron and day so a day of a cron is read from a single partition, newest first.
+
+    Note:
+        >>> CREATE TABLE management_cron_health_history (
+        >>>     cron_name text,
+        >>>     day text,
+        >>>     created_at timestamp,
+        >>>     id UUID,
+        >>>     status text,
+        >>>     reason text,
+        >>>     PRIMARY KEY ((cron_name, day), created_at)
+        >>> ) WITH CLUSTERING ORDER BY (created_at DESC)
+
+    Attributes:
+        cron_name (str): The name of the cron job. The max length is 71.
+        day (str): The day of created_at, formatted YYYY-MM-DD.
+        created_at (datetime.datetime): The creation time of the status.
+        id (uuid.UUID): The id of the matching ManagementCronHealth record.
+        status (str): The health status of the cron job.
+        reason (str): The reason of the status.
+    """
+    __keyspace__ = CASSANDRA_DB_NAME
+    cron_name = cassandra_columns.Text(partition_key=True, max_length=71)
+    day = cassandra_columns.Text(partition_key=True, max_length=10)
+    created_at = cassandra_columns.DateTime(primary_key=True, clustering_order="DESC")
+    id = cassandra_columns.UUID()
+    status = cassandra_columns.Text(max_length=63)
+    reason = cassandra_columns.Text()
+
+    class Meta:
+        db_table = 'management_cron_health_history'
+        get_pk_field = "cron_name"
+
+    def __str__(self):
+        """ Method to display cron name and status in the admin django interface.
+        """
+        return 'Cron Name: ' + self.cron_name + ' | Status: ' + self.status
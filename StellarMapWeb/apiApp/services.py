@@ -1,31 +1,169 @@
+import hashlib
 import json
+import os
+import zlib
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
 
-import requests
 import sentry_sdk
+from apiApp.helpers.sm_cache import StellarMapDocumentCacheHelpers
+from apiApp.helpers.sm_circuitbreaker import CircuitOpenError
+from apiApp.helpers.sm_ratelimit import StellarMapRateLimiterHelpers
+from apiApp.helpers.sm_utils import StellarMapParsingUtilityHelpers
 from apiApp.managers import ManagementCronHealthManager
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (retry, retry_if_not_exception_type, stop_after_attempt,
+                      wait_exponential)
 
 ASTRA_DB_ID = config('ASTRA_DB_ID')
 ASTRA_DB_REGION = config('ASTRA_DB_REGION')
 ASTRA_DB_KEYSPACE = config('ASTRA_DB_KEYSPACE')
 ASTRA_DB_APPLICATION_TOKEN = config('ASTRA_DB_APPLICATION_TOKEN')
 
+# the store new documents are written to: 'astra' (DataStax Document API) or 'local'
+DOCUMENT_STORE_BACKEND = config('DOCUMENT_STORE_BACKEND', default='astra')
 
-class AstraDocument:
+# directory of the local document store, required with DOCUMENT_STORE_BACKEND=local;
+# it must be durable since its hrefs are saved on the lineage records
+DOCUMENT_STORE_DIR = config('DOCUMENT_STORE_DIR', default=None)
+
+# compression of the local documents: 'zstd' (requires zstandard) or 'zlib'
+DOCUMENT_STORE_COMPRESSION = config('DOCUMENT_STORE_COMPRESSION', default='zstd')
+
+LOCAL_DOCUMENT_SCHEME = 'local'
+
+
+def get_document_store(href=None):
+    """
+    Returns the document store of an href saved on a lineage record, or the store
+    configured with DOCUMENT_STORE_BACKEND for new documents. The records written
+    before a change of backend keep being read from the store of their href.
+
+    :param href: the href of a stored document
+    :return: a DocumentStore with the href set
+    """
+    if href:
+        local = urlparse(href).scheme == LOCAL_DOCUMENT_SCHEME
+    else:
+        local = DOCUMENT_STORE_BACKEND == 'local'
+
+    document_store = LocalDocumentStore() if local else AstraDocument()
+    if href:
+        document_store.set_document_href(href)
+    return document_store
+
+
+class DocumentStore(ABC):
+    """
+    The interface of the stores of the raw API payloads collected for a lineage
+    record. A document is written with patch_document, which returns its href; the
+    lineage record keeps the href and a later stage reads the document back with
+    get_document in the format of the DataStax Document API:
+
+    {'documentId': ..., 'data': {'stellar_account': ..., 'network_name': ...,
+    'external_url': ..., 'raw_data': ...}}
+
+    get_document reads through StellarMapDocumentCacheHelpers and patch_document
+    writes through to it; subclasses implement fetch_document.
+
+    Usage:
+    ```
+    document_store = get_document_store()
+    document_store.set_document_id(document_id=doc_id)
+    document_store.set_collections_name(collections_name='horizon_accounts')
+    res_dict = document_store.patch_document(stellar_account, network_name, external_url, raw_data, cron_name)
+
+    document_store = get_document_store(href=res_dict['href'])
+    response_dict = document_store.get_document()
+    ```
+    """
+
+    def __init__(self):
+        self.collections_name = "default"
+        self.document_id = "default"
+        self.href = None
+
+    def set_document_id(self, document_id):
+        self.document_id = document_id
+
+    def set_collections_name(self, collections_name):
+        self.collections_name = collections_name
+
+    def set_document_href(self, href):
+        self.href = href
+
+    def set_datastax_url(self, datastax_url):
+        self.set_document_href(datastax_url)
+
+    @staticmethod
+    def make_document(stellar_account, network_name, external_url, raw_data):
+        return {
+            "stellar_account": stellar_account,
+            "network_name": network_name,
+            "external_url": external_url,
+            "raw_data": raw_data
+        }
+
+    @abstractmethod
+    def get_document_id(self, href):
+        """
+        Returns the document id of an href of this store, None if the href belongs to another store.
+        """
+
+    @abstractmethod
+    def patch_document(self, stellar_account, network_name, external_url, raw_data, cron_name):
+        """
+        Stores a document.
+
+        :return: dict with the documentId and the href of the document
+        :raises Exception: if the document could not be stored
+        """
+
+    def get_document(self):
+        """
+        Reads the document of the href through StellarMapDocumentCacheHelpers.
+
+        :raises Exception: if the document could not be read
+        """
+        cache_helpers = StellarMapDocumentCacheHelpers(href=self.href)
+        document = cache_helpers.get_document()
+        if document is None:
+            document = self.fetch_document()
+            cache_helpers.set_document(document=document)
+        return document
+
+    def cache_document(self, href, document_id, content):
+        """
+        Writes a patched document through to the cache in the format of get_document.
+
+        :param content: the JSON of the document
+        """
+        cache_helpers = StellarMapDocumentCacheHelpers(href=href)
+        cache_helpers.set_document(document={
+            "documentId": document_id,
+            "data": json.loads(content)
+        })
+
+    @abstractmethod
+    def fetch_document(self):
+        """
+        Reads the document of the href from the store.
+
+        :raises Exception: if the document could not be read
+        """
+
+
+class AstraDocument(DocumentStore):
     def __init__(self):
+        super().__init__()
         self.url = ''
         self.headers = {
             "X-Cassandra-Token": ASTRA_DB_APPLICATION_TOKEN,
             "Content-Type": "application/json"
         }
-        self.collections_name = "default"
-        self.document_id = "default"
 
-    def set_document_id(self, document_id):
-        self.document_id = document_id
-    
     def set_collections_name(self, collections_name):
         """
         The name of the collections mapped to the attributes:
@@ -46,20 +184,31 @@ class AstraDocument:
         self.collections_name = collections_name
         self.url = f"https://{ASTRA_DB_ID}-{ASTRA_DB_REGION}.apps.astra.datastax.com/api/rest/v2/namespaces/{ASTRA_DB_KEYSPACE}/collections/{self.collections_name}/{self.document_id}"
 
-    @retry(wait=wait_exponential(multiplier=1, max=7), stop=stop_after_attempt(7))
-    def patch_document(self, stellar_account, network_name, external_url, raw_data, cron_name):
-        data = {
-            "stellar_account": stellar_account,
-            "network_name": network_name,
-            "external_url": external_url,
-            "raw_data": raw_data
+    @staticmethod
+    def on_patch_document_failure(retry_state):
+        # mark the cron unhealthy once the retries are exhausted and fail the stage
+        e = retry_state.outcome.exception()
+        request = HttpRequest()
+        request.data = {
+            'cron_name': f"{retry_state.kwargs.get('cron_name')}",
+            'status': f"UNHEALTHY_RATE_LIMITED_BY_CASSANDRA_DOCUMENT_API",
+            'reason': f"{e}"
         }
 
+        ManagementCronHealthManager().create_cron_health(request)
+        raise e
+
+    @retry(wait=wait_exponential(multiplier=1, max=7), stop=stop_after_attempt(7),
+           retry=retry_if_not_exception_type(CircuitOpenError),
+           retry_error_callback=on_patch_document_failure)
+    def patch_document(self, stellar_account, network_name, external_url, raw_data, cron_name):
+        data = self.make_document(stellar_account, network_name, external_url, raw_data)
+
         # convert dictionary to json
         payload_json = json.dumps(data)
 
         try:
-            response = requests.patch(f"{self.url}", headers=self.headers, data=payload_json)
+            response = StellarMapRateLimiterHelpers.request('PATCH', f"{self.url}", headers=self.headers, data=payload_json)
             if response.status_code == 200:
                 doc_id = response.json().get("documentId")
 
@@ -67,35 +216,155 @@ class AstraDocument:
                     "documentId": doc_id,
                     "href": self.url
                 }
+
+                # the document is patched in place, so replace the cached copy
+                self.cache_document(href=self.url, document_id=doc_id, content=payload_json)
                 
                 return return_dict
             else:
                 raise Exception(f"Failed to PATCH document. Response: {response.content}")
+        except CircuitOpenError as e:
+            # the open circuit already stops the crons that need the document API
+            sentry_sdk.capture_exception(e)
+            raise e
         except Exception as e:
             sentry_sdk.capture_exception(e)
+            raise e
 
-            request = HttpRequest()
-            request.data = {
-                'cron_name': f"{cron_name}",
-                'status': f"UNHEALTHY_RATE_LIMITED_BY_CASSANDRA_DOCUMENT_API",
-                'reason': f"{e}"
-            }
-
-            ManagementCronHealthManager().create_cron_health(request)
+    def set_document_href(self, href):
+        self.href = href
+        self.datastax_url = href
 
-    def set_datastax_url(self, datastax_url):
-        self.datastax_url = datastax_url
+    def get_document_id(self, href):
+        if urlparse(href).scheme == LOCAL_DOCUMENT_SCHEME:
+            return None
+        util_helpers = StellarMapParsingUtilityHelpers()
+        return util_helpers.get_documentid_from_url_address(url_address=href)
 
-    @retry(wait=wait_exponential(multiplier=1, max=7), stop=stop_after_attempt(7))
-    def get_document(self):
+    @retry(wait=wait_exponential(multiplier=1, max=7), stop=stop_after_attempt(7),
+           retry=retry_if_not_exception_type(CircuitOpenError))
+    def fetch_document(self):
         try:
-            response = requests.get(f"{self.datastax_url}", headers=self.headers)
+            response = StellarMapRateLimiterHelpers.request('GET', f"{self.datastax_url}", headers=self.headers)
             if response.status_code == 200:
                 return response.json()
             else:
                 raise Exception(f"Failed to GET document. Response: {response.content}")
         except Exception as e:
             sentry_sdk.capture_exception(e)
-        
+            raise e
+
+
+class LocalDocumentStore(DocumentStore):
+    """
+    A document store on the local filesystem, for self-hosted deployments and
+    offline tests, without the two WAN round trips per document of the Document API.
 
+    Documents are content addressed: the file of a document is named by the SHA-256
+    of its JSON, written once and never modified, so identical payloads are stored
+    once and the href saved on the lineage record always reads the same content.
+    Collecting a dataset again writes a new document and href; the document id set
+    by the caller is not used.
 
+    local:///horizon_accounts/<sha256>
+    --> DOCUMENT_STORE_DIR/horizon_accounts/<2 first hex digits>/<sha256>.json.zst
+    """
+    compression_suffixes = {
+        'zstd': '.json.zst',
+        'zlib': '.json.z'
+    }
+
+    def __init__(self, root_dir=None, compression=None):
+        super().__init__()
+        self.root_dir = root_dir or DOCUMENT_STORE_DIR
+        if not self.root_dir:
+            raise ImproperlyConfigured('DOCUMENT_STORE_DIR must be set to a durable directory to use the local document store')
+        self.compression = compression or DOCUMENT_STORE_COMPRESSION
+        if self.compression not in self.compression_suffixes:
+            raise ValueError(f'Unknown DOCUMENT_STORE_COMPRESSION {self.compression}')
+
+    @staticmethod
+    def compress(compression, content):
+        if compression == 'zstd':
+            import zstandard
+            return zstandard.ZstdCompressor().compress(content)
+        return zlib.compress(content)
+
+    @staticmethod
+    def decompress(compression, content):
+        if compression == 'zstd':
+            import zstandard
+            return zstandard.ZstdDecompressor().decompress(content)
+        return zlib.decompress(content)
+
+    def get_path(self, collections_name, digest, compression):
+        return os.path.join(self.root_dir, collections_name, digest[:2], f'{digest}{self.compression_suffixes[compression]}')
+
+    def make_href(self, collections_name, digest):
+        return f'{LOCAL_DOCUMENT_SCHEME}:///{collections_name}/{digest}'
+
+    def parse_href(self, href):
+        """
+        Returns the collections name and the digest of a local href, None if not local.
+        """
+        parsed_url = urlparse(href or '')
+        if parsed_url.scheme != LOCAL_DOCUMENT_SCHEME:
+            return None
+        collections_name, _, digest = parsed_url.path.strip('/').rpartition('/')
+        if not collections_name or not digest:
+            return None
+        return collections_name, digest
+
+    def get_document_id(self, href):
+        parsed_href = self.parse_href(href)
+        return parsed_href[1] if parsed_href else None
+
+    def patch_document(self, stellar_account, network_name, external_url, raw_data, cron_name):
+        try:
+            data = self.make_document(stellar_account, network_name, external_url, raw_data)
+            content = json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+            digest = hashlib.sha256(content).hexdigest()
+
+            path = self.get_path(self.collections_name, digest, self.compression)
+            if not os.path.exists(path):
+                # write to a temporary file first so a reader never sees a partial document
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as document_file:
+                    document_file.write(self.compress(self.compression, content))
+                os.replace(tmp_path, path)
+
+            href = self.make_href(self.collections_name, digest)
+            self.cache_document(href=href, document_id=digest, content=content)
+
+            return {
+                "documentId": digest,
+                "href": href
+            }
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise e
+
+    def fetch_document(self):
+        try:
+            parsed_href = self.parse_href(self.href)
+            if parsed_href is None:
+                raise ValueError(f'Not a local document href: {self.href}')
+            collections_name, digest = parsed_href
+
+            # the document may have been written with another compression setting
+            for compression in self.compression_suffixes:
+                path = self.get_path(collections_name, digest, compression)
+                if os.path.exists(path):
+                    with open(path, 'rb') as document_file:
+                        content = self.decompress(compression, document_file.read())
+                    return {
+                        "documentId": digest,
+                        "data": json.loads(content)
+                    }
+
+            raise FileNotFoundError(f'Failed to GET document {self.href}')
+        except Exception as e:
+            # fail the stage so the record is retried instead of enriched from nothing
+            sentry_sdk.capture_exception(e)
+            raise e
@@ -1,10 +1,48 @@
+import asyncio
+import datetime
+import functools
+import importlib.util
+import os
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
 
+from cassandra.cqlengine.query import LWTException
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.urls import reverse
+from tenacity import stop_after_attempt, wait_none
 
 from .helpers.env import EnvHelpers, StellarNetwork
+from .helpers.sm_async import StellarMapAsyncHelpers
+from .helpers.sm_cache import (StellarMapCronHealthCacheHelpers,
+                               StellarMapDocumentCacheHelpers,
+                               StellarMapGenealogyCacheHelpers)
+from .helpers.sm_circuitbreaker import (CircuitOpenError,
+                                        StellarMapCircuitBreakerHelpers)
+from .helpers.sm_conn import (CassandraConnectionsHelpers,
+                              StellarMapHTTPSessionHelpers)
+from .helpers.sm_cron import StellarMapCronHelpers
+from .helpers.sm_creatoraccountlineage import (
+    ENRICHMENT_MAX_FAILURES, ENRICHMENT_STATUSES,
+    StellarMapCreatorAccountLineageHelpers)
+from .helpers.sm_horizon import (AsyncStellarMapHorizonAPIHelpers,
+                                 StellarMapHorizonAPIHelpers)
+from .helpers.sm_pipeline import (HORIZON_STAGE_NAME,
+                                  StellarMapLineagePipelineHelpers)
+from .helpers.sm_ratelimit import StellarMapRateLimiterHelpers, TokenBucket
+from .helpers.sm_seindex import (StellarMapSEBlockedDomainsHelpers,
+                                 StellarMapSEDirectoryHelpers,
+                                 StellarMapSEIndexHelpers)
+from .helpers.sm_stellarexpert import StellarMapStellarExpertAPIHelpers
 from .helpers.sm_validator import StellarMapValidatorHelpers
+from .helpers.sm_datetime import StellarMapDateTimeHelpers
+from .managers import (UNQUEUED_LINEAGE_STATUSES, ManagementCronHealthManager,
+                       StellarCreatorAccountLineageManager)
+from .services import (AstraDocument, DocumentStore, LocalDocumentStore,
+                       get_document_store)
 
 
 class SwaggerUIViewTestCase(TestCase):
@@ -107,3 +145,838 @@ class TestStellarMapValidatorHelpers(unittest.TestCase):
         
         # Test an invalid Stellar account address with invalid characters
         self.assertFalse(StellarMapValidatorHelpers.validate_stellar_account_address('GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ$'))
+
+
+class FakeCallBuilder:
+    """Stands in for a stellar_sdk call builder serving pages from a list of records."""
+
+    def __init__(self, records):
+        self.records = records
+        self.page_limit = 10
+        self.page_cursor = None
+
+    def for_account(self, account_id):
+        return self
+
+    def limit(self, limit):
+        self.page_limit = limit
+        return self
+
+    def order(self, desc=True):
+        return self
+
+    def cursor(self, cursor):
+        self.page_cursor = cursor
+        return self
+
+    def call(self):
+        start = 0
+        if self.page_cursor is not None:
+            start = [r['paging_token'] for r in self.records].index(self.page_cursor) + 1
+        return {'_links': {}, '_embedded': {'records': self.records[start:start + self.page_limit]}}
+
+
+class TestStellarMapHorizonAPIHelpersPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.account_id = 'GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ5'
+        self.records = [{'paging_token': str(i), 'type': 'payment'} for i in range(5)]
+        self.records[3] = {'paging_token': '3', 'type': 'create_account', 'account': self.account_id}
+
+    def test_paginate_stops_at_create_account(self):
+        helpers = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        cursors = []
+        page = helpers.paginate_records(
+            make_call_builder=lambda: FakeCallBuilder(self.records),
+            limit=2,
+            stop_on_record=lambda r: r['type'] == 'create_account',
+            on_page=cursors.append
+        )
+
+        self.assertEqual([r['paging_token'] for r in page['_embedded']['records']], ['0', '1', '2', '3'])
+        # the page holding the create_account operation is never saved for resuming
+        self.assertEqual(cursors, ['1'])
+        self.assertEqual(helpers.get_cursor(), '3')
+
+    def test_interrupted_run_resumes_before_create_account(self):
+        def make_call_builder():
+            return FakeCallBuilder(self.records)
+
+        def is_create_account(record):
+            return record['type'] == 'create_account'
+
+        cursors = []
+        helpers = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        helpers.paginate_records(make_call_builder=make_call_builder, limit=2, stop_on_record=is_create_account, on_page=cursors.append)
+
+        # a new run resumes from the last saved cursor and still reaches the create_account operation
+        resumed = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        resumed.set_cursor(cursors[-1])
+        page = resumed.paginate_records(make_call_builder=make_call_builder, limit=2, stop_on_record=is_create_account)
+        self.assertEqual([r['paging_token'] for r in page['_embedded']['records']], ['2', '3'])
+
+        # a cursor saved past the create_account operation collects again from the first page
+        past = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        past.set_cursor('3')
+        page = past.paginate_records(make_call_builder=make_call_builder, limit=2, stop_on_record=is_create_account)
+        self.assertEqual([r['paging_token'] for r in page['_embedded']['records']], ['0', '1', '2', '3'])
+
+    def test_paginate_resumes_from_cursor(self):
+        helpers = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        helpers.set_cursor('1')
+        page = helpers.paginate_records(make_call_builder=lambda: FakeCallBuilder(self.records), limit=2)
+
+        self.assertEqual([r['paging_token'] for r in page['_embedded']['records']], ['2', '3', '4'])
+
+    def test_get_account_creator(self):
+        helpers = StellarMapHorizonAPIHelpers(horizon_url='https://horizon-testnet.stellar.org', account_id=self.account_id)
+        create_account = {
+            'paging_token': '0',
+            'type': 'create_account',
+            'account': self.account_id,
+            'funder': 'GBRPYHIL2CI3FNQ4BXLFMNDLFJUNPU2HY3ZMFSHONUCEOASW7QC7OX2H',
+            'created_at': '2019-04-16T19:51:54Z'
+        }
+        helpers.server = unittest.mock.Mock()
+        helpers.server.operations.return_value = FakeCallBuilder([create_account] + self.records)
+
+        creator_dict = helpers.get_account_creator()
+
+        self.assertEqual(creator_dict['funder'], create_account['funder'])
+        self.assertEqual(creator_dict['created_at'].year, 2019)
+
+
+class TestAsyncStellarMapHorizonAPIHelpersPooling(unittest.TestCase):
+
+    def tearDown(self):
+        AsyncStellarMapHorizonAPIHelpers.servers.clear()
+        AsyncStellarMapHorizonAPIHelpers.semaphores.clear()
+
+    def test_server_of_a_closed_loop_is_closed_by_the_next_loop(self):
+        horizon_url = 'https://horizon-testnet.stellar.org'
+
+        async def get_server():
+            return AsyncStellarMapHorizonAPIHelpers.get_server(horizon_url)
+
+        async def get_server_and_close_the_stale_one():
+            server = AsyncStellarMapHorizonAPIHelpers.get_server(horizon_url)
+            await asyncio.gather(*AsyncStellarMapHorizonAPIHelpers.closing_tasks)
+            return server
+
+        stale_server = asyncio.run(get_server())
+        with unittest.mock.patch.object(stale_server, 'close', new=unittest.mock.AsyncMock()) as close:
+            server = asyncio.run(get_server_and_close_the_stale_one())
+
+        close.assert_awaited_once()
+        self.assertIsNot(server, stale_server)
+        self.assertEqual(list(AsyncStellarMapHorizonAPIHelpers.servers.values()), [server])
+
+    def test_semaphore_is_shared_per_concurrency(self):
+        horizon_url = 'https://horizon-testnet.stellar.org'
+
+        async def get_semaphores():
+            return (
+                AsyncStellarMapHorizonAPIHelpers.get_semaphore(horizon_url, concurrency=2),
+                AsyncStellarMapHorizonAPIHelpers.get_semaphore(horizon_url, concurrency=2),
+                AsyncStellarMapHorizonAPIHelpers.get_semaphore(horizon_url, concurrency=5)
+            )
+
+        semaphore, same_semaphore, wider_semaphore = asyncio.run(get_semaphores())
+
+        self.assertIs(semaphore, same_semaphore)
+        self.assertEqual(semaphore._value, 2)
+        self.assertEqual(wider_semaphore._value, 5)
+
+
+class TestStellarCreatorAccountLineageManagerQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.lineage = unittest.mock.MagicMock(
+            network_name='testnet',
+            status='DONE_HORIZON_API_DATASETS',
+            status_queue_id='old-queue-id'
+        )
+
+    @unittest.mock.patch('apiApp.managers.BatchQuery')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageQueue')
+    def test_write_lineage_moves_queue_entry(self, queue_model, batch_query):
+        StellarCreatorAccountLineageManager().write_lineage(self.lineage, {'status': 'DONE_UPDATING_FROM_RAW_DATA'})
+
+        queue_model.objects.filter.assert_called_once_with(network_name='testnet', status='DONE_HORIZON_API_DATASETS', queue_id='old-queue-id')
+        self.assertEqual(queue_model.batch.return_value.create.call_args.kwargs['status'], 'DONE_UPDATING_FROM_RAW_DATA')
+        update_data = self.lineage.batch.return_value.update.call_args.kwargs
+        self.assertEqual(update_data['status_queue_id'], queue_model.batch.return_value.create.call_args.kwargs['queue_id'])
+
+    @unittest.mock.patch('apiApp.managers.BatchQuery')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageQueue')
+    def test_write_lineage_dequeues_terminal_status(self, queue_model, batch_query):
+        StellarCreatorAccountLineageManager().write_lineage(self.lineage, {'status': 'DONE_MAKE_GRANDPARENT_LINEAGE'})
+
+        queue_model.batch.return_value.create.assert_not_called()
+        self.assertIsNone(self.lineage.batch.return_value.update.call_args.kwargs['status_queue_id'])
+
+    @unittest.mock.patch('apiApp.managers.BatchQuery')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageQueue')
+    def test_update_status_with_lineage_does_not_read(self, queue_model, batch_query):
+        lineage_manager = StellarCreatorAccountLineageManager()
+        with unittest.mock.patch.object(lineage_manager, 'get_queryset') as get_queryset:
+            lineage_manager.update_status(id=self.lineage.id, status='DONE_UPDATING_FROM_RAW_DATA', lineage=self.lineage)
+
+        get_queryset.assert_not_called()
+        self.assertEqual(self.lineage.batch.return_value.update.call_args.kwargs['status'], 'DONE_UPDATING_FROM_RAW_DATA')
+
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageQueue')
+    def test_update_status_with_expected_status_lost(self, queue_model):
+        self.lineage.iff.return_value.update.side_effect = LWTException('not applied')
+
+        updated = StellarCreatorAccountLineageManager().update_status(
+            id=self.lineage.id,
+            status='IN_PROGRESS_UPDATING_FROM_RAW_DATA',
+            lineage=self.lineage,
+            expected_status='DONE_HORIZON_API_DATASETS'
+        )
+
+        self.assertIsNone(updated)
+        self.lineage.iff.assert_any_call(status='DONE_HORIZON_API_DATASETS')
+        # the entry written ahead of the transaction is removed again
+        queue_model.objects.filter.return_value.batch.return_value.delete.assert_called_once()
+
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineage')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageQueue')
+    def test_get_queued_queryset_discards_stale_entries(self, queue_model, lineage_model):
+        current = unittest.mock.MagicMock(queue_id='current', network_name='testnet')
+        stale = unittest.mock.MagicMock(queue_id='stale', network_name='testnet')
+        entries = unittest.mock.MagicMock()
+        entries.fetch_size.return_value = [stale, current]
+        queue_model.objects.filter.side_effect = [entries, unittest.mock.MagicMock()]
+        self.lineage.status_queue_id = 'current'
+        lineage_model.objects.filter.return_value.first.return_value = self.lineage
+
+        lineages = StellarCreatorAccountLineageManager().get_queued_queryset(
+            statuses=['DONE_HORIZON_API_DATASETS'],
+            network_names=('testnet',)
+        )
+
+        self.assertEqual(lineages, [self.lineage])
+        queue_model.objects.filter.assert_called_with(network_name='testnet', status='DONE_HORIZON_API_DATASETS', queue_id='stale')
+
+
+class TestStellarMapCreatorAccountLineageHelpersEnrichment(unittest.TestCase):
+
+    @unittest.mock.patch('apiApp.helpers.sm_creatoraccountlineage.StellarCreatorAccountLineageManager')
+    @unittest.mock.patch('apiApp.helpers.sm_creatoraccountlineage.get_document_store')
+    def test_enrich_reads_accounts_document_once(self, document_store, lineage_manager):
+        document_store.return_value.get_document.return_value = {'data': {'raw_data': {
+            'home_domain': 'example.com',
+            'balances': [{'asset_type': 'native', 'balance': '12.5'}],
+            'flags': {'auth_required': False}
+        }}}
+        lin_queryset = unittest.mock.MagicMock(horizon_accounts_doc_api_href='https://example.com/doc')
+
+        StellarMapCreatorAccountLineageHelpers().async_enrich_from_accounts_raw_data(None, lin_queryset)
+
+        document_store.return_value.get_document.assert_called_once()
+        data = lineage_manager.return_value.update_lineage.call_args.kwargs['request'].data
+        self.assertEqual(data['home_domain'], 'example.com')
+        self.assertEqual(data['xlm_balance'], 12.5)
+        self.assertEqual(data['horizon_accounts_assets_doc_api_href'], '[]')
+        self.assertEqual(data['horizon_accounts_flags_doc_api_href'], '[{"auth_required": false}]')
+        self.assertEqual(data['enrichment_failures'], 0)
+        self.assertEqual(data['status'], 'DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF')
+
+    @unittest.mock.patch('apiApp.helpers.sm_creatoraccountlineage.StellarCreatorAccountLineageManager')
+    @unittest.mock.patch('apiApp.helpers.sm_creatoraccountlineage.get_document_store')
+    def test_failed_enrichment_stops_after_max_failures(self, document_store, lineage_manager):
+        document_store.return_value.get_document.side_effect = Exception('document missing')
+        lin_queryset = unittest.mock.MagicMock(status='DONE_HORIZON_API_DATASETS', enrichment_failures=None)
+
+        def update_status(id, status, lineage):
+            lineage.status = status
+
+        def update_lineage(id, request, lineage):
+            for field_name, value in request.data.items():
+                setattr(lineage, field_name, value)
+        lineage_manager.return_value.update_status.side_effect = update_status
+        lineage_manager.return_value.update_lineage.side_effect = update_lineage
+
+        lineage_helpers = StellarMapCreatorAccountLineageHelpers()
+        with unittest.mock.patch('apiApp.helpers.sm_creatoraccountlineage.sentry_sdk'):
+            # the record is returned to its stage until the last allowed failure
+            for failures in range(1, ENRICHMENT_MAX_FAILURES):
+                lineage_helpers.async_enrich_from_accounts_raw_data(None, lin_queryset)
+                self.assertEqual((lin_queryset.status, lin_queryset.enrichment_failures), ('DONE_HORIZON_API_DATASETS', failures))
+
+            lineage_helpers.async_enrich_from_accounts_raw_data(None, lin_queryset)
+
+        # the record leaves the work queue and is no longer polled
+        self.assertEqual(lin_queryset.status, 'ERROR_ENRICHING_FROM_ACCOUNTS_RAW_DATA')
+        self.assertIn(lin_queryset.status, UNQUEUED_LINEAGE_STATUSES)
+        self.assertNotIn(lin_queryset.status, ENRICHMENT_STATUSES)
+
+
+class TestStellarCreatorAccountLineageManagerGenealogy(unittest.TestCase):
+
+    def setUp(self):
+        # child -> parent -> root
+        self.chain = [('child', 'parent'), ('parent', 'root'), ('root', 'no_element_funder')]
+        self.index = {
+            account: unittest.mock.MagicMock(
+                stellar_account=account,
+                lineage_id=f'{account}-id',
+                stellar_creator_account=creator,
+                ancestor_path=[],
+                ancestor_path_complete=False
+            )
+            for account, creator in self.chain
+        }
+        self.lineages = {
+            f'{account}-id': unittest.mock.MagicMock(id=f'{account}-id', stellar_account=account)
+            for account, creator in self.chain
+        }
+
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineage')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageIndex')
+    def test_get_genealogies_reads_one_generation_per_query(self, index_model, lineage_model):
+        index_model.objects.filter.side_effect = lambda network_name, stellar_account__in: [
+            self.index[a] for a in stellar_account__in if a in self.index
+        ]
+        lineage_model.objects.filter.side_effect = lambda id__in: [self.lineages[i] for i in id__in]
+
+        genealogies = StellarCreatorAccountLineageManager().get_genealogies(
+            stellar_accounts=['child', 'parent'],
+            network_name='public'
+        )
+
+        self.assertEqual([l.stellar_account for l in genealogies['child']], ['child', 'parent', 'root'])
+        self.assertEqual([l.stellar_account for l in genealogies['parent']], ['parent', 'root'])
+        # the two chains advance together: {child, parent} then {root}
+        self.assertEqual(index_model.objects.filter.call_count, 2)
+        lineage_model.objects.filter.assert_called_once()
+
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineage')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageIndex')
+    def test_get_genealogies_follows_materialized_path(self, index_model, lineage_model):
+        self.index['child'].ancestor_path = ['parent', 'root']
+        self.index['child'].ancestor_path_complete = True
+        index_model.objects.filter.side_effect = lambda network_name, stellar_account__in: [
+            self.index[a] for a in stellar_account__in if a in self.index
+        ]
+        lineage_model.objects.filter.side_effect = lambda id__in: [self.lineages[i] for i in id__in]
+
+        genealogies = StellarCreatorAccountLineageManager().get_genealogies(stellar_accounts=['child'], network_name='public')
+
+        self.assertEqual([l.stellar_account for l in genealogies['child']], ['child', 'parent', 'root'])
+        # {child} then every ancestor on the path at once
+        self.assertEqual(index_model.objects.filter.call_count, 2)
+        self.index['child'].update.assert_not_called()
+
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineage')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageIndex')
+    def test_get_genealogies_writes_back_completed_path(self, index_model, lineage_model):
+        index_model.objects.filter.side_effect = lambda network_name, stellar_account__in: [
+            self.index[a] for a in stellar_account__in if a in self.index
+        ]
+        lineage_model.objects.filter.side_effect = lambda id__in: [self.lineages[i] for i in id__in]
+
+        StellarCreatorAccountLineageManager().get_genealogies(stellar_accounts=['child'], network_name='public')
+
+        self.index['child'].update.assert_called_once_with(ancestor_path=['parent', 'root'], ancestor_path_complete=True)
+
+    @unittest.mock.patch('apiApp.managers.sentry_sdk')
+    @unittest.mock.patch('apiApp.managers.StellarCreatorAccountLineageIndex')
+    def test_make_ancestor_path_cuts_cycle(self, index_model, sentry):
+        self.index['parent'].ancestor_path = ['root', 'child', 'parent']
+        index_model.objects.filter.return_value = [self.index['parent']]
+
+        ancestor_path, complete = StellarCreatorAccountLineageManager().make_ancestor_path(
+            stellar_account='child',
+            stellar_creator_account='parent',
+            network_name='public'
+        )
+
+        self.assertEqual(ancestor_path, ['parent', 'root'])
+        self.assertTrue(complete)
+        sentry.capture_message.assert_called_once()
+
+
+class TestStellarMapGenealogyCacheHelpers(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_helpers = StellarMapGenealogyCacheHelpers(network_name='testnet', stellar_account='GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ5')
+        self.cache_helpers.invalidate()
+        self.lin_querysets = [
+            unittest.mock.MagicMock(updated_at=datetime.datetime(2023, 3, 14, 0, 36, 37)),
+            unittest.mock.MagicMock(updated_at=None, created_at=datetime.datetime(2023, 3, 15, 1, 0, 0))
+        ]
+
+    def test_response_served_for_same_version(self):
+        version = self.cache_helpers.get_version(self.lin_querysets)
+        self.cache_helpers.set_response(version=version, response_json='{}')
+
+        self.assertEqual(self.cache_helpers.get_response(version=version), '{}')
+
+    def test_response_not_served_after_update(self):
+        self.cache_helpers.set_response(version=self.cache_helpers.get_version(self.lin_querysets), response_json='{}')
+        self.lin_querysets[0].updated_at = datetime.datetime(2023, 3, 16, 0, 0, 0)
+
+        self.assertIsNone(self.cache_helpers.get_response(version=self.cache_helpers.get_version(self.lin_querysets)))
+
+    def test_invalidate(self):
+        version = self.cache_helpers.get_version(self.lin_querysets)
+        self.cache_helpers.set_response(version=version, response_json='{}')
+        self.cache_helpers.invalidate()
+
+        self.assertIsNone(self.cache_helpers.get_response(version=version))
+
+
+class TestCassandraConnectionsHelpers(unittest.TestCase):
+
+    def tearDown(self):
+        CassandraConnectionsHelpers.shutdown()
+
+    @unittest.mock.patch('apiApp.helpers.sm_conn.Cluster')
+    def test_session_and_prepared_statements_are_shared(self, cluster):
+        CassandraConnectionsHelpers.shutdown()
+        session = cluster.return_value.connect.return_value
+        cql_query = "SELECT * FROM management_cron_health WHERE cron_name = ? ALLOW FILTERING;"
+
+        for cron_name in ['cron_health_check', 'cron_make_parent_account_lineage']:
+            conn_helpers = CassandraConnectionsHelpers()
+            conn_helpers.set_cql_query(cql_query)
+            conn_helpers.set_cql_parameters([cron_name])
+            conn_helpers.execute_cql()
+            conn_helpers.close_connection()
+
+        cluster.assert_called_once()
+        session.prepare.assert_called_once_with(cql_query)
+        session.execute.assert_called_with(session.prepare.return_value, ['cron_make_parent_account_lineage'])
+
+
+class TestManagementCronHealthManagerLatest(unittest.TestCase):
+
+    def setUp(self):
+        dt_helpers = StellarMapDateTimeHelpers()
+        dt_helpers.set_datetime_obj()
+        self.now = dt_helpers.get_datetime_obj()
+
+    def make_latest(self, created_at):
+        latest = unittest.mock.MagicMock(cron_name='cron_health_check', status='HEALTHY', created_at=created_at)
+        latest._values = {'cron_name': None, 'status': None, 'created_at': None}
+        return latest
+
+    @unittest.mock.patch('apiApp.managers.ManagementCronHealthLatest')
+    def test_get_latest_record_reads_latest_row(self, latest_model):
+        latest_model.objects.filter.return_value.first.return_value = self.make_latest(self.now)
+
+        record = ManagementCronHealthManager().get_latest_record(cron_name='cron_health_check')
+
+        latest_model.objects.filter.assert_called_once_with(cron_name='cron_health_check')
+        self.assertEqual(record['status'], 'HEALTHY')
+
+    @unittest.mock.patch('apiApp.managers.ManagementCronHealthLatest')
+    def test_get_latest_record_ignores_status_of_previous_day(self, latest_model):
+        latest_model.objects.filter.return_value.first.return_value = self.make_latest(self.now - datetime.timedelta(days=1))
+
+        self.assertTrue(ManagementCronHealthManager().get_latest_record(cron_name='cron_health_check').empty)
+
+    @unittest.mock.patch('apiApp.managers.BatchQuery')
+    @unittest.mock.patch('apiApp.managers.ManagementCronHealthHistory')
+    @unittest.mock.patch('apiApp.managers.ManagementCronHealthLatest')
+    @unittest.mock.patch('apiApp.managers.ManagementCronHealth')
+    def test_create_cron_health_writes_latest_and_history(self, legacy_model, latest_model, history_model, batch_query):
+        request = unittest.mock.MagicMock()
+        request.data = {'cron_name': 'cron_health_check', 'status': 'HEALTHY'}
+
+        ManagementCronHealthManager().create_cron_health(request=request)
+
+        legacy_model.batch.return_value.create.assert_called_once()
+        self.assertEqual(latest_model.objects.filter.return_value.batch.return_value.update.call_args.kwargs['status'], 'HEALTHY')
+        self.assertEqual(history_model.batch.return_value.create.call_args.kwargs['day'], self.now.strftime('%Y-%m-%d'))
+
+
+class TestStellarMapCronHelpersHealthGate(unittest.TestCase):
+
+    def setUp(self):
+        StellarMapCronHealthCacheHelpers().invalidate()
+
+    def tearDown(self):
+        StellarMapCronHealthCacheHelpers().invalidate()
+
+    @unittest.mock.patch('apiApp.helpers.sm_cron.ManagementCronHealthManager')
+    def test_check_cron_health_reads_snapshot_once(self, cron_health_manager):
+        cron_health_manager.return_value.get_latest_records.return_value = {
+            'cron_collect_account_lineage_attributes': {'status': 'HEALTHY', 'created_at': None},
+            'cron_collect_account_lineage_se_directory': {'status': 'UNHEALTHY_DUE_TO_RATE_LIMITING_FROM_EXTERNAL_API_SERVER', 'created_at': None}
+        }
+
+        self.assertTrue(StellarMapCronHelpers(cron_name='cron_collect_account_lineage_attributes').check_cron_health())
+        self.assertFalse(StellarMapCronHelpers(cron_name='cron_collect_account_lineage_se_directory').check_cron_health())
+
+        cron_health_manager.return_value.get_latest_records.assert_called_once()
+        cron_health_manager.return_value.get_latest_record.assert_not_called()
+
+
+class TestStellarMapRateLimiterHelpers(unittest.TestCase):
+
+    def test_token_bucket_burst_then_rate(self):
+        bucket = TokenBucket(host='api.stellar.expert', rate=1, capacity=2)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertGreater(bucket.try_acquire(), 0.9)
+
+    def test_retry_after_pauses_host(self):
+        url = 'https://api.stellar.expert/explorer/public/directory/GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ5'
+        bucket = StellarMapRateLimiterHelpers.get_bucket(url)
+
+        StellarMapRateLimiterHelpers.observe_response(url, 429, {'Retry-After': '17'})
+
+        self.assertGreater(bucket.try_acquire(), 16)
+        self.assertIsNone(StellarMapRateLimiterHelpers.get_bucket('https://example.com/'))
+        StellarMapRateLimiterHelpers.buckets.clear()
+
+
+class TestStellarMapCircuitBreakerHelpers(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = StellarMapCircuitBreakerHelpers(dependency='stellar-expert')
+        self.breaker.cache.clear()
+        self.url = 'https://api.stellar.expert/explorer/directory/GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ5'
+
+    def tearDown(self):
+        self.breaker.cache.clear()
+
+    @unittest.mock.patch('apiApp.helpers.sm_circuitbreaker.sentry_sdk')
+    def test_failures_open_only_their_dependency(self, mock_sentry):
+        for _ in range(7):
+            StellarMapCircuitBreakerHelpers.after_response(self.url, 429)
+
+        with self.assertRaises(CircuitOpenError):
+            StellarMapCircuitBreakerHelpers.before_request(self.url)
+        StellarMapCircuitBreakerHelpers.before_request('https://horizon.stellar.org/accounts')
+
+        cron_helpers = StellarMapCronHelpers(cron_name='cron_collect_account_lineage_se_directory')
+        self.assertEqual(cron_helpers.get_available_network_names(dependencies=['stellar-expert']), [])
+        self.assertEqual(cron_helpers.get_available_network_names(dependencies=['horizon']), ['testnet', 'public'])
+
+    @unittest.mock.patch('apiApp.helpers.sm_circuitbreaker.CIRCUIT_BREAKER_COOLDOWN_SECONDS', 0)
+    @unittest.mock.patch('apiApp.helpers.sm_circuitbreaker.sentry_sdk')
+    def test_half_open_lets_one_probe_through(self, mock_sentry):
+        self.breaker.trip(reason='rate limited')
+
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        # a failed probe opens the circuit again, a successful one closes it
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state()['state'], 'OPEN')
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.get_state()['state'], 'CLOSED')
+
+
+class TestStellarMapSEIndexHelpers(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        StellarMapSEBlockedDomainsHelpers.indexes.clear()
+        self.snapshot_dir.cleanup()
+
+    @unittest.mock.patch.object(StellarMapSEBlockedDomainsHelpers, 'page_limit', 2)
+    @unittest.mock.patch.object(StellarMapSEBlockedDomainsHelpers, 'get_page')
+    def test_blocked_domains_sweep_resumes_from_cursor_and_matches_subdomains(self, mock_page):
+        blocked_domains_helpers = StellarMapSEBlockedDomainsHelpers(
+            snapshot_path=os.path.join(self.snapshot_dir.name, 'se_blocked_domains.json')
+        )
+        mock_page.side_effect = [
+            [{'domain': 'afreum.co', 'paging_token': 'afreum.co'}, {'domain': 'Stellar.org.am', 'paging_token': 'stellar.org.am'}],
+            [{'domain': 'xlmstar.net', 'paging_token': 'xlmstar.net'}],
+        ]
+
+        # the first call stops after one page; the index is not replaced yet
+        self.assertFalse(blocked_domains_helpers.sync(max_pages=1))
+        self.assertFalse(blocked_domains_helpers.is_loaded())
+
+        self.assertTrue(blocked_domains_helpers.sync())
+        mock_page.assert_called_with(cursor='stellar.org.am')
+
+        self.assertTrue(blocked_domains_helpers.is_blocked('https://airdrop.stellar.org.am/'))
+        self.assertTrue(blocked_domains_helpers.is_blocked('xlmstar.net'))
+        self.assertFalse(blocked_domains_helpers.is_blocked('stellar.org'))
+        self.assertFalse(blocked_domains_helpers.is_stale(blocked_domains_helpers.read_snapshot()))
+
+    @unittest.mock.patch.object(StellarMapSEDirectoryHelpers, 'get_page')
+    def test_directory_is_keyed_by_address_per_network(self, mock_page):
+        snapshot_path = os.path.join(self.snapshot_dir.name, 'se_directory_public.json')
+        directory_helpers = StellarMapSEDirectoryHelpers(network_name='public', snapshot_path=snapshot_path)
+        mock_page.return_value = [{
+            'address': 'GDUKMGUGDZQK6YHYA5Z6AY2G4XDSZPSZ3SW5UN3ARVMO6QSRDWP5YLEX',
+            'name': 'AnchorUSD',
+            'domain': 'www.anchorusd.com',
+            'tags': ['anchor', 'issuer'],
+            'paging_token': 'GDUKMGUGDZQK6YHYA5Z6AY2G4XDSZPSZ3SW5UN3ARVMO6QSRDWP5YLEX'
+        }]
+
+        self.assertTrue(directory_helpers.sync_if_stale())
+        self.assertIn('/explorer/public/directory/', directory_helpers.get_page_url())
+
+        # another process reads the snapshot
+        StellarMapSEDirectoryHelpers.indexes.clear()
+        directory_helpers = StellarMapSEDirectoryHelpers(network_name='public', snapshot_path=snapshot_path)
+        directory_helpers.load()
+        self.assertEqual(directory_helpers.get_account_directory('GDUKMGUGDZQK6YHYA5Z6AY2G4XDSZPSZ3SW5UN3ARVMO6QSRDWP5YLEX')['tags'], ['anchor', 'issuer'])
+        self.assertIsNone(directory_helpers.get_account_directory('GA2C5RFPE6GCKMY3US5PAB6UZLKIGSPIUKSLRB6Q723BM2OARMDUYEJ5'))
+
+    def test_index_without_page_url_and_record_key_cannot_be_instantiated(self):
+        class PartialSEIndexHelpers(StellarMapSEIndexHelpers):
+            snapshot_name = 'se_partial'
+
+            def get_page_url(self, cursor=None):
+                return 'https://api.stellar.expert/'
+
+        with self.assertRaises(TypeError):
+            PartialSEIndexHelpers(snapshot_path=os.path.join(self.snapshot_dir.name, 'se_partial.json'))
+
+
+class TestStellarMapStellarExpertAPIHelpersConcurrent(unittest.TestCase):
+
+    @unittest.mock.patch('apiApp.helpers.sm_stellarexpert.sentry_sdk')
+    def test_gather_runs_calls_concurrently_and_keeps_partial_results(self, mock_sentry):
+        se_helpers = StellarMapStellarExpertAPIHelpers(lin_queryset=unittest.mock.Mock(network_name='public'), session=unittest.mock.Mock())
+        barrier = threading.Barrier(2, timeout=5)
+
+        def concurrent_call(response):
+            # returns only when the other call is in flight too
+            barrier.wait()
+            return response
+
+        def failing_call():
+            raise Exception('SE unavailable')
+
+        se_responses = se_helpers.gather_se_responses({
+            'se_asset_list': functools.partial(concurrent_call, {'_embedded': {'records': []}}),
+            'se_asset_rating': functools.partial(concurrent_call, {'rating': {}}),
+            'se_account_directory': failing_call,
+        })
+
+        self.assertEqual(se_responses['se_asset_rating'], {'rating': {}})
+        self.assertEqual(se_responses['se_asset_list'], {'_embedded': {'records': []}})
+        self.assertIsNone(se_responses['se_account_directory'])
+
+
+class TestStellarMapHTTPSessionHelpers(unittest.TestCase):
+
+    def tearDown(self):
+        StellarMapHTTPSessionHelpers.close_sessions()
+
+    def test_sessions_are_pooled_per_host_and_process(self):
+        session = StellarMapHTTPSessionHelpers.get_session('https://api.stellar.expert/explorer/public/directory/')
+
+        self.assertIs(StellarMapHTTPSessionHelpers.get_session('https://api.stellar.expert/explorer/directory/blocked-domains/'), session)
+        self.assertIsNot(StellarMapHTTPSessionHelpers.get_session('https://horizon.stellar.org/accounts/'), session)
+
+        # a forked process does not reuse the connections of its parent
+        with unittest.mock.patch('apiApp.helpers.sm_conn.os.getpid', return_value=-1):
+            self.assertIsNot(StellarMapHTTPSessionHelpers.get_session('https://api.stellar.expert/'), session)
+
+
+class TestStellarMapAsyncHelpersStreaming(unittest.TestCase):
+
+    def test_tasks_are_pulled_within_the_window(self):
+        pulled = []
+        max_pending = []
+
+        def tasks():
+            for task in range(10):
+                pulled.append(task)
+                yield task
+
+        def custom_function(session, task):
+            # tasks pulled but not finished never exceed the window
+            max_pending.append(len(pulled) - task)
+            if task == 3:
+                raise Exception('failed task')
+            return task
+
+        async_helpers = StellarMapAsyncHelpers(max_workers=2, max_in_flight=3, time_budget_seconds=0)
+        with unittest.mock.patch('apiApp.helpers.sm_async.sentry_sdk'):
+            summary = async_helpers.execute_async(tasks(), custom_function)
+
+        self.assertEqual((summary['succeeded'], summary['failed']), (9, 1))
+        self.assertLessEqual(max(max_pending), 3)
+        self.assertEqual([outcome['error'] for outcome in summary['outcomes'] if not outcome['succeeded']], ['failed task'])
+
+    def test_no_task_starts_after_the_time_budget(self):
+        async_helpers = StellarMapAsyncHelpers(max_workers=1, max_in_flight=1, time_budget_seconds=0.05)
+
+        summary = async_helpers.execute_async(iter(range(100)), lambda session, task: time.sleep(0.02))
+
+        self.assertTrue(summary['over_budget'])
+        self.assertLess(summary['succeeded'], 100)
+
+
+class TestStellarMapLineagePipelineHelpersWorker(unittest.TestCase):
+
+    def test_worker_idles_only_when_a_pass_found_no_work(self):
+        stop_event = threading.Event()
+        summaries = [
+            {'succeeded': 2, 'failed': 1},
+            {'succeeded': 0, 'failed': 0},
+            None
+        ]
+
+        def run_stage(stage_name, lin_querysets=None):
+            summary = summaries.pop(0)
+            if not summaries:
+                stop_event.set()
+            return summary
+
+        pipeline_helpers = StellarMapLineagePipelineHelpers()
+        with unittest.mock.patch.object(pipeline_helpers, 'run_stage', side_effect=run_stage), \
+                unittest.mock.patch.object(stop_event, 'wait') as wait:
+            pipeline_helpers.run_worker('cron_collect_account_lineage_attributes', stop_event, idle_seconds=3)
+
+        # the pass without work and the pass of an unhealthy cron wait; the busy pass does not
+        self.assertEqual(wait.call_args_list, [unittest.mock.call(3), unittest.mock.call(3)])
+
+    def test_finished_records_are_routed_to_the_next_stage(self):
+        pipeline_helpers = StellarMapLineagePipelineHelpers()
+        pipeline_helpers.enable_events(['cron_collect_account_lineage_se_directory', HORIZON_STAGE_NAME])
+
+        finished = unittest.mock.Mock(status='DONE_UPDATING_HORIZON_ACCOUNTS_FLAGS_DOC_API_HREF', network_name='public')
+        failed = unittest.mock.Mock(status='IN_PROGRESS_ENRICHING_FROM_ACCOUNTS_RAW_DATA', network_name='public')
+        pipeline_helpers.route_summary('cron_collect_account_lineage_attributes', {'outcomes': [
+            {'task': finished, 'succeeded': True, 'result': None},
+            {'task': failed, 'succeeded': True, 'result': None}
+        ]})
+
+        self.assertEqual(pipeline_helpers.get_stage_events('cron_collect_account_lineage_se_directory', timeout=0), [finished])
+        self.assertEqual(pipeline_helpers.get_stage_events(HORIZON_STAGE_NAME, timeout=0), [])
+        # a stage is never its own successor
+        self.assertIsNone(pipeline_helpers.get_successor_stage_name('DONE_COLLECTING_HORIZON_API_DATASETS_ACCOUNTS', stage_name=HORIZON_STAGE_NAME))
+
+
+class TestLocalDocumentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.root_dir.cleanup()
+
+    def test_documents_are_content_addressed(self):
+        document_store = LocalDocumentStore(root_dir=self.root_dir.name, compression='zlib')
+        document_store.set_collections_name(collections_name='horizon_accounts')
+        raw_data = {'data': {'home_domain': 'example.com'}}
+
+        res_dict = document_store.patch_document('GABC', 'public', 'https://horizon.stellar.org/accounts/GABC', raw_data, 'cron')
+        same_dict = document_store.patch_document('GABC', 'public', 'https://horizon.stellar.org/accounts/GABC', raw_data, 'cron')
+
+        self.assertEqual(res_dict, same_dict)
+        self.assertTrue(res_dict['href'].startswith('local:///horizon_accounts/'))
+        self.assertEqual(document_store.get_document_id(res_dict['href']), res_dict['documentId'])
+
+        # the store of an href is picked from its scheme
+        with unittest.mock.patch('apiApp.services.DOCUMENT_STORE_DIR', self.root_dir.name):
+            reader = get_document_store(href=res_dict['href'])
+        self.assertIsInstance(reader, LocalDocumentStore)
+        self.assertEqual(reader.fetch_document()['data']['raw_data'], raw_data)
+
+        self.assertIsInstance(get_document_store(href='https://example.apps.astra.datastax.com/doc'), AstraDocument)
+
+    def test_documents_are_read_through_the_cache(self):
+        document_store = LocalDocumentStore(root_dir=self.root_dir.name, compression='zlib')
+        document_store.set_collections_name(collections_name='horizon_effects')
+        res_dict = document_store.patch_document('GDEF', 'testnet', 'https://horizon-testnet.stellar.org', {'records': []}, 'cron')
+
+        reader = LocalDocumentStore(root_dir=self.root_dir.name, compression='zlib')
+        reader.set_document_href(res_dict['href'])
+        with unittest.mock.patch.object(reader, 'fetch_document', wraps=reader.fetch_document) as fetch_document:
+            # written through by patch_document
+            self.assertEqual(reader.get_document()['data']['raw_data'], {'records': []})
+            StellarMapDocumentCacheHelpers(href=res_dict['href']).invalidate()
+            reader.get_document()
+            reader.get_document()
+
+        fetch_document.assert_called_once()
+
+    def test_local_store_requires_a_directory(self):
+        with unittest.mock.patch('apiApp.services.DOCUMENT_STORE_DIR', None):
+            with self.assertRaises(ImproperlyConfigured):
+                LocalDocumentStore()
+
+    def test_missing_document_fails_the_read(self):
+        reader = LocalDocumentStore(root_dir=self.root_dir.name, compression='zlib')
+        reader.set_document_href(f'local:///horizon_accounts/{"0" * 64}')
+
+        with unittest.mock.patch('apiApp.services.sentry_sdk'):
+            with self.assertRaises(FileNotFoundError):
+                reader.get_document()
+
+    def test_document_written_with_another_compression_is_read(self):
+        writer = LocalDocumentStore(root_dir=self.root_dir.name, compression='zlib')
+        writer.set_collections_name(collections_name='horizon_accounts')
+        res_dict = writer.patch_document('GABC', 'public', 'https://horizon.stellar.org/accounts/GABC', {'id': 'GABC'}, 'cron')
+
+        reader = LocalDocumentStore(root_dir=self.root_dir.name, compression='zstd')
+        reader.set_document_href(res_dict['href'])
+        self.assertEqual(reader.fetch_document()['data']['raw_data'], {'id': 'GABC'})
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), 'zstandard is not installed')
+    def test_zstd_round_trip(self):
+        writer = LocalDocumentStore(root_dir=self.root_dir.name, compression='zstd')
+        writer.set_collections_name(collections_name='horizon_operations')
+        res_dict = writer.patch_document('GABC', 'public', 'https://horizon.stellar.org/accounts/GABC/operations', {'records': [1, 2]}, 'cron')
+
+        path = writer.get_path('horizon_operations', res_dict['documentId'], 'zstd')
+        self.assertTrue(os.path.exists(path))
+
+        # read by the configured compression and by the fallback of a zlib store
+        for compression in ['zstd', 'zlib']:
+            reader = LocalDocumentStore(root_dir=self.root_dir.name, compression=compression)
+            reader.set_document_href(res_dict['href'])
+            self.assertEqual(reader.fetch_document()['data']['raw_data'], {'records': [1, 2]})
+
+
+class TestAstraDocumentFailures(unittest.TestCase):
+
+    def setUp(self):
+        self.response = unittest.mock.Mock(status_code=500, content=b'error')
+
+    @unittest.mock.patch('apiApp.services.sentry_sdk')
+    @unittest.mock.patch('apiApp.services.StellarMapRateLimiterHelpers')
+    def test_failed_read_raises(self, rate_limiter, sentry):
+        rate_limiter.request.return_value = self.response
+        astra_document = AstraDocument()
+        astra_document.set_document_href('https://example.apps.astra.datastax.com/doc')
+
+        fetch_document = AstraDocument.fetch_document.retry_with(stop=stop_after_attempt(2), wait=wait_none())
+        with self.assertRaises(Exception):
+            fetch_document(astra_document)
+        self.assertEqual(rate_limiter.request.call_count, 2)
+
+    @unittest.mock.patch('apiApp.services.ManagementCronHealthManager')
+    @unittest.mock.patch('apiApp.services.sentry_sdk')
+    @unittest.mock.patch('apiApp.services.StellarMapRateLimiterHelpers')
+    def test_failed_patch_marks_cron_unhealthy_once_and_raises(self, rate_limiter, sentry, cron_health_manager):
+        rate_limiter.request.return_value = self.response
+        astra_document = AstraDocument()
+        astra_document.set_collections_name(collections_name='horizon_accounts')
+
+        patch_document = AstraDocument.patch_document.retry_with(stop=stop_after_attempt(3), wait=wait_none())
+        with self.assertRaises(Exception):
+            patch_document(astra_document, stellar_account='GABC', network_name='public', external_url='https://horizon.stellar.org/accounts/GABC', raw_data={}, cron_name='cron_collect_account_horizon_data')
+
+        self.assertEqual(rate_limiter.request.call_count, 3)
+        cron_health_manager.return_value.create_cron_health.assert_called_once()
+        self.assertEqual(cron_health_manager.return_value.create_cron_health.call_args.args[0].data['cron_name'], 'cron_collect_account_horizon_data')
+
+    def test_document_store_must_implement_the_interface(self):
+        class PartialDocumentStore(DocumentStore):
+            def get_document_id(self, href):
+                return None
+
+        with self.assertRaises(TypeError):
+            PartialDocumentStore()
@@ -7,6 +7,7 @@ from apiApp.views import (UserInquirySearchHistoryListAPIView,
                           UserInquirySearchHistoryListCreateAPIView,
                           UserInquirySearchHistoryModelViewSet,
                           GetAccountGenealogy,
+                          GetStellarExpertDirectory,
                           UserInquirySearchHistoryViewSet,
                           UserInquirySearchHistoryViewSet_OLDER)
 
@@ -22,6 +23,7 @@ urlpatterns = [
     re_path(r'^inquiries/$', UserInquirySearchHistoryViewSet_OLDER.as_view(), name='UserInquirySearchHistoryViewSet_OLDER'),
     re_path(r'^stellar-inquiries/$', UserInquirySearchHistoryModelViewSet.as_view({'post': 'create'}), name='stellar-inquiries'),
     re_path(r'^account-genealogy/network/(?P<network>[-\w]+)/stellar_address/(?P<stellar_account_address>[-\w]+)/$', GetAccountGenealogy.as_view(), name='account-genealogy'),
+    re_path(r'^se-directory/network/(?P<network>[-\w]+)/stellar_address/(?P<stellar_account_address>[-\w]+)/$', GetStellarExpertDirectory.as_view(), name='se-directory'),
     re_path(
         r"^inquiries-viewset/$",
         UserInquirySearchHistoryViewSet.as_view({"get": "list"}),
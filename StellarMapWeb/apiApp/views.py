@@ -1,6 +1,7 @@
 import json
 import logging
 
+import sentry_sdk
 from apiApp.helpers.sm_creatoraccountlineage import \
     StellarMapCreatorAccountLineageHelpers
 from apiApp.helpers.sm_datetime import StellarMapDateTimeHelpers
@@ -14,7 +15,9 @@ from rest_framework.viewsets import ViewSet
 
 from apiApp.helpers.env import EnvHelpers
 from apiApp.helpers.lineage_creator_accounts import LineageHelpers
+from apiApp.helpers.sm_cache import StellarMapGenealogyCacheHelpers
 from apiApp.helpers.sm_conn import SiteChecker
+from apiApp.helpers.sm_seindex import StellarMapSEDirectoryHelpers
 from apiApp.managers import UserInquirySearchHistoryManager
 from apiApp.models import UserInquirySearchHistory
 from apiApp.serializers import (UserInquirySearchHistorySerializer)
@@ -211,7 +214,16 @@ class GetAccountGenealogy(APIView):
     def get(self, request, network, stellar_account_address):
 
         sm_lineage_helpers = StellarMapCreatorAccountLineageHelpers()
-        genealogy_df = sm_lineage_helpers.get_account_genealogy(stellar_account=stellar_account_address, network_name=network)
+        lin_querysets = sm_lineage_helpers.get_account_genealogy_querysets(stellar_account=stellar_account_address, network_name=network)
+
+        # serve the cached response while no record of the genealogy changed
+        cache_helpers = StellarMapGenealogyCacheHelpers(network_name=network, stellar_account=stellar_account_address)
+        version = cache_helpers.get_version(lin_querysets)
+        genealogy_response_json = cache_helpers.get_response(version=version)
+        if genealogy_response_json is not None:
+            return Response(genealogy_response_json)
+
+        genealogy_df = sm_lineage_helpers.get_account_genealogy(stellar_account=stellar_account_address, network_name=network, lin_querysets=lin_querysets)
 
         # convert column of timestamps to datetimes
         sm_dt_helpers = StellarMapDateTimeHelpers()
@@ -256,5 +268,35 @@ class GetAccountGenealogy(APIView):
 
         # Convert the dictionary to a JSON format
         genealogy_response_json = json.dumps(genealogy_response)
+        cache_helpers.set_response(version=version, response_json=genealogy_response_json)
 
         return Response(genealogy_response_json)
+
+
+class GetStellarExpertDirectory(APIView):
+    """
+    Serves the Stellar Expert directory entry (name, domain and tags) of an account
+    from the local index synced by the SE directory cron, instead of the frontend
+    requesting api.stellar.expert for every node.
+    """
+
+    def get(self, request, network, stellar_account_address):
+
+        if network not in ('public', 'testnet'):
+            return Response({'error': f'Invalid network name: {network}'}, status=400)
+
+        directory_helpers = StellarMapSEDirectoryHelpers(network_name=network)
+        try:
+            if directory_helpers.load() is not None:
+                directory_entry = directory_helpers.get_account_directory(stellar_account=stellar_account_address)
+            else:
+                # the index has never been synced
+                directory_entry = directory_helpers.fetch_account_directory(stellar_account=stellar_account_address)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            return Response({'error': 'Stellar Expert directory is unavailable'}, status=503)
+
+        if directory_entry is None:
+            return Response({'error': 'Not found'}, status=404)
+
+        return Response(directory_entry)
@@ -154,8 +154,8 @@ const lineage_table_mixin = {
         return url_path;
       },
       async getApiStellarExpertTags(row_index, stellar_account, network_name) {
-        const base_url = "https://api.stellar.expert/explorer/";
-        const url_path = base_url.concat(network_name, '/directory/', stellar_account);
+        // served from the local index of the Stellar Expert directory
+        const url_path = '/se-directory/network/' + network_name + '/stellar_address/' + stellar_account + '/';
         const response = await fetch(url_path);
         this.apiStellarExpertTagsResponses[row_index] = await response.json();
         return this.apiStellarExpertTagsResponses[row_index];